@@ -1,18 +1,36 @@
+import time
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from pathlib import Path
-from src.config import HOST, PORT, ENVIRONMENT
-from src.api.routes import router
+from fastapi.concurrency import run_in_threadpool
+from src.config import HOST, PORT, ENVIRONMENT, COMPONENT_LOADING
+from src.api.routes import router, components
+from src.utils.metrics import REGISTRY, CONTENT_TYPE, HTTP_REQUESTS, HTTP_LATENCY
+from src.utils.tracing import configure_logging, request_context
+
+configure_logging()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """启动时开始加载组件（模型、索引和存储），关闭时释放"""
+    if COMPONENT_LOADING == "blocking":
+        await run_in_threadpool(components.wait)
+    elif COMPONENT_LOADING != "lazy":
+        components.start()
+    yield
+    components.shutdown()
 
 # 创建应用
 app = FastAPI(
     title="LeetCode RAG助手",
     description="使用检索增强生成和Chain-of-Thought方法解决LeetCode问题",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 添加CORS中间件
@@ -24,6 +42,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """为每个请求设置请求ID（沿用X-Request-ID请求头），并记录请求数和处理耗时"""
+    with request_context(request.headers.get("X-Request-ID", "")[:64] or None) as request_id:
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            response.headers["X-Request-ID"] = request_id
+            return response
+        finally:
+            # 按路由模板统计，避免路径参数产生过多的标签取值
+            route = request.scope.get("route")
+            path = getattr(route, "path", "other")
+            HTTP_REQUESTS.inc(method=request.method, path=path, status=status)
+            HTTP_LATENCY.observe(time.perf_counter() - start, method=request.method, path=path)
+
 # 注册API路由
 app.include_router(router, prefix="/api")
 
@@ -54,6 +90,22 @@ async def global_exception_handler(request: Request, exc: Exception):
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus格式的指标：请求数、阶段耗时、token数、队列深度、缓存命中和组件加载耗时"""
+    return Response(content=REGISTRY.render(), headers={"Content-Type": CONTENT_TYPE})
+
+@app.get("/health/live")
+async def liveness_check():
+    """进程存活即返回200，不依赖模型是否加载完成"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """所有组件加载完成后返回200，否则返回503及各组件的状态和加载耗时"""
+    status = components.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
 if __name__ == "__main__":
     # 启动服务
     uvicorn.run(
@@ -0,0 +1,135 @@
+"""
+比较不同CPU推理模式（bf16 / 动态int8）的生成速度、首token延迟和内存占用
+
+每种模式在独立子进程中加载模型，避免内存统计互相影响。
+--compare-prefix-cache 会对每种模式分别在开启和关闭前缀KV缓存时各测一次；
+--speculative 指定要比较的推测解码模式（生成使用贪心解码，输出相同）。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import subprocess
+
+# 将项目根目录加入导入路径
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+PROMPTS = [
+    "用Python实现二分查找，返回目标值的下标，不存在时返回-1。",
+    "Write a Python function that returns the length of the longest substring without repeating characters.",
+    "给定一个链表，判断链表中是否有环，请给出Python实现。",
+]
+
+def rss_mb() -> float:
+    """当前进程的常驻内存（MB）"""
+    with open("/proc/self/status", "r") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def peak_rss_mb() -> float:
+    """进程的峰值常驻内存（MB）"""
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_mode(mode: str, max_tokens: int, runs: int) -> dict:
+    """在当前进程中测试一种量化模式"""
+    from src.llm.deepseek import DeepSeekLLM
+    
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    llm = DeepSeekLLM(quantization=mode)
+    load_seconds = time.perf_counter() - start
+    rss_loaded = rss_mb()
+    
+    # 预热
+    llm.generate(PROMPTS[0], temperature=0.0, max_tokens=8)
+    
+    # 首token延迟：使用特征提取提示（固定开头可以命中前缀缓存）
+    from src.llm.features import build_feature_prompt
+    ttfts = []
+    for _ in range(runs):
+        for prompt in PROMPTS:
+            start = time.perf_counter()
+            stream = llm.generate_stream(build_feature_prompt(prompt), temperature=0.0, max_tokens=16)
+            next(stream, None)
+            ttfts.append(time.perf_counter() - start)
+            stream.close()
+    
+    total_tokens = 0
+    total_seconds = 0.0
+    for _ in range(runs):
+        for prompt in PROMPTS:
+            start = time.perf_counter()
+            response = llm.generate(prompt, temperature=0.0, max_tokens=max_tokens)
+            total_seconds += time.perf_counter() - start
+            total_tokens += len(llm.tokenizer(response, add_special_tokens=False).input_ids)
+    
+    return {
+        "mode": mode,
+        "prefix_cache": llm.prefix_cache_enabled,
+        "speculative": os.getenv("LLM_SPECULATIVE", "off") if llm.drafter is not None else "off",
+        "acceptance_rate": round(llm.speculative_stats.to_dict()["acceptance_rate"], 3),
+        "prefix_tokens_reused": llm.prefix_cache_stats()["tokens_reused"],
+        "ttft_ms": round(sum(ttfts) / len(ttfts) * 1000, 1),
+        "load_seconds": round(load_seconds, 2),
+        "model_rss_mb": round(rss_loaded - rss_before, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "generated_tokens": total_tokens,
+        "tokens_per_second": round(total_tokens / total_seconds, 2) if total_seconds > 0 else 0.0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM CPU推理基准测试")
+    parser.add_argument("--modes", default="none,int8", help="逗号分隔的量化模式")
+    parser.add_argument("--max-tokens", type=int, default=128, help="每个提示最多生成的token数")
+    parser.add_argument("--runs", type=int, default=1, help="重复次数")
+    parser.add_argument("--compare-prefix-cache", action="store_true", help="分别测试开启/关闭前缀KV缓存")
+    parser.add_argument("--speculative", default="off", help="逗号分隔的推测解码模式（off/prompt_lookup/draft_model）")
+    parser.add_argument("--single", help=argparse.SUPPRESS)  # 子进程内部使用
+    args = parser.parse_args()
+    
+    # 模型和索引的加载过程通过日志输出
+    from src.utils.tracing import configure_logging
+    configure_logging()
+    
+    if args.single:
+        print(json.dumps(run_mode(args.single, args.max_tokens, args.runs)))
+        return
+    
+    prefix_settings = ["false", "true"] if args.compare_prefix_cache else [os.getenv("LLM_PREFIX_CACHE", "true")]
+    
+    results = []
+    settings = itertools.product(args.modes.split(","), prefix_settings, args.speculative.split(","))
+    for mode, prefix_cache, speculative in settings:
+        print(f"测试模式: {mode}（前缀缓存: {prefix_cache}，推测解码: {speculative}）...")
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--single", mode,
+             "--max-tokens", str(args.max_tokens), "--runs", str(args.runs)],
+            capture_output=True, text=True,
+            env=dict(os.environ, LLM_PREFIX_CACHE=prefix_cache, LLM_SPECULATIVE=speculative)
+        )
+        lines = [line for line in completed.stdout.splitlines() if line.startswith("{")]
+        if completed.returncode != 0 or not lines:
+            print(f"模式 {mode} 测试失败:\n{completed.stderr[-2000:]}")
+            continue
+        results.append(json.loads(lines[-1]))
+    
+    if not results:
+        return
+    
+    baseline = next((r for r in results if r["mode"] == "none"), results[0])
+    print(f"\n{'模式':<8}{'前缀缓存':>8}{'复用token':>10}{'推测解码':>14}{'接受率':>8}{'加载(s)':>10}{'模型内存(MB)':>14}"
+          f"{'峰值内存(MB)':>14}{'首token(ms)':>12}{'tokens/s':>10}{'加速比':>8}")
+    for r in results:
+        speedup = r["tokens_per_second"] / baseline["tokens_per_second"] if baseline["tokens_per_second"] else 0.0
+        print(f"{r['mode']:<8}{str(r['prefix_cache']):>8}{r['prefix_tokens_reused']:>10}{r['speculative']:>14}{r['acceptance_rate']:>8}"
+              f"{r['load_seconds']:>10}{r['model_rss_mb']:>14}{r['peak_rss_mb']:>14}{r['ttft_ms']:>12}"
+              f"{r['tokens_per_second']:>10}{speedup:>8.2f}")
+
+if __name__ == "__main__":
+    main()
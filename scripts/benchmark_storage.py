@@ -0,0 +1,342 @@
+"""
+反馈存储和知识检索在不同数据规模下的微基准测试
+
+对每个数据规模生成合成数据（见 src/feedback/synthetic.py），分别测量：
+- 反馈存储（json / sqlite）：加载、get_problem、get_similar_problems、get_feedback_for_solution、
+  get_feedback_for_problems、get_feedback_statistics 以及 add_problem/add_solution/add_feedback；
+- 问题语义索引：批量建索引的吞吐量和检索延迟；
+- 知识检索：KnowledgeRetriever.retrieve 在合成知识库规模下的延迟。
+
+默认使用特征哈希编码器（不需要模型，结果可以跨机器比较）；--encoder configured 使用配置的嵌入模型。
+新的存储或索引后端可以在相同的场景下比较:
+    python scripts/benchmark_storage.py --sizes 1000,10000,100000 --output storage-bench.json
+"""
+import os
+import sys
+import gc
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+from typing import List, Dict, Any, Callable
+
+# 将项目根目录加入导入路径
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from src.feedback.synthetic import generate_records, random_features, write_json_store, write_sqlite_store
+from src.knowledge.base import KnowledgeBase
+
+def rss_mb() -> float:
+    """当前进程的常驻内存（MB）"""
+    with open("/proc/self/status", "r") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def measure(fn: Callable[[int], Any], iterations: int, budget: float = 0.0) -> Dict[str, float]:
+    """调用fn(i) iterations次，返回吞吐量和延迟分位数（毫秒）
+    
+    budget大于0时，总耗时超过budget秒（且至少调用3次）后提前结束，count为实际调用次数。
+    """
+    latencies = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        call_start = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - call_start)
+        if budget > 0 and i >= 2 and time.perf_counter() - start > budget:
+            break
+    elapsed = time.perf_counter() - start
+    
+    latencies.sort()
+    
+    def pick(q: float) -> float:
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    
+    return {
+        "count": len(latencies),
+        "throughput": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99)
+    }
+
+class SyntheticKnowledge(KnowledgeBase):
+    """由真实知识条目派生的合成知识库（条目带编号和随机关键词，内容互不相同）"""
+    
+    def __init__(self, size: int, seed: int = 0):
+        self.size = size
+        self.seed = seed
+        self.items = []
+    
+    def load(self) -> bool:
+        from src.knowledge.algorithms import AlgorithmKnowledge
+        from src.feedback.synthetic import DATA_STRUCTURES, ALGORITHMS, PROBLEM_TYPES
+        
+        base = AlgorithmKnowledge()
+        base.load()
+        templates = base.get_items()
+        vocabulary = DATA_STRUCTURES + ALGORITHMS + PROBLEM_TYPES
+        rng = random.Random(self.seed)
+        
+        self.items = []
+        for i in range(self.size):
+            template = templates[i % len(templates)]
+            extra = rng.sample(vocabulary, 3)
+            self.items.append(dict(
+                template,
+                id=f"{template.get('id')}-{i}",
+                name=f"{template.get('name')} {i}",
+                description=f"{template.get('description', '')}，适用于{'、'.join(extra)}",
+                keywords=list(template.get("keywords", [])) + extra
+            ))
+        return True
+    
+    def get_items(self, category: str = None) -> List[Dict[str, Any]]:
+        if category:
+            return [item for item in self.items if item.get("category") == category]
+        return self.items
+    
+    def get_item_by_id(self, item_id: str) -> Dict[str, Any]:
+        return next((item for item in self.items if item.get("id") == item_id), None)
+
+def create_benchmark_encoder(name: str):
+    from src.knowledge.embeddings import HashingEncoder, create_encoder
+    from src.config import DEFAULT_EMBEDDING_MODEL
+    if name == "hashing":
+        return HashingEncoder()
+    return create_encoder(DEFAULT_EMBEDDING_MODEL)
+
+def prepare_store(backend: str, size: int, data_dir: Path, seed: int) -> Path:
+    """生成（或复用已生成的）合成存储"""
+    if backend == "json":
+        path = data_dir / f"json-{size}-{seed}"
+        if not (path / "index.json").exists():
+            start = time.perf_counter()
+            write_json_store(path, generate_records(size, seed=seed))
+            print(f"  生成JSON存储（{size}个问题）耗时 {time.perf_counter() - start:.1f}秒")
+    else:
+        path = data_dir / f"sqlite-{size}-{seed}.db"
+        if not path.exists():
+            start = time.perf_counter()
+            write_sqlite_store(path, generate_records(size, seed=seed))
+            print(f"  生成SQLite存储（{size}个问题）耗时 {time.perf_counter() - start:.1f}秒")
+    return path
+
+def open_store(backend: str, path: Path):
+    if backend == "json":
+        from src.feedback.storage import FeedbackStorage
+        return FeedbackStorage(feedback_dir=path)
+    from src.feedback.sqlite_storage import SQLiteFeedbackStorage
+    return SQLiteFeedbackStorage(path)
+
+def benchmark_storage(backend: str, size: int, data_dir: Path, reads: int, writes: int,
+                      seed: int, write_budget: float = 0.0) -> List[Dict[str, Any]]:
+    """测量一种存储后端在给定规模下各操作的性能"""
+    path = prepare_store(backend, size, data_dir, seed)
+    results = []
+    
+    def record(operation: str, stats: Dict[str, Any]):
+        results.append(dict(stats, component=f"storage:{backend}", size=size, operation=operation))
+    
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    storage = open_store(backend, path)
+    load_time = time.perf_counter() - start
+    record("load", {"count": 1, "throughput": 1 / load_time, "mean_ms": load_time * 1000,
+                    "p50_ms": load_time * 1000, "p95_ms": load_time * 1000, "p99_ms": load_time * 1000,
+                    "rss_mb": rss_mb() - rss_before})
+    
+    rng = random.Random(seed + 1)
+    problem_ids = rng.sample(storage.get_problem_ids(), min(reads, size))
+    solution_ids = [sid for pid in problem_ids for sid in storage.get_solutions_for_problem(pid)]
+    queries = [random_features(rng) for _ in range(reads)]
+    
+    record("get_problem", measure(lambda i: storage.get_problem(problem_ids[i % len(problem_ids)]), reads))
+    record("get_similar_problems", measure(lambda i: storage.get_similar_problems(queries[i], limit=5), reads))
+    if solution_ids:
+        record("get_feedback_for_solution", measure(
+            lambda i: storage.get_feedback_for_solution(solution_ids[i % len(solution_ids)]), reads
+        ))
+    record("get_feedback_for_problems", measure(
+        lambda i: storage.get_feedback_for_problems(rng.sample(problem_ids, min(5, len(problem_ids)))), reads
+    ))
+    record("get_feedback_statistics", measure(lambda i: storage.get_feedback_statistics(), max(1, reads // 10)))
+    
+    # 写操作：新问题、新解决方案、新反馈（每条反馈对应不同的解决方案，避免同一秒内ID重复）
+    new_problem_ids = []
+    new_solution_ids = []
+    
+    def add_problem(i):
+        text = f"基准测试新增问题 {seed}-{size}-{i}-{time.time()}"
+        new_problem_ids.append(storage.add_problem(text, random_features(rng)))
+    
+    def add_solution(i):
+        code = f"def bench_{i}():\n    return {time.time()}"
+        new_solution_ids.append(storage.add_solution(new_problem_ids[i % len(new_problem_ids)], code, "python", "基准测试"))
+    
+    record("add_problem", measure(add_problem, writes, write_budget))
+    record("add_solution", measure(add_solution, writes, write_budget))
+    record("add_feedback", measure(
+        lambda i: storage.add_feedback(new_solution_ids[i % len(new_solution_ids)], i % 3 != 0, "基准测试"),
+        writes, write_budget
+    ))
+    
+    del storage
+    gc.collect()
+    return results
+
+def benchmark_problem_index(size: int, encoder, work_dir: Path, reads: int, seed: int) -> List[Dict[str, Any]]:
+    """问题语义索引：批量建索引的吞吐量和检索延迟"""
+    from src.feedback.problem_index import ProblemEmbeddingIndex
+    
+    index_dir = Path(tempfile.mkdtemp(dir=work_dir))
+    index = ProblemEmbeddingIndex(
+        encoder.encode,
+        index_path=str(index_dir / "problem_index.faiss"),
+        ids_path=str(index_dir / "problem_ids.txt"),
+        save_every=10 ** 9
+    )
+    
+    batch_ids, batch_texts = [], []
+    texts = []
+    start = time.perf_counter()
+    for problem, _, _ in generate_records(size, seed=seed):
+        batch_ids.append(problem["id"])
+        batch_texts.append(problem["text"])
+        if len(texts) < reads:
+            texts.append(problem["text"])
+        if len(batch_ids) >= 1000:
+            index.add_many(batch_ids, batch_texts)
+            batch_ids, batch_texts = [], []
+    if batch_ids:
+        index.add_many(batch_ids, batch_texts)
+    build_time = time.perf_counter() - start
+    
+    results = [{
+        "component": "problem_index", "size": size, "operation": "build",
+        "count": size, "throughput": size / build_time, "mean_ms": build_time * 1000 / size,
+        "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0
+    }]
+    
+    # 查询嵌入预先计算，只测量索引本身的检索延迟
+    embeddings = encoder.encode(texts)
+    stats = measure(lambda i: index.search(texts[i % len(texts)], k=5, embedding=embeddings[i % len(texts)]), reads)
+    results.append(dict(stats, component="problem_index", size=size, operation="search"))
+    
+    shutil.rmtree(index_dir, ignore_errors=True)
+    return results
+
+def benchmark_knowledge(size: int, encoder, work_dir: Path, reads: int, seed: int,
+                        index_type: str = None) -> List[Dict[str, Any]]:
+    """知识检索：合成知识库上的retrieve延迟（包含查询编码，查询互不相同以避开嵌入缓存）"""
+    from src.knowledge.retriever import KnowledgeRetriever
+    
+    knowledge = SyntheticKnowledge(size, seed=seed)
+    knowledge.load()
+    index_dir = Path(tempfile.mkdtemp(dir=work_dir))
+    
+    start = time.perf_counter()
+    retriever = KnowledgeRetriever(
+        index_type=index_type, encoder=encoder, knowledge_base=knowledge, index_dir=str(index_dir)
+    )
+    build_time = time.perf_counter() - start
+    
+    queries = [problem["text"] for problem, _, _ in generate_records(reads, seed=seed + 2)]
+    results = [{
+        "component": "knowledge", "size": size, "operation": "build",
+        "count": size, "throughput": size / build_time, "mean_ms": build_time * 1000 / size,
+        "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "index_recall": retriever.index_recall
+    }]
+    stats = measure(lambda i: retriever.retrieve(queries[i], k=5), reads)
+    results.append(dict(stats, component="knowledge", size=size, operation="retrieve",
+                        lexical_fast_path_hits=retriever.lexical_fast_path_hits))
+    
+    del retriever
+    shutil.rmtree(index_dir, ignore_errors=True)
+    return results
+
+def print_results(results: List[Dict[str, Any]]):
+    print(f"\n{'组件':<16} {'规模':>9} {'操作':<26} {'ops/s':>11} {'p50':>9} {'p95':>9} {'p99':>9}  (ms)")
+    for row in results:
+        print(f"{row['component']:<16} {row['size']:>9} {row['operation']:<26} {row['throughput']:>11.1f} "
+              f"{row['p50_ms']:>9.3f} {row['p95_ms']:>9.3f} {row['p99_ms']:>9.3f}")
+
+def parse_sizes(value: str) -> List[int]:
+    return [int(float(size)) for size in value.split(",") if size.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="反馈存储和知识检索的规模基准测试")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="问题数量，逗号分隔（支持1e6写法）")
+    parser.add_argument("--backends", default="json,sqlite", help="要测试的存储后端，逗号分隔")
+    parser.add_argument("--reads", type=int, default=200, help="每个读操作的调用次数")
+    parser.add_argument("--writes", type=int, default=50, help="每个写操作的调用次数")
+    parser.add_argument("--write-budget", type=float, default=30.0,
+                        help="每个写操作的最长测量时间（秒），JSON存储每次写入都会重写索引，规模大时很慢")
+    parser.add_argument("--problem-index-max", type=int, default=100000,
+                        help="问题语义索引测试的最大规模（需要为每个问题计算嵌入），0表示跳过")
+    parser.add_argument("--knowledge-sizes", default="100,1000,10000", help="合成知识库的条目数，空字符串表示跳过")
+    parser.add_argument("--index-type", default=None, help="知识索引类型（flat/ivf/hnsw/ivfpq），默认使用配置")
+    parser.add_argument("--encoder", choices=["hashing", "configured"], default="hashing", help="嵌入编码器")
+    parser.add_argument("--data-dir", default="",
+                        help="保存生成数据的目录（可在多次运行间复用，写操作测试会向其中追加记录），默认使用临时目录")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="", help="JSON结果路径")
+    args = parser.parse_args()
+    
+    # 模型和索引的加载过程通过日志输出
+    from src.utils.tracing import configure_logging
+    configure_logging()
+    
+    sizes = parse_sizes(args.sizes)
+    backends = [backend.strip() for backend in args.backends.split(",") if backend.strip()]
+    work_dir = Path(tempfile.mkdtemp(prefix="leetcode-rag-storage-bench-"))
+    data_dir = Path(args.data_dir) if args.data_dir else work_dir
+    data_dir.mkdir(parents=True, exist_ok=True)
+    encoder = create_benchmark_encoder(args.encoder)
+    
+    results = []
+    try:
+        for size in sizes:
+            for backend in backends:
+                print(f"测试 {backend} 存储，{size} 个问题...")
+                results.extend(benchmark_storage(
+                    backend, size, data_dir, args.reads, args.writes, args.seed, args.write_budget
+                ))
+            if 0 < size <= args.problem_index_max:
+                print(f"测试问题语义索引，{size} 个问题...")
+                results.extend(benchmark_problem_index(size, encoder, work_dir, args.reads, args.seed))
+        
+        for size in parse_sizes(args.knowledge_sizes):
+            print(f"测试知识检索，{size} 个知识条目...")
+            results.extend(benchmark_knowledge(size, encoder, work_dir, args.reads, args.seed, args.index_type))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    print_results(results)
+    
+    if args.output:
+        report = {
+            "config": {
+                "sizes": sizes,
+                "backends": backends,
+                "reads": args.reads,
+                "writes": args.writes,
+                "encoder": encoder.model_id,
+                "index_type": args.index_type,
+                "seed": args.seed
+            },
+            "results": results
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+检查推测解码的输出与普通贪心解码完全一致
+
+对随机生成的提示，分别用 model.generate（贪心）和 speculative_generate
+（提示查找草稿、小模型草稿、以目标模型自身为草稿；有/无前缀KV缓存）生成，
+逐token比较。--threads 大于1时，小模型草稿的用例在多个线程中共享同一个drafter并发执行。
+默认使用随机初始化的小型Llama模型，不需要下载权重；--model 可以指定本地模型目录。
+有任何不一致时以非零状态退出。
+"""
+import os
+import sys
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# 将项目根目录加入导入路径
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+def tiny_llama(vocab_size: int, hidden_size: int, layers: int, seed: int):
+    """随机初始化的小型Llama模型"""
+    import torch
+    from transformers import LlamaConfig, LlamaForCausalLM
+    
+    torch.manual_seed(seed)
+    config = LlamaConfig(
+        vocab_size=vocab_size,
+        hidden_size=hidden_size,
+        intermediate_size=hidden_size * 2,
+        num_hidden_layers=layers,
+        num_attention_heads=4,
+        max_position_embeddings=4096
+    )
+    return LlamaForCausalLM(config).eval()
+
+def make_cases(count: int, vocab_size: int, seed: int) -> list:
+    """随机提示（后半段重复前半段，使提示查找有可接受的草稿），以提示中的某个token作为eos"""
+    rng = random.Random(seed)
+    cases = []
+    for i in range(count):
+        length = rng.randint(5, 60)
+        base = [rng.randrange(3, vocab_size) for _ in range(length)]
+        prompt = base + base[:length // 2]
+        cases.append({
+            "prompt": prompt,
+            "eos": prompt[-3],
+            # 一半用例从提示前缀的KV缓存开始
+            "prefix": length // 3 + 1 if i % 2 else 0
+        })
+    return cases
+
+def main():
+    parser = argparse.ArgumentParser(description="检查推测解码与贪心解码的输出是否一致")
+    parser.add_argument("--model", default="", help="本地模型目录，默认使用随机初始化的小模型")
+    parser.add_argument("--cases", type=int, default=30, help="随机提示数")
+    parser.add_argument("--max-tokens", type=int, default=40)
+    parser.add_argument("--threads", type=int, default=4, help="并发检查小模型草稿时的线程数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    import torch
+    from src.llm.speculative import speculative_generate, PromptLookupDrafter, DraftModelDrafter
+    
+    if args.model:
+        from transformers import AutoModelForCausalLM
+        model = AutoModelForCausalLM.from_pretrained(args.model, torch_dtype=torch.float32).eval()
+    else:
+        model = tiny_llama(1000, 64, 2, args.seed)
+    vocab_size = model.config.vocab_size
+    draft_model = tiny_llama(vocab_size, 32, 1, args.seed + 1)
+    
+    cases = make_cases(args.cases, vocab_size, args.seed)
+    with torch.no_grad():
+        for case in cases:
+            output = model.generate(
+                torch.tensor([case["prompt"]]),
+                max_new_tokens=args.max_tokens,
+                do_sample=False,
+                eos_token_id=case["eos"],
+                pad_token_id=0
+            )
+            case["reference"] = output[0, len(case["prompt"]):].tolist()
+    
+    drafters = {
+        "prompt_lookup": PromptLookupDrafter(num_tokens=5),
+        "draft_model": DraftModelDrafter(draft_model, num_tokens=3),
+        "self_draft": DraftModelDrafter(model, num_tokens=4)
+    }
+    
+    def run(drafter, case) -> bool:
+        past = None
+        if case["prefix"]:
+            with torch.no_grad():
+                past = model(torch.tensor([case["prompt"][:case["prefix"]]]), use_cache=True).past_key_values
+        generated = speculative_generate(
+            model, case["prompt"], drafter, args.max_tokens,
+            eos_token_id=case["eos"], past_key_values=past
+        )
+        return generated == case["reference"]
+    
+    failures = 0
+    total = 0
+    for name, drafter in drafters.items():
+        matched = sum(run(drafter, case) for case in cases)
+        total += len(cases)
+        failures += len(cases) - matched
+        print(f"{name:<16} {matched}/{len(cases)} 一致")
+    
+    # 多个线程共享同一个小模型drafter（INFERENCE_WORKERS > 1 时的情形）
+    if args.threads > 1:
+        drafter = drafters["draft_model"]
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            results = list(pool.map(lambda case: run(drafter, case), cases * 2))
+        matched = sum(results)
+        total += len(results)
+        failures += len(results) - matched
+        print(f"{'draft_model并发':<14} {matched}/{len(results)} 一致（{args.threads}个线程）")
+    
+    print(f"\n共 {total} 个用例，{failures} 个不一致")
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+离线比较快速特征提取器（关键词 + 相似历史问题投票）与LLM提取的特征
+
+以反馈存储中由LLM提取的问题特征（feature_source为"llm"）为参照，逐个问题用快速提取器预测，
+近邻投票时排除问题本身；特征来自快速路径的问题不作为参照。按不同置信度阈值统计快速路径覆盖率（省掉一次LLM调用的比例）、
+问题类型准确率以及数据结构/算法标签的F1。--relabel 会重新调用LLM生成参照特征。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+# 将项目根目录加入导入路径
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+THRESHOLDS = [0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]
+
+def label_counts(predicted: list, reference: list) -> tuple:
+    """返回 (命中数, 预测数, 参照数)"""
+    predicted, reference = set(predicted or []), set(reference or [])
+    return len(predicted & reference), len(predicted), len(reference)
+
+def f1(hits: int, predicted: int, reference: int) -> float:
+    precision = hits / predicted if predicted else 0.0
+    recall = hits / reference if reference else 0.0
+    return 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+def summarize(records: list, threshold: float) -> dict:
+    """统计置信度不低于threshold的预测"""
+    covered = [r for r in records if r["confidence"] >= threshold]
+    correct = sum(r["type_correct"] for r in covered)
+    hits = predicted = reference = 0
+    for r in covered:
+        hits += r["labels"][0]
+        predicted += r["labels"][1]
+        reference += r["labels"][2]
+    return {
+        "threshold": threshold,
+        "coverage": len(covered) / len(records) if records else 0.0,
+        "type_accuracy": correct / len(covered) if covered else 0.0,
+        "label_f1": f1(hits, predicted, reference)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="比较快速特征提取与LLM特征提取")
+    parser.add_argument("--limit", type=int, default=0, help="最多评估的问题数，0表示全部")
+    parser.add_argument("--relabel", action="store_true", help="重新调用LLM生成参照特征（较慢）")
+    parser.add_argument("--output", default="", help="把逐题结果和汇总写入JSON文件")
+    args = parser.parse_args()
+    
+    # 模型和索引的加载过程通过日志输出
+    from src.utils.tracing import configure_logging
+    configure_logging()
+    
+    from src.config import FEATURE_NEIGHBORS, FEATURE_NEIGHBOR_MIN_SIMILARITY
+    from src.knowledge.retriever import KnowledgeRetriever
+    from src.feedback.factory import create_feedback_storage
+    from src.feedback.problem_index import ProblemEmbeddingIndex
+    from src.llm.fast_features import FastFeatureExtractor
+    
+    retriever = KnowledgeRetriever()
+    storage = create_feedback_storage()
+    # 只读索引：评估过程不修改已持久化的问题索引
+    storage.attach_problem_index(ProblemEmbeddingIndex(retriever.embed_queries, read_only=True))
+    
+    llm = None
+    if args.relabel:
+        from src.llm.registry import create_llm
+        llm = create_llm()
+    
+    extractor = FastFeatureExtractor(
+        llm,
+        retriever.knowledge_base.get_items(),
+        storage=storage,
+        neighbors=FEATURE_NEIGHBORS,
+        min_similarity=FEATURE_NEIGHBOR_MIN_SIMILARITY
+    )
+    
+    problem_ids = storage.get_problem_ids()
+    if args.limit:
+        problem_ids = problem_ids[:args.limit]
+    
+    records = []
+    skipped = 0
+    fast_time = llm_time = 0.0
+    for problem_id in problem_ids:
+        problem = storage.get_problem(problem_id)
+        if not problem:
+            continue
+        
+        reference = problem.get("features") or {}
+        if llm is None and problem.get("feature_source", "llm") != "llm":
+            # 快速路径的预测不能作为参照，否则准确率是在和自己比较
+            skipped += 1
+            continue
+        if llm is not None:
+            start = time.perf_counter()
+            reference = llm.extract_features(problem["text"])
+            llm_time += time.perf_counter() - start
+        if reference.get("problem_type") in (None, "", "unknown"):
+            continue
+        
+        start = time.perf_counter()
+        predicted, confidence = extractor.predict(problem["text"], exclude=[problem_id])
+        fast_time += time.perf_counter() - start
+        
+        hits = [
+            label_counts(predicted[field], reference.get(field))
+            for field in ("data_structures", "algorithms")
+        ]
+        records.append({
+            "problem_id": problem_id,
+            "confidence": confidence,
+            "type_correct": predicted["problem_type"] == reference.get("problem_type"),
+            "labels": tuple(sum(values) for values in zip(*hits)),
+            "predicted": predicted,
+            "reference": reference
+        })
+    
+    if not records:
+        print("没有带有效特征的问题可供评估（可以使用 --relabel 重新生成参照特征）")
+        return
+    
+    summary = [summarize(records, threshold) for threshold in THRESHOLDS]
+    
+    print(f"评估问题数: {len(records)}")
+    if skipped:
+        print(f"跳过特征来自快速路径的问题: {skipped}（可以使用 --relabel 重新生成参照特征）")
+    print(f"快速提取平均耗时: {fast_time / len(records) * 1000:.2f}ms")
+    if llm is not None:
+        print(f"LLM提取平均耗时: {llm_time / len(records) * 1000:.2f}ms")
+    print(f"\n{'阈值':>6} {'覆盖率':>8} {'类型准确率':>10} {'标签F1':>8}")
+    for row in summary:
+        print(f"{row['threshold']:>6.2f} {row['coverage']:>8.1%} {row['type_accuracy']:>10.1%} {row['label_f1']:>8.3f}")
+    
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "records": records}, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+解题流水线的端到端基准测试与压测
+
+回放一个JSONL问题集（每行 {"problem": ..., "language": ...}），可以直接在进程内调用
+解题流水线（--mode direct），也可以请求运行中的API（--mode http，POST /api/solve）。
+统计各阶段（特征提取、历史检索、知识检索、生成、存储写入等）耗时的p50/p95/p99、
+吞吐量、生成速度（tokens/s）和峰值内存，结果写入JSON报告。
+
+使用桩LLM可以在没有模型的CPU环境中得到确定性的结果，用于发布前的回归检查:
+    LLM_BACKEND=stub LLM_STUB_TOKEN_MS=2 python scripts/evaluate_system.py --concurrency 4 \\
+        --output report.json --baseline baseline.json --max-regression 0.2
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+
+# 将项目根目录加入导入路径
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+DEFAULT_WORKLOAD = os.path.join(BASE_DIR, "data", "benchmark", "problems.jsonl")
+
+# 报告中各阶段的顺序（与PipelineContext.stage的名称一致）
+STAGES = ["cache", "embed", "extract_features", "storage", "history", "retrieve", "generate", "total"]
+
+def load_workload(path: str, repeat: int = 1) -> List[Dict[str, Any]]:
+    """读取问题集，每行一个JSON对象，至少包含problem字段"""
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            problem = record.get("problem") or record.get("text")
+            if problem:
+                items.append({"problem": problem, "language": record.get("language", "python")})
+    return items * repeat
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """均值、最大值和p50/p95/p99（毫秒）"""
+    if not values:
+        return {"count": 0, "mean": 0.0, "max": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0}
+    ordered = sorted(values)
+    
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered) * 1000,
+        "max": ordered[-1] * 1000,
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99)
+    }
+
+def peak_rss_mb(pid: Optional[int] = None) -> float:
+    """进程的峰值常驻内存（MB），pid为None时为当前进程"""
+    path = f"/proc/{pid or 'self'}/status"
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if pid is None:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return 0.0
+
+class DirectTarget:
+    """在当前进程中构建解题流水线并直接调用
+    
+    组件由API使用的同一个组件容器装配（LLM、检索器、缓存、特征提取器等），
+    默认只把反馈存储替换为临时目录中的SQLite存储和问题索引，不修改data/feedback中的数据。
+    """
+    
+    def __init__(self, use_cache: bool, temp_storage: bool = True):
+        from src.api.routes import components, attach_problem_index
+        from src.utils.tracing import configure_logging
+        
+        # 组件加载耗时通过日志输出
+        configure_logging()
+        
+        self.use_cache = use_cache
+        self.temp_dir = tempfile.mkdtemp(prefix="leetcode-rag-bench-") if temp_storage else None
+        
+        overrides = {}
+        if self.temp_dir:
+            def temp_feedback_storage(c):
+                from src.feedback.sqlite_storage import SQLiteFeedbackStorage
+                storage = SQLiteFeedbackStorage(db_path=os.path.join(self.temp_dir, "feedback.db"))
+                return attach_problem_index(storage, c.get("retriever"), index_dir=self.temp_dir)
+            overrides["feedback_storage"] = temp_feedback_storage
+        
+        start = time.perf_counter()
+        self.components = components.copy(overrides)
+        if not self.components.wait():
+            failed = {
+                name: info["error"]
+                for name, info in self.components.status()["components"].items()
+                if info["state"] != "ready"
+            }
+            raise RuntimeError(f"组件加载失败: {failed}")
+        self.llm = self.components.get("llm")
+        self.pipeline = self.components.get("pipeline")
+        self.setup_time = time.perf_counter() - start
+    
+    def describe(self) -> Dict[str, Any]:
+        return {"mode": "direct", "model_id": self.llm.model_id, "setup_seconds": self.setup_time}
+    
+    def solve(self, problem: str, language: str) -> Dict[str, Any]:
+        _, ctx = self.pipeline.run(problem, language, self.use_cache)
+        return {"timings": ctx.timing_breakdown(), "usage": ctx.usage, "cache_hit": ctx.cache_hit}
+    
+    def peak_rss_mb(self) -> float:
+        return peak_rss_mb()
+    
+    def close(self):
+        self.components.shutdown()
+        if self.temp_dir:
+            shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+class HttpTarget:
+    """请求运行中的API（POST /api/solve）"""
+    
+    def __init__(self, url: str, use_cache: bool, timeout: float, server_pid: Optional[int] = None):
+        import requests
+        from requests.adapters import HTTPAdapter
+        
+        self.url = url.rstrip("/")
+        self.use_cache = use_cache
+        self.timeout = timeout
+        self.server_pid = server_pid
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=64))
+    
+    def describe(self) -> Dict[str, Any]:
+        return {"mode": "http", "url": self.url, "server_pid": self.server_pid}
+    
+    def solve(self, problem: str, language: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        response = self.session.post(
+            f"{self.url}/api/solve",
+            json={"problem": problem, "language": language, "use_cache": self.use_cache},
+            timeout=self.timeout
+        )
+        elapsed = time.perf_counter() - start
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+        
+        body = response.json()
+        timings = dict(body.get("timings") or {})
+        # 客户端测得的延迟包含排队和网络时间
+        timings["client_total"] = elapsed
+        return {"timings": timings, "usage": body.get("usage"), "cache_hit": body.get("cache_hit")}
+    
+    def peak_rss_mb(self) -> float:
+        return peak_rss_mb(self.server_pid) if self.server_pid else 0.0
+    
+    def close(self):
+        self.session.close()
+
+def run_load(target, workload: List[Dict[str, Any]], concurrency: int) -> Dict[str, Any]:
+    """以给定并发回放问题集，收集每个请求的结果"""
+    results = []
+    errors = []
+    lock = threading.Lock()
+    
+    def task(item):
+        try:
+            result = target.solve(item["problem"], item["language"])
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+            return
+        with lock:
+            results.append(result)
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(task, workload))
+    return {"results": results, "errors": errors, "wall_time": time.perf_counter() - start}
+
+def build_report(run: Dict[str, Any], target, config: Dict[str, Any]) -> Dict[str, Any]:
+    """汇总各阶段耗时分位数、吞吐量、生成速度和内存"""
+    results = run["results"]
+    
+    stage_values: Dict[str, List[float]] = {}
+    for result in results:
+        for stage, seconds in result["timings"].items():
+            stage_values.setdefault(stage, []).append(seconds)
+    ordered = [stage for stage in STAGES + ["client_total"] if stage in stage_values]
+    ordered += sorted(stage for stage in stage_values if stage not in ordered)
+    
+    # 生成速度：只统计返回了token数的请求（缓存命中和不统计token的后端除外）
+    completion_tokens = 0
+    generate_time = 0.0
+    early_stops = 0
+    for result in results:
+        usage = result.get("usage") or {}
+        if usage.get("completion_tokens") is not None:
+            completion_tokens += usage["completion_tokens"]
+            generate_time += result["timings"].get("generate", 0.0)
+        if usage.get("stop_reason") == "stop":
+            early_stops += 1
+    
+    total = len(results) + len(run["errors"])
+    return {
+        "config": config,
+        "target": target.describe(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "requests": total,
+        "succeeded": len(results),
+        "errors": len(run["errors"]),
+        "error_samples": run["errors"][:5],
+        "cache_hits": sum(1 for result in results if result.get("cache_hit")),
+        "wall_time": run["wall_time"],
+        "throughput_rps": len(results) / run["wall_time"] if run["wall_time"] > 0 else 0.0,
+        "latency_ms": {stage: percentiles(stage_values[stage]) for stage in ordered},
+        "generation": {
+            "completion_tokens": completion_tokens,
+            "tokens_per_sec": completion_tokens / generate_time if generate_time > 0 else 0.0,
+            "early_stops": early_stops
+        },
+        "memory": {"peak_rss_mb": target.peak_rss_mb()}
+    }
+
+def compare_with_baseline(report: Dict[str, Any], baseline: Dict[str, Any],
+                          max_regression: float, min_delta_ms: float = 5.0) -> List[str]:
+    """与基线报告比较，返回超过允许退化比例的指标
+    
+    耗时的增加还必须超过min_delta_ms，避免亚毫秒级阶段的抖动被当作退化。
+    """
+    failures = []
+    
+    for stage, stats in report["latency_ms"].items():
+        base = baseline.get("latency_ms", {}).get(stage)
+        if not base:
+            continue
+        for key in ("p50", "p95"):
+            limit = max(base[key] * (1 + max_regression), base[key] + min_delta_ms)
+            if base[key] > 0 and stats[key] > limit:
+                failures.append(f"{stage} {key}: {stats[key]:.1f}ms（基线 {base[key]:.1f}ms）")
+    
+    base_rps = baseline.get("throughput_rps", 0.0)
+    if base_rps > 0 and report["throughput_rps"] < base_rps * (1 - max_regression):
+        failures.append(f"吞吐量: {report['throughput_rps']:.2f} req/s（基线 {base_rps:.2f}）")
+    
+    if report["errors"] > baseline.get("errors", 0):
+        failures.append(f"错误数: {report['errors']}（基线 {baseline.get('errors', 0)}）")
+    return failures
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n请求: {report['succeeded']}/{report['requests']} 成功，"
+          f"缓存命中 {report['cache_hits']}，耗时 {report['wall_time']:.2f}秒，"
+          f"吞吐量 {report['throughput_rps']:.2f} req/s")
+    print(f"\n{'阶段':<18} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}  (ms)")
+    for stage, stats in report["latency_ms"].items():
+        print(f"{stage:<18} {stats['mean']:>9.1f} {stats['p50']:>9.1f} {stats['p95']:>9.1f} "
+              f"{stats['p99']:>9.1f} {stats['max']:>9.1f}")
+    generation = report["generation"]
+    print(f"\n生成: {generation['completion_tokens']} tokens，{generation['tokens_per_sec']:.1f} tokens/s，"
+          f"提前停止 {generation['early_stops']} 次")
+    print(f"峰值内存: {report['memory']['peak_rss_mb']:.0f}MB")
+    if report["error_samples"]:
+        print(f"错误示例: {report['error_samples'][0]}")
+
+def main():
+    parser = argparse.ArgumentParser(description="解题流水线的端到端基准测试")
+    parser.add_argument("--workload", default=DEFAULT_WORKLOAD, help="问题集JSONL文件")
+    parser.add_argument("--mode", choices=["direct", "http"], default="direct")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="http模式下的API地址")
+    parser.add_argument("--server-pid", type=int, default=None, help="http模式下统计该进程的峰值内存")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=1, help="问题集重复次数")
+    parser.add_argument("--warmup", type=int, default=1, help="不计入统计的预热请求数")
+    parser.add_argument("--use-cache", action="store_true", help="允许命中解决方案缓存（默认跳过缓存）")
+    parser.add_argument("--live-storage", action="store_true", help="direct模式下使用真实的反馈存储")
+    parser.add_argument("--timeout", type=float, default=600.0, help="http模式下单个请求的超时（秒）")
+    parser.add_argument("--output", default="", help="JSON报告路径")
+    parser.add_argument("--baseline", default="", help="基线报告路径，指标退化超过阈值时以非零状态退出")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="允许的退化比例")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="耗时增加不超过该值（毫秒）时不视为退化")
+    args = parser.parse_args()
+    
+    workload = load_workload(args.workload, args.repeat)
+    if not workload:
+        print(f"问题集为空: {args.workload}")
+        sys.exit(1)
+    
+    if args.mode == "direct":
+        target = DirectTarget(args.use_cache, temp_storage=not args.live_storage)
+    else:
+        target = HttpTarget(args.url, args.use_cache, args.timeout, args.server_pid)
+    
+    try:
+        if args.warmup > 0:
+            print(f"预热 {args.warmup} 个请求...")
+            run_load(target, workload[:args.warmup], 1)
+        
+        print(f"回放 {len(workload)} 个请求（并发 {args.concurrency}）...")
+        run = run_load(target, workload, args.concurrency)
+        config = {
+            "workload": args.workload,
+            "concurrency": args.concurrency,
+            "repeat": args.repeat,
+            "warmup": args.warmup,
+            "use_cache": args.use_cache,
+            "llm_backend": os.getenv("LLM_BACKEND", "transformers")
+        }
+        report = build_report(run, target, config)
+    finally:
+        target.close()
+    
+    print_report(report)
+    
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n报告已写入: {args.output}")
+    
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        failures = compare_with_baseline(report, baseline, args.max_regression, args.min_delta_ms)
+        if failures:
+            print("\n相对基线的退化:")
+            for failure in failures:
+                print(f"  {failure}")
+            sys.exit(1)
+        print("\n未发现超过阈值的退化")
+
+if __name__ == "__main__":
+    main()
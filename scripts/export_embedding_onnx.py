@@ -0,0 +1,80 @@
+"""
+把句向量模型导出为ONNX（可选动态int8量化），并检查与PyTorch输出的余弦一致性
+"""
+import os
+import sys
+import time
+import argparse
+
+# 将项目根目录加入导入路径
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from src.config import DEFAULT_EMBEDDING_MODEL, EMBEDDING_ONNX_DIR
+from src.knowledge.algorithms import AlgorithmKnowledge
+from src.knowledge.embeddings import (
+    SentenceTransformerEncoder, OnnxEncoder, export_onnx, onnx_export_dir, cosine_agreement
+)
+
+SAMPLE_TEXTS = [
+    "给定一个整数数组 nums 和一个目标值 target，请你在该数组中找出和为目标值的两个整数。",
+    "Given a string s, find the length of the longest substring without repeating characters.",
+    "给你一个链表，删除链表的倒数第 n 个结点，并且返回链表的头结点。",
+    "Find the kth largest element in an unsorted array.",
+]
+
+def load_texts() -> list:
+    """知识库条目文本 + 示例问题"""
+    knowledge = AlgorithmKnowledge()
+    knowledge.load()
+    texts = [
+        f"{item.get('name', '')} {item.get('description', '')} {' '.join(item.get('keywords', []))}"
+        for item in knowledge.get_items()
+    ]
+    return texts + SAMPLE_TEXTS
+
+def timed_encode(encoder, texts, repeat: int = 5):
+    """编码并返回 (嵌入, 单次平均耗时毫秒)"""
+    embeddings = encoder.encode(texts)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        encoder.encode(texts)
+    return embeddings, (time.perf_counter() - start) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="导出ONNX句向量模型")
+    parser.add_argument("--model", default=DEFAULT_EMBEDDING_MODEL, help="Hugging Face模型名")
+    parser.add_argument("--output-dir", default=str(EMBEDDING_ONNX_DIR), help="导出根目录")
+    parser.add_argument("--quantize", action="store_true", help="同时生成动态int8量化模型")
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="与PyTorch输出的最低余弦相似度")
+    args = parser.parse_args()
+    
+    # 模型和索引的加载过程通过日志输出
+    from src.utils.tracing import configure_logging
+    configure_logging()
+    
+    export_dir = onnx_export_dir(args.output_dir, args.model)
+    export_onnx(args.model, export_dir, quantize=args.quantize)
+    
+    texts = load_texts()
+    reference, reference_ms = timed_encode(SentenceTransformerEncoder(args.model), texts)
+    print(f"PyTorch: {len(texts)}条文本 {reference_ms:.1f}ms")
+    
+    ok = True
+    for quantize in ([False, True] if args.quantize else [False]):
+        encoder = OnnxEncoder(args.model, export_dir, quantize=quantize)
+        embeddings, elapsed_ms = timed_encode(encoder, texts)
+        agreement = cosine_agreement(reference, embeddings)
+        print(f"{encoder.model_id}: {elapsed_ms:.1f}ms，"
+              f"余弦一致性 min={agreement['min']:.4f} mean={agreement['mean']:.4f}")
+        if agreement["min"] < args.min_cosine:
+            print(f"警告: {encoder.model_id} 的最低余弦相似度低于 {args.min_cosine}")
+            ok = False
+    
+    if ok:
+        print(f"导出完成: {export_dir}")
+        print("设置 EMBEDDING_BACKEND=onnx（可选 EMBEDDING_ONNX_QUANTIZE=true）启用ONNX后端")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+生成合成的反馈数据（问题、解决方案、反馈），用于存储和检索的规模测试
+
+JSON格式与 data/feedback 的目录结构相同，可以通过 FeedbackStorage(feedback_dir=...) 加载；
+SQLite格式可以通过 FEEDBACK_BACKEND=sqlite FEEDBACK_DB_PATH=... 使用。
+同一个 --seed 生成的数据完全相同。
+    
+    python scripts/generate_feedback_data.py --problems 100000 --output /tmp/feedback-1e5
+    python scripts/generate_feedback_data.py --problems 1000000 --format sqlite --output /tmp/feedback-1e6.db
+"""
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# 将项目根目录加入导入路径
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from src.config import FEEDBACK_DIR
+from src.feedback.synthetic import generate_records, write_json_store, write_sqlite_store
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成反馈数据")
+    parser.add_argument("--problems", type=int, default=10000, help="问题数量")
+    parser.add_argument("--solutions-per-problem", type=float, default=2.0, help="每个问题的平均解决方案数")
+    parser.add_argument("--feedback-per-solution", type=float, default=2.0, help="每个解决方案的平均反馈数")
+    parser.add_argument("--positive-rate", type=float, default=0.7, help="正面反馈的比例")
+    parser.add_argument("--format", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--output", required=True, help="JSON存储目录或SQLite数据库路径")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    output = Path(args.output).resolve()
+    if output == FEEDBACK_DIR.resolve() or output == FEEDBACK_DIR.resolve() / "feedback.db":
+        print(f"不能写入正在使用的反馈存储: {output}")
+        sys.exit(1)
+    
+    records = generate_records(
+        args.problems,
+        solutions_per_problem=args.solutions_per_problem,
+        feedback_per_solution=args.feedback_per_solution,
+        positive_rate=args.positive_rate,
+        seed=args.seed
+    )
+    
+    start = time.perf_counter()
+    try:
+        if args.format == "json":
+            counts = write_json_store(output, records)
+        else:
+            counts = write_sqlite_store(output, records)
+    except FileExistsError as e:
+        print(str(e))
+        sys.exit(1)
+    
+    print(f"已生成 {counts['problems']} 个问题, {counts['solutions']} 个解决方案, "
+          f"{counts['feedback']} 条反馈，耗时 {time.perf_counter() - start:.1f}秒: {output}")
+
+if __name__ == "__main__":
+    main()
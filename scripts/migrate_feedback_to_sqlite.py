@@ -0,0 +1,71 @@
+"""
+将 data/feedback 下的JSON文件存储一次性迁移到SQLite
+"""
+import os
+import sys
+import json
+import argparse
+from pathlib import Path
+
+# 将项目根目录加入导入路径
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from src.config import FEEDBACK_DIR, FEEDBACK_DB_PATH
+from src.feedback.sqlite_storage import SQLiteFeedbackStorage
+
+def load_entities(directory: Path, ids) -> list:
+    """读取实体JSON文件，缺失的文件跳过"""
+    entities = []
+    missing = 0
+    for entity_id in ids:
+        path = directory / f"{entity_id}.json"
+        if not path.exists():
+            missing += 1
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            entities.append(json.load(f))
+    if missing:
+        print(f"警告: {directory.name} 中缺少 {missing} 个文件，已跳过")
+    return entities
+
+def migrate(feedback_dir: Path, db_path: Path):
+    """执行迁移"""
+    index_path = feedback_dir / "index.json"
+    if not index_path.exists():
+        print(f"未找到索引文件: {index_path}")
+        return False
+    
+    with open(index_path, 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    
+    problems = load_entities(feedback_dir / "problems", index.get("problems", {}).keys())
+    solutions = load_entities(feedback_dir / "solutions", index.get("solutions", {}).keys())
+    
+    # 反馈文件缺失时用索引中的信息补齐（索引里没有评论内容）
+    feedbacks = []
+    for feedback_id, feedback_info in index.get("feedback", {}).items():
+        path = feedback_dir / "feedback" / f"{feedback_id}.json"
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                feedbacks.append(json.load(f))
+        else:
+            feedbacks.append(dict(feedback_info, comment=None))
+    
+    print(f"读取到 {len(problems)} 个问题, {len(solutions)} 个解决方案, {len(feedbacks)} 条反馈")
+    
+    storage = SQLiteFeedbackStorage(db_path)
+    imported = storage.import_records(problems, solutions, feedbacks)
+    print(f"已导入: {imported}（已存在的记录会被跳过，可重复运行）")
+    print(f"迁移完成: {db_path}")
+    print("设置环境变量 FEEDBACK_BACKEND=sqlite 以启用SQLite存储")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="将JSON反馈存储迁移到SQLite")
+    parser.add_argument("--feedback-dir", default=str(FEEDBACK_DIR), help="JSON存储目录")
+    parser.add_argument("--db-path", default=str(FEEDBACK_DB_PATH), help="SQLite数据库路径")
+    args = parser.parse_args()
+    
+    success = migrate(Path(args.feedback_dir), Path(args.db_path))
+    sys.exit(0 if success else 1)
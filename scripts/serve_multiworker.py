@@ -0,0 +1,96 @@
+"""
+多工作进程部署：一个模型服务进程 + N个uvicorn API工作进程
+
+模型服务进程独占LLM和嵌入模型（以及问题语义索引），API工作进程以
+LLM_BACKEND=ipc、EMBEDDING_BACKEND=ipc 启动，通过Unix套接字调用模型服务，
+增加工作进程不会重复加载模型权重。
+JSON反馈存储的索引只保存在各进程的内存中，多个进程同时写入会互相覆盖，
+因此模型服务和工作进程都使用 FEEDBACK_BACKEND=sqlite
+（已有的JSON数据可以用 scripts/migrate_feedback_to_sqlite.py 迁移）。
+"""
+import os
+import sys
+import time
+import signal
+import argparse
+import subprocess
+
+# 将项目根目录加入导入路径
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from src.config import HOST, PORT, MODEL_SERVER_SOCKET
+
+def wait_for_server(process: subprocess.Popen, socket_path: str, timeout: float) -> bool:
+    """等待模型服务加载完成并开始监听"""
+    from src.serving.client import ModelServerClient, ModelServerError
+    
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            return False
+        if os.path.exists(socket_path):
+            try:
+                client = ModelServerClient(socket_path, connect_timeout=0)
+                info = client.call("info")
+                client.close()
+                print(f"模型服务已就绪: {info}")
+                return True
+            except (ModelServerError, OSError):
+                pass
+        time.sleep(1.0)
+    return False
+
+def main():
+    parser = argparse.ArgumentParser(description="以共享模型服务的方式启动多个API工作进程")
+    parser.add_argument("--workers", type=int, default=4, help="API工作进程数")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--socket", default=MODEL_SERVER_SOCKET, help="模型服务的Unix套接字路径")
+    parser.add_argument("--timeout", type=float, default=600.0, help="等待模型加载的最长时间（秒）")
+    args = parser.parse_args()
+    
+    if os.environ.get("FEEDBACK_BACKEND", "sqlite").lower() != "sqlite":
+        print("多工作进程部署需要 FEEDBACK_BACKEND=sqlite（JSON存储不支持多进程同时写入）")
+        sys.exit(1)
+    
+    env = dict(os.environ, MODEL_SERVER_SOCKET=args.socket, FEEDBACK_BACKEND="sqlite")
+    # 收到SIGTERM时同样走下面的清理流程，停止子进程
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    
+    print("启动模型服务进程...")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "src.serving.model_server", "--socket", args.socket],
+        cwd=BASE_DIR, env=env
+    )
+    
+    if not wait_for_server(server, args.socket, args.timeout):
+        print("模型服务启动失败")
+        server.terminate()
+        sys.exit(1)
+    
+    worker_env = dict(env, LLM_BACKEND="ipc", EMBEDDING_BACKEND="ipc")
+    print(f"启动 {args.workers} 个API工作进程: http://{args.host}:{args.port}")
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app",
+         "--host", args.host, "--port", str(args.port), "--workers", str(args.workers)],
+        cwd=BASE_DIR, env=worker_env
+    )
+    
+    try:
+        while api.poll() is None and server.poll() is None:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # 先停止API工作进程，再停止模型服务（模型服务退出时保存问题索引）
+        for process in (api, server):
+            if process.poll() is None:
+                process.send_signal(signal.SIGINT)
+                try:
+                    process.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,18 @@
 """
 下载DeepSeek-Coder模型（简化版，无量化）
+
+使用 --quantize int8 额外生成CPU推理用的动态int8量化模型（LLM_QUANTIZATION=int8）
 """
 import os
 import torch
+import argparse
 from transformers import AutoModelForCausalLM, AutoTokenizer
 import sys
 
+# 将项目根目录加入导入路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.llm.quantization import quantize_dynamic_int8, save_int8_model, int8_artifact_path
+
 # 减少日志输出
 from transformers.utils import logging as transformers_logging
 transformers_logging.set_verbosity_error()
@@ -41,7 +48,29 @@ def download_model(model_name, output_dir):
         print(f"下载模型时出错: {str(e)}")
         return False
 
+def quantize_model(output_dir):
+    """加载已下载的模型，做动态int8量化并保存"""
+    print("加载fp32模型并进行动态int8量化...")
+    try:
+        model = AutoModelForCausalLM.from_pretrained(
+            output_dir,
+            torch_dtype=torch.float32,
+            low_cpu_mem_usage=True,
+            trust_remote_code=True
+        )
+        path = save_int8_model(quantize_dynamic_int8(model), output_dir)
+        print(f"int8模型已保存到: {path}")
+        return True
+    except Exception as e:
+        print(f"量化模型时出错: {str(e)}")
+        return False
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="下载DeepSeek-Coder模型")
+    parser.add_argument("--quantize", choices=["none", "int8"], default="none", 
+                        help="额外生成CPU推理用的量化模型")
+    args = parser.parse_args()
+    
     # 获取当前脚本所在目录
     script_dir = os.path.dirname(os.path.abspath(__file__))
     # 获取项目根目录
@@ -54,7 +83,15 @@ if __name__ == "__main__":
     model_name = "deepseek-ai/deepseek-coder-1.3b-instruct"
     output_dir = os.path.join(models_dir, "deepseek-coder-1.3b-instruct")
     
-    success = download_model(model_name, output_dir)
+    if os.path.exists(os.path.join(output_dir, "config.json")):
+        print(f"模型已存在: {output_dir}")
+        success = True
+    else:
+        success = download_model(model_name, output_dir)
+    
+    if success and args.quantize == "int8" and not int8_artifact_path(output_dir).exists():
+        success = quantize_model(output_dir)
+    
     if success:
         print("模型下载完成！系统准备就绪。")
     else:
@@ -0,0 +1,104 @@
+"""
+OpenAI兼容推理服务的本地桩服务器，用于在没有模型的环境中联调 LLM_BACKEND=openai
+
+返回固定的推理过程和代码块，支持 /v1/models 与 /v1/chat/completions（含stream）。
+"""
+import json
+import time
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_RESPONSE = """### 思路
+使用哈希表记录已经出现过的数字及其下标，一次遍历即可。
+
+```python
+def solve(nums, target):
+    seen = {}
+    for i, num in enumerate(nums):
+        if target - num in seen:
+            return [seen[target - num], i]
+        seen[num] = i
+    return []
+```
+"""
+
+FEATURES_RESPONSE = json.dumps({
+    "problem_type": "数组",
+    "difficulty": "简单",
+    "data_structures": ["哈希表"],
+    "algorithms": ["哈希"]
+}, ensure_ascii=False)
+
+class StubHandler(BaseHTTPRequestHandler):
+    model = "stub"
+    delay = 0.0
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def do_GET(self):
+        if self.path == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [{"id": self.model, "object": "model"}]})
+        else:
+            self._send_json(404, {"error": "not found"})
+    
+    def do_POST(self):
+        if self.path != "/v1/chat/completions":
+            self._send_json(404, {"error": "not found"})
+            return
+        
+        length = int(self.headers.get("Content-Length", "0"))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        prompt = request.get("messages", [{}])[-1].get("content", "")
+        text = FEATURES_RESPONSE if "JSON" in prompt else STUB_RESPONSE
+        time.sleep(self.delay)
+        
+        if request.get("stream"):
+            self._stream(text)
+        else:
+            self._send_json(200, {
+                "id": "stub-completion",
+                "object": "chat.completion",
+                "model": self.model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(prompt), "completion_tokens": len(text)}
+            })
+    
+    def _stream(self, text: str):
+        """按行以SSE格式返回"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.end_headers()
+        for piece in text.splitlines(keepends=True):
+            chunk = {"object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {"content": piece}}]}
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI兼容推理服务桩")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--model", default="deepseek-coder-1.3b-instruct")
+    parser.add_argument("--delay", type=float, default=0.0, help="每个请求的模拟延迟（秒）")
+    args = parser.parse_args()
+    
+    StubHandler.model = args.model
+    StubHandler.delay = args.delay
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"桩服务器已启动: http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import time
+import logging
+import threading
+from typing import Dict, Any, Callable, List, Optional, Sequence
+from src.utils.metrics import COMPONENT_LOAD_SECONDS, COMPONENT_READY
+from src.utils.tracing import fields
+
+logger = logging.getLogger(__name__)
+
+# 组件状态
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+class ComponentNotReadyError(Exception):
+    """组件尚未加载完成或加载失败，需要客户端稍后重试"""
+    
+    def __init__(self, message: str, retry_after: int = 10):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class _Component:
+    """一个已注册的组件"""
+    
+    def __init__(self, name: str, factory: Callable, depends: Sequence[str], close: Optional[Callable]):
+        self.name = name
+        self.factory = factory
+        self.depends = list(depends)
+        self.close = close
+        self.instance = None
+        self.state = PENDING
+        self.error: Optional[str] = None
+        self.seconds: Optional[float] = None
+        self.done = threading.Event()
+
+class ComponentContainer:
+    """应用组件容器 - 在后台按依赖顺序加载模型、索引和存储
+    
+    组件通过component装饰器注册，构造函数接收容器本身，用get取得依赖的组件。
+    没有依赖关系的组件（例如LLM和嵌入模型）在各自的线程中并行加载。
+    每个组件有 pending/loading/ready/failed 状态和加载耗时，供 /health/ready 查询。
+    torch、transformers、faiss等重量级依赖只在构造函数中导入，导入应用本身不会加载它们。
+    """
+    
+    def __init__(self):
+        self._components: Dict[str, _Component] = {}
+        self._lock = threading.Lock()
+        self._started = False
+        self._started_at: Optional[float] = None
+        self._threads: List[threading.Thread] = []
+    
+    def component(self, name: str, depends: Sequence[str] = (), close: Optional[Callable] = None):
+        """注册组件的装饰器；close在关闭应用时以组件实例为参数调用"""
+        def decorator(factory: Callable) -> Callable:
+            unknown = [dep for dep in depends if dep not in self._components]
+            if unknown:
+                raise ValueError(f"组件 {name} 依赖未注册的组件: {', '.join(unknown)}")
+            self._components[name] = _Component(name, factory, depends, close)
+            COMPONENT_READY.set(0, component=name)
+            return factory
+        return decorator
+    
+    def copy(self, overrides: Optional[Dict[str, Callable]] = None) -> "ComponentContainer":
+        """复制组件注册（不包含已加载的实例），overrides按名称替换个别组件的构造函数
+        
+        用于在与应用相同的组件装配下替换部分组件，例如基准测试使用临时存储。
+        """
+        overrides = overrides or {}
+        unknown = [name for name in overrides if name not in self._components]
+        if unknown:
+            raise ValueError(f"未注册的组件: {', '.join(unknown)}")
+        
+        container = ComponentContainer()
+        for name, component in self._components.items():
+            container.component(name, depends=component.depends, close=component.close)(
+                overrides.get(name, component.factory)
+            )
+        return container
+    
+    def start(self):
+        """开始加载所有组件（立即返回，重复调用无效）"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._started_at = time.perf_counter()
+        
+        logger.info("开始加载组件", extra=fields(components=",".join(self._components)))
+        for component in self._components.values():
+            thread = threading.Thread(
+                target=self._load, args=(component,),
+                name=f"load-{component.name}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待所有组件加载结束（成功或失败），返回是否全部就绪"""
+        self.start()
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        for component in self._components.values():
+            remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            if not component.done.wait(remaining):
+                return False
+        return self.is_ready()
+    
+    def _load(self, component: _Component):
+        """等待依赖加载完成后构造组件"""
+        try:
+            for dep in component.depends:
+                self._components[dep].done.wait()
+                if self._components[dep].state != READY:
+                    raise RuntimeError(f"依赖的组件 {dep} 加载失败")
+            
+            component.state = LOADING
+            start = time.perf_counter()
+            component.instance = component.factory(self)
+            component.seconds = time.perf_counter() - start
+            component.state = READY
+            COMPONENT_LOAD_SECONDS.set(component.seconds, component=component.name)
+            logger.info("组件加载完成", extra=fields(
+                component=component.name, seconds=round(component.seconds, 3)
+            ))
+        except Exception as e:
+            component.error = str(e)
+            component.state = FAILED
+            logger.exception("组件加载失败", extra=fields(component=component.name))
+        finally:
+            COMPONENT_READY.set(1 if component.state == READY else 0, component=component.name)
+            with self._lock:
+                component.done.set()
+                all_done = all(c.done.is_set() for c in self._components.values())
+            if all_done and self.is_ready():
+                logger.info("所有组件加载完成", extra=fields(
+                    seconds=round(time.perf_counter() - self._started_at, 3)
+                ))
+    
+    def get(self, name: str) -> Any:
+        """获取已就绪的组件，未就绪时抛出ComponentNotReadyError（尚未开始加载时触发加载）"""
+        self.start()
+        component = self._components[name]
+        if component.state == READY:
+            return component.instance
+        if component.state == FAILED:
+            raise ComponentNotReadyError(f"组件 {name} 加载失败: {component.error}", retry_after=60)
+        raise ComponentNotReadyError(f"组件 {name} 正在加载，请稍后重试")
+    
+    def get_if_ready(self, name: str) -> Any:
+        """获取已就绪的组件，未就绪时返回None（不触发加载）"""
+        component = self._components[name]
+        return component.instance if component.state == READY else None
+    
+    def is_ready(self) -> bool:
+        """所有组件是否都已就绪"""
+        return all(component.state == READY for component in self._components.values())
+    
+    def status(self) -> Dict[str, Any]:
+        """各组件的状态和加载耗时"""
+        return {
+            "ready": self.is_ready(),
+            "started": self._started,
+            "components": {
+                name: {
+                    "state": component.state,
+                    "seconds": component.seconds,
+                    "error": component.error
+                }
+                for name, component in self._components.items()
+            }
+        }
+    
+    def shutdown(self):
+        """按注册的逆序关闭已就绪的组件"""
+        for component in reversed(list(self._components.values())):
+            if component.state != READY or component.close is None:
+                continue
+            try:
+                component.close(component.instance)
+            except Exception as e:
+                logger.warning("关闭组件失败: %s", e, extra=fields(component=component.name))
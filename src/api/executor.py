@@ -0,0 +1,194 @@
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, AsyncIterator
+
+# 流结束标记
+_END = object()
+
+class ExecutorSaturatedError(Exception):
+    """推理队列已满，需要客户端稍后重试"""
+    
+    def __init__(self, message: str, retry_after: int = 5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class InferenceExecutor:
+    """推理执行器 - 有界工作线程池 + 队列深度限制
+    
+    同步的模型推理（torch generate、SentenceTransformer encode）放到专用线程池中执行，
+    避免阻塞asyncio事件循环；排队请求超过上限时直接拒绝，而不是无限堆积。
+    """
+    
+    def __init__(self, max_workers: int = 1, max_queue: int = 8, window: int = 1000):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        
+        # 队列状态
+        self._queued = 0
+        self._running = 0
+        
+        # 统计信息
+        self._submitted = 0
+        self._started = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._recent_waits = deque(maxlen=window)
+        self._recent_runs = deque(maxlen=window)
+    
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """在推理线程池中执行函数，队列满时抛出ExecutorSaturatedError"""
+        self._acquire()
+        enqueued_at = time.perf_counter()
+        
+        def task():
+            started_at = self._on_start(enqueued_at)
+            success = False
+            try:
+                result = fn(*args, **kwargs)
+                success = True
+                return result
+            finally:
+                self._on_finish(started_at, success)
+        
+        # 在调用方的上下文副本中执行，请求ID等上下文变量随之传递到工作线程
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, contextvars.copy_context().run, task)
+    
+    def stream(self, gen_fn: Callable, *args, **kwargs) -> AsyncIterator[Any]:
+        """在推理线程池中执行生成器函数，产出的元素通过异步迭代器返回
+        
+        队列位置在调用时立即占用（队列满时立即抛出ExecutorSaturatedError），
+        返回的异步迭代器被关闭时（例如客户端断开）会通知后台停止生成。
+        """
+        self._acquire()
+        enqueued_at = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        items = asyncio.Queue()
+        cancelled = threading.Event()
+        
+        def publish(item, error=None):
+            try:
+                loop.call_soon_threadsafe(items.put_nowait, (item, error))
+            except RuntimeError:
+                # 事件循环已关闭
+                cancelled.set()
+        
+        def task():
+            started_at = self._on_start(enqueued_at)
+            success = False
+            error = None
+            try:
+                generator = gen_fn(*args, **kwargs)
+                try:
+                    for item in generator:
+                        if cancelled.is_set():
+                            break
+                        publish(item)
+                finally:
+                    generator.close()
+                success = True
+            except Exception as e:
+                error = e
+            finally:
+                self._on_finish(started_at, success)
+                publish(_END, error)
+        
+        self._pool.submit(contextvars.copy_context().run, task)
+        
+        async def iterate():
+            try:
+                while True:
+                    item, error = await items.get()
+                    if item is _END:
+                        if error is not None:
+                            raise error
+                        return
+                    yield item
+            finally:
+                cancelled.set()
+        
+        return iterate()
+    
+    def _acquire(self):
+        """占用一个队列位置，队列已满时抛出ExecutorSaturatedError"""
+        with self._lock:
+            if self._queued + self._running >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise ExecutorSaturatedError(
+                    f"推理队列已满（{self._queued}个请求排队中），请稍后重试",
+                    retry_after=self._estimate_retry_after()
+                )
+            self._queued += 1
+            self._submitted += 1
+    
+    def _on_start(self, enqueued_at: float) -> float:
+        """任务开始执行时记录排队等待时间"""
+        started_at = time.perf_counter()
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._started += 1
+            wait = started_at - enqueued_at
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+            self._recent_waits.append(wait)
+        return started_at
+    
+    def _on_finish(self, started_at: float, success: bool):
+        """任务结束时更新统计"""
+        with self._lock:
+            self._running -= 1
+            self._recent_runs.append(time.perf_counter() - started_at)
+            if success:
+                self._completed += 1
+            else:
+                self._failed += 1
+    
+    def _estimate_retry_after(self) -> int:
+        """根据最近的执行耗时估算建议的重试间隔（秒）"""
+        if not self._recent_runs:
+            return 5
+        avg_run = sum(self._recent_runs) / len(self._recent_runs)
+        backlog = (self._queued + self._running) / max(self.max_workers, 1)
+        return max(1, int(avg_run * backlog))
+    
+    def stats(self) -> Dict[str, Any]:
+        """获取队列和排队等待时间统计"""
+        with self._lock:
+            waits = sorted(self._recent_waits)
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queued": self._queued,
+                "running": self._running,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "queue_wait": {
+                    "avg": self._total_wait / self._started if self._started else 0.0,
+                    "max": self._max_wait,
+                    "p50": self._percentile(waits, 0.50),
+                    "p95": self._percentile(waits, 0.95),
+                    "p99": self._percentile(waits, 0.99)
+                }
+            }
+    
+    def _percentile(self, values, q: float) -> float:
+        """计算已排序列表的分位数"""
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, int(q * len(values)))]
+    
+    def shutdown(self, wait: bool = True):
+        """关闭线程池"""
+        self._pool.shutdown(wait=wait)
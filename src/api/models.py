@@ -4,12 +4,16 @@ from typing import Dict, Any, Optional
 class ProblemRequest(BaseModel):
     problem: str
     language: str = "python"
+    use_cache: bool = True  # 设为False时跳过缓存查找，强制重新生成
 
 class SolutionResponse(BaseModel):
     code: str
     reasoning: str
     features: Dict[str, Any]
     solution_id: str
+    timings: Dict[str, float] = {}  # 各阶段耗时（秒）
+    cache_hit: Optional[str] = None  # 缓存命中类型：exact/semantic
+    usage: Optional[Dict[str, Any]] = None  # 生成用量：token数、停止原因和提前停止节省的token数
 
 class FeedbackRequest(BaseModel):
     solution_id: str
@@ -1,93 +1,283 @@
+import os
+import json
+import logging
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from src.config import (
+    INFERENCE_WORKERS, INFERENCE_MAX_QUEUE, 
+    LLM_BATCHING, LLM_MAX_BATCH_SIZE, LLM_MAX_WAIT_MS,
+    SOLUTION_CACHE_ENABLED, SOLUTION_CACHE_SIZE, SOLUTION_CACHE_TTL,
+    SOLUTION_CACHE_SEMANTIC, SOLUTION_CACHE_SIMILARITY,
+    PROBLEM_INDEX_ENABLED, EMBEDDING_BACKEND, FEATURE_EXTRACTOR, FEATURE_FAST_MIN_CONFIDENCE,
+    FEATURE_NEIGHBORS, FEATURE_NEIGHBOR_MIN_SIMILARITY
+)
 from src.api.models import ProblemRequest, SolutionResponse, FeedbackRequest, FeedbackResponse
-from src.llm.deepseek import DeepSeekLLM
-from src.knowledge.retriever import KnowledgeRetriever
-from src.llm.cot import ChainOfThoughtReasoner
-from src.feedback.storage import FeedbackStorage
-from src.feedback.learner import FeedbackLearner
-import time
+from src.api.executor import InferenceExecutor, ExecutorSaturatedError
+from src.api.components import ComponentContainer, ComponentNotReadyError
+from src.utils.metrics import INFERENCE_QUEUE_DEPTH, INFERENCE_RUNNING, BATCH_QUEUE_DEPTH
+from src.utils.tracing import fields
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# 初始化组件
-llm = DeepSeekLLM()
-retriever = KnowledgeRetriever()
-reasoner = ChainOfThoughtReasoner(llm, retriever)
-feedback_storage = FeedbackStorage()
-feedback_learner = FeedbackLearner(llm, retriever, feedback_storage)
+# 组件容器：模型、索引和存储在应用启动后于后台加载，
+# 重量级依赖（torch、transformers、faiss）在各构造函数中才导入
+components = ComponentContainer()
+
+def _shutdown_llm(llm):
+    if hasattr(llm, "scheduler"):
+        llm.scheduler.shutdown()
+
+@components.component("llm", close=_shutdown_llm)
+def _load_llm(c):
+    from src.llm.registry import create_llm
+    from src.llm.batching import BatchedLLM
+    llm = create_llm()
+    if LLM_BATCHING and INFERENCE_WORKERS <= 1:
+        logger.warning("LLM_BATCHING已开启但INFERENCE_WORKERS=%d，同一时间只有一个请求，批处理不会生效", INFERENCE_WORKERS)
+    if LLM_BATCHING and hasattr(llm, "generate_batch"):
+        llm = BatchedLLM(llm, max_batch_size=LLM_MAX_BATCH_SIZE, max_wait_ms=LLM_MAX_WAIT_MS)
+    return llm
+
+@components.component("retriever")
+def _load_retriever(c):
+    from src.knowledge.retriever import KnowledgeRetriever
+    return KnowledgeRetriever()
+
+def attach_problem_index(feedback_storage, retriever, index_dir: str = None):
+    """按配置为反馈存储挂载问题语义索引，index_dir指定本地索引文件的目录（默认为EMBEDDINGS_DIR）"""
+    if PROBLEM_INDEX_ENABLED and EMBEDDING_BACKEND == "ipc":
+        # 多工作进程部署：问题索引由模型服务统一写入
+        from src.serving.client import IPCProblemIndex
+        feedback_storage.attach_problem_index(IPCProblemIndex())
+    elif PROBLEM_INDEX_ENABLED:
+        from src.feedback.problem_index import ProblemEmbeddingIndex
+        paths = {}
+        if index_dir is not None:
+            paths = {
+                "index_path": os.path.join(index_dir, "problem_index.faiss"),
+                "ids_path": os.path.join(index_dir, "problem_ids.txt")
+            }
+        feedback_storage.attach_problem_index(ProblemEmbeddingIndex(retriever.embed_queries, **paths))
+    return feedback_storage
+
+@components.component("feedback_storage", depends=["retriever"])
+def _load_feedback_storage(c):
+    from src.feedback.factory import create_feedback_storage
+    return attach_problem_index(create_feedback_storage(), c.get("retriever"))
+
+@components.component("solution_cache", depends=["llm", "retriever", "feedback_storage"])
+def _load_solution_cache(c):
+    if not SOLUTION_CACHE_ENABLED:
+        return None
+    from src.llm.cot import PROMPT_TEMPLATE_VERSION
+    from src.pipeline.cache import SolutionCache
+    retriever = c.get("retriever")
+    return SolutionCache(
+        c.get("feedback_storage"),
+        model_id=c.get("llm").model_id,
+        template_version=PROMPT_TEMPLATE_VERSION,
+        max_size=SOLUTION_CACHE_SIZE,
+        ttl=SOLUTION_CACHE_TTL,
+        encode_fn=retriever.embed_queries if SOLUTION_CACHE_SEMANTIC else None,
+        similarity_threshold=SOLUTION_CACHE_SIMILARITY
+    )
+
+@components.component("feature_extractor", depends=["llm", "retriever", "feedback_storage"])
+def _load_feature_extractor(c):
+    # 问题特征快速提取（关键词 + 相似历史问题），置信度不足时回退到LLM
+    if FEATURE_EXTRACTOR != "fast":
+        return None
+    from src.llm.fast_features import FastFeatureExtractor
+    return FastFeatureExtractor(
+        c.get("llm"),
+        c.get("retriever").knowledge_base.get_items(),
+        storage=c.get("feedback_storage"),
+        min_confidence=FEATURE_FAST_MIN_CONFIDENCE,
+        neighbors=FEATURE_NEIGHBORS,
+        min_similarity=FEATURE_NEIGHBOR_MIN_SIMILARITY
+    )
+
+@components.component("pipeline", depends=["llm", "retriever", "feedback_storage", "solution_cache", "feature_extractor"])
+def _load_pipeline(c):
+    from src.llm.cot import ChainOfThoughtReasoner
+    from src.feedback.learner import FeedbackLearner
+    from src.pipeline.solver import SolvePipeline
+    llm = c.get("llm")
+    retriever = c.get("retriever")
+    feedback_storage = c.get("feedback_storage")
+    reasoner = ChainOfThoughtReasoner(llm, retriever)
+    feedback_learner = FeedbackLearner(llm, retriever, feedback_storage)
+    return SolvePipeline(
+        llm, reasoner, feedback_storage, feedback_learner, 
+        cache=c.get("solution_cache"), feature_extractor=c.get("feature_extractor")
+    )
+
+# 推理专用线程池，避免阻塞事件循环
+inference_executor = InferenceExecutor(max_workers=INFERENCE_WORKERS, max_queue=INFERENCE_MAX_QUEUE)
+
+def _batch_queue_depth() -> int:
+    llm = components.get_if_ready("llm")
+    return llm.scheduler.stats()["pending"] if hasattr(llm, "scheduler") else 0
+
+# 队列深度在导出指标时读取
+INFERENCE_QUEUE_DEPTH.set_function(lambda: inference_executor.stats()["queued"])
+INFERENCE_RUNNING.set_function(lambda: inference_executor.stats()["running"])
+BATCH_QUEUE_DEPTH.set_function(_batch_queue_depth)
+
+def _require(name: str):
+    """获取已就绪的组件，未就绪时返回503"""
+    try:
+        return components.get(name)
+    except ComponentNotReadyError as e:
+        raise HTTPException(
+            status_code=503, 
+            detail=str(e), 
+            headers={"Retry-After": str(e.retry_after)}
+        )
 
 @router.post("/solve", response_model=SolutionResponse)
 async def solve_problem(request: ProblemRequest):
     """解决LeetCode问题"""
+    pipeline = _require("pipeline")
     try:
-        start_time = time.time()
-        
-        # 提取问题特征
-        features = llm.extract_features(request.problem)
-        
-        # 存储问题到存储
-        problem_id = feedback_storage.add_problem(request.problem, features)
-        
-        # 增强提示（添加历史反馈）
-        history_prompt = feedback_learner.enhance_prompt_with_history(request.problem, features)
-        # TODO: 将history_prompt添加到reasoner.generate_solution中
-        
-        # 生成解决方案
-        solution = reasoner.generate_solution(request.problem, request.language)
-        
-        # 存储解决方案
-        solution_id = feedback_storage.add_solution(
-            problem_id, 
-            solution["code"], 
-            request.language, 
-            solution["reasoning"]
+        solution, ctx = await inference_executor.run(
+            pipeline.run, request.problem, request.language, request.use_cache
         )
         
-        # 计算总耗时
-        total_time = time.time() - start_time
-        print(f"总处理时间: {total_time:.2f}秒")
+        timings = ctx.timing_breakdown()
+        logger.info("解题完成", extra=fields(
+            total_seconds=round(timings["total"], 3),
+            cache_hit=ctx.cache_hit,
+            completion_tokens=(ctx.usage or {}).get("completion_tokens")
+        ))
         
         return {
             "code": solution["code"],
             "reasoning": solution["reasoning"],
             "features": solution["features"],
-            "solution_id": solution_id
+            "solution_id": solution["solution_id"],
+            "timings": timings,
+            "cache_hit": ctx.cache_hit,
+            "usage": ctx.usage
         }
-        
+    
+    except ExecutorSaturatedError as e:
+        raise HTTPException(
+            status_code=429, 
+            detail=str(e), 
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"处理失败: {str(e)}")
 
+@router.post("/solve/stream")
+async def solve_problem_stream(request: ProblemRequest):
+    """流式解决LeetCode问题（Server-Sent Events）
+    
+    事件依次为：stage（当前阶段）、token（生成的文本片段）、
+    done（提取出的代码、solution_id和各阶段耗时）或 error。
+    """
+    pipeline = _require("pipeline")
+    try:
+        events = inference_executor.stream(
+            pipeline.stream, request.problem, request.language, request.use_cache
+        )
+    except ExecutorSaturatedError as e:
+        raise HTTPException(
+            status_code=429, 
+            detail=str(e), 
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    async def event_source():
+        try:
+            async for event in events:
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            error = {"type": "error", "message": f"处理失败: {str(e)}"}
+            yield f"data: {json.dumps(error, ensure_ascii=False)}\n\n"
+        finally:
+            await events.aclose()
+    
+    return StreamingResponse(
+        event_source(), 
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/feedback", response_model=FeedbackResponse)
 async def submit_feedback(request: FeedbackRequest):
     """提交代码反馈"""
+    feedback_storage = _require("feedback_storage")
+    # 反馈只依赖存储：缓存（依赖LLM）尚未就绪时跳过失效处理，缓存读取时也会检查负面反馈
+    solution_cache = components.get_if_ready("solution_cache")
     try:
         # 获取解决方案
-        solution = feedback_storage.get_solution(request.solution_id)
+        solution = await run_in_threadpool(feedback_storage.get_solution, request.solution_id)
         if not solution:
             raise HTTPException(status_code=404, detail="解决方案不存在")
         
         # 添加反馈
-        feedback_id = feedback_storage.add_feedback(
+        feedback_id = await run_in_threadpool(
+            feedback_storage.add_feedback,
             request.solution_id,
             request.is_positive,
             request.comment
         )
         
+        # 负面反馈使缓存中的该解决方案失效
+        if solution_cache is not None and not request.is_positive:
+            solution_cache.invalidate_solution(request.solution_id)
+        
         return {
             "id": feedback_id,
             "solution_id": request.solution_id,
             "success": True,
             "message": "反馈提交成功"
         }
-        
+    
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"提交反馈失败: {str(e)}")
 
 @router.get("/stats")
 async def get_stats():
     """获取系统统计信息"""
+    feedback_storage = _require("feedback_storage")
     try:
-        stats = feedback_storage.get_feedback_statistics()
+        stats = await run_in_threadpool(feedback_storage.get_feedback_statistics)
         return stats
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"获取统计信息失败: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"获取统计信息失败: {str(e)}")
+
+@router.get("/inference/stats")
+async def get_inference_stats():
+    """获取推理队列统计信息（队列深度、排队等待时间等）"""
+    stats = inference_executor.stats()
+    llm = components.get_if_ready("llm")
+    if llm is None:
+        return stats
+    if hasattr(llm, "scheduler"):
+        stats["batching"] = llm.scheduler.stats()
+    if hasattr(llm, "prefix_cache_stats"):
+        stats["prefix_cache"] = llm.prefix_cache_stats()
+    if getattr(llm, "drafter", None) is not None:
+        stats["speculative"] = llm.speculative_stats.to_dict()
+    feature_extractor = components.get_if_ready("feature_extractor")
+    if feature_extractor is not None:
+        stats["feature_extraction"] = feature_extractor.stats.to_dict()
+    if getattr(llm, "usage_stats", None) is not None:
+        stats["usage"] = llm.usage_stats.to_dict()
+    if hasattr(llm, "server_stats"):
+        stats["model_server"] = await run_in_threadpool(llm.server_stats)
+    return stats
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """获取解决方案缓存统计信息"""
+    solution_cache = components.get_if_ready("solution_cache")
+    if solution_cache is None:
+        return {"enabled": False}
+    return dict(solution_cache.stats(), enabled=True)
\ No newline at end of file
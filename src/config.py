@@ -7,10 +7,94 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # 环境设置
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# 日志格式：text（可读文本）或 json（每行一个JSON对象，包含request_id和结构化字段）；
+# LOG_LEVEL=DEBUG 时输出每个span（阶段、LLM、检索、存储调用）的耗时
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
 
 # 服务设置
 HOST = os.getenv("HOST", "0.0.0.0")
 PORT = int(os.getenv("PORT", "8000"))
+# 组件加载方式：background（启动后在后台加载，就绪前 /health/ready 返回503）、
+# blocking（加载完成后才开始接受请求）或 lazy（第一个需要组件的请求到来时才开始加载，适合开发时频繁重载）
+COMPONENT_LOADING = os.getenv("COMPONENT_LOADING", "background").lower()
+
+# 知识索引设置：flat（精确）、ivfpq、hnsw，均使用归一化向量的内积（余弦相似度）
+KNOWLEDGE_INDEX_TYPE = os.getenv("KNOWLEDGE_INDEX_TYPE", "flat")
+KNOWLEDGE_INDEX_NLIST = int(os.getenv("KNOWLEDGE_INDEX_NLIST", "100"))
+KNOWLEDGE_INDEX_PQ_M = int(os.getenv("KNOWLEDGE_INDEX_PQ_M", "16"))
+KNOWLEDGE_INDEX_HNSW_M = int(os.getenv("KNOWLEDGE_INDEX_HNSW_M", "32"))
+KNOWLEDGE_INDEX_NPROBE = int(os.getenv("KNOWLEDGE_INDEX_NPROBE", "8"))
+KNOWLEDGE_INDEX_EF_SEARCH = int(os.getenv("KNOWLEDGE_INDEX_EF_SEARCH", "64"))
+
+# 混合检索设置：BM25关键词检索与向量检索通过RRF融合
+KNOWLEDGE_HYBRID_ENABLED = os.getenv("KNOWLEDGE_HYBRID_ENABLED", "true").lower() in ("1", "true", "yes")
+KNOWLEDGE_RRF_K = int(os.getenv("KNOWLEDGE_RRF_K", "60"))
+# 关键词命中且BM25第一名得分不低于第二名的该倍数时，跳过向量检索（设为0关闭）
+KNOWLEDGE_LEXICAL_CONFIDENCE = float(os.getenv("KNOWLEDGE_LEXICAL_CONFIDENCE", "2.0"))
+# 查询嵌入缓存大小（按规范化后的查询文本哈希）
+KNOWLEDGE_QUERY_CACHE_SIZE = int(os.getenv("KNOWLEDGE_QUERY_CACHE_SIZE", "1024"))
+
+# LLM后端：transformers（进程内加载模型）或 openai（OpenAI兼容的推理服务）
+LLM_BACKEND = os.getenv("LLM_BACKEND", "transformers").lower()
+LLM_SERVER_URL = os.getenv("LLM_SERVER_URL", "http://127.0.0.1:8080")
+LLM_SERVER_MODEL = os.getenv("LLM_SERVER_MODEL", "deepseek-coder-1.3b-instruct")
+LLM_SERVER_API_KEY = os.getenv("LLM_SERVER_API_KEY", "")
+LLM_SERVER_TIMEOUT = float(os.getenv("LLM_SERVER_TIMEOUT", "120"))  # 读超时（秒）
+LLM_SERVER_CONNECT_TIMEOUT = float(os.getenv("LLM_SERVER_CONNECT_TIMEOUT", "5"))
+LLM_SERVER_POOL_SIZE = int(os.getenv("LLM_SERVER_POOL_SIZE", "16"))
+LLM_SERVER_MAX_RETRIES = int(os.getenv("LLM_SERVER_MAX_RETRIES", "2"))
+# 桩LLM（LLM_BACKEND=stub）模拟的耗时，用于没有模型时的确定性基准测试
+LLM_STUB_TOKEN_MS = float(os.getenv("LLM_STUB_TOKEN_MS", "0"))
+LLM_STUB_PREFILL_MS = float(os.getenv("LLM_STUB_PREFILL_MS", "0"))
+
+# 模型服务进程（LLM_BACKEND=ipc / EMBEDDING_BACKEND=ipc）：多个API工作进程共享一份模型权重
+MODEL_SERVER_SOCKET = os.getenv("MODEL_SERVER_SOCKET", "/tmp/leetcode-rag-model-server.sock")
+MODEL_SERVER_AUTHKEY = os.getenv("MODEL_SERVER_AUTHKEY", "").encode("utf-8") or None
+MODEL_SERVER_POOL_SIZE = int(os.getenv("MODEL_SERVER_POOL_SIZE", "8"))  # 每个工作进程保留的空闲连接数，超出时临时建立新连接
+MODEL_SERVER_CONNECT_TIMEOUT = float(os.getenv("MODEL_SERVER_CONNECT_TIMEOUT", "300"))  # 等待模型服务加载完成（秒）
+
+# LLM CPU推理设置：none（bf16）或 int8（Linear层动态量化，需先运行 setup_model.py --quantize int8）
+LLM_QUANTIZATION = os.getenv("LLM_QUANTIZATION", "none").lower()
+LLM_NUM_THREADS = int(os.getenv("LLM_NUM_THREADS", "0"))  # 0表示使用torch默认线程数
+# 预先计算聊天模板和固定提示开头的KV缓存，单条生成时只需要对剩余部分做prefill
+LLM_PREFIX_CACHE = os.getenv("LLM_PREFIX_CACHE", "true").lower() in ("1", "true", "yes")
+# 贪心解码（temperature <= 0.1）时的推测解码：off、prompt_lookup（从提示中复制n-gram）或 draft_model
+LLM_SPECULATIVE = os.getenv("LLM_SPECULATIVE", "off").lower()
+LLM_SPECULATIVE_TOKENS = int(os.getenv("LLM_SPECULATIVE_TOKENS", "0"))  # 每步草稿token数，0表示使用默认值
+LLM_DRAFT_MODEL_PATH = os.getenv("LLM_DRAFT_MODEL_PATH", "")  # 与主模型使用同一分词器的小模型
+# 提前停止：解决方案的第一个代码块闭合、特征JSON配对完成后立即结束解码，而不是一直解码到max_tokens
+LLM_EARLY_STOPPING = os.getenv("LLM_EARLY_STOPPING", "true").lower() in ("1", "true", "yes")
+# 全局停止字符串（逗号分隔），出现即停止，结果不包含停止字符串
+LLM_STOP_STRINGS = [s for s in os.getenv("LLM_STOP_STRINGS", "").split(",") if s]
+
+# 问题特征提取：fast（关键词 + 相似历史问题投票，置信度不足时回退到LLM）或 llm（每次都调用LLM）
+FEATURE_EXTRACTOR = os.getenv("FEATURE_EXTRACTOR", "fast").lower()
+FEATURE_FAST_MIN_CONFIDENCE = float(os.getenv("FEATURE_FAST_MIN_CONFIDENCE", "0.6"))
+FEATURE_NEIGHBORS = int(os.getenv("FEATURE_NEIGHBORS", "5"))
+FEATURE_NEIGHBOR_MIN_SIMILARITY = float(os.getenv("FEATURE_NEIGHBOR_MIN_SIMILARITY", "0.85"))
+
+# 推理执行器设置
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "8"))
+
+# 动态批处理设置（需要INFERENCE_WORKERS > 1才会有并发请求可合并）
+LLM_BATCHING = os.getenv("LLM_BATCHING", "false").lower() in ("1", "true", "yes")
+LLM_MAX_BATCH_SIZE = int(os.getenv("LLM_MAX_BATCH_SIZE", "8"))
+LLM_MAX_WAIT_MS = float(os.getenv("LLM_MAX_WAIT_MS", "20"))
+# 开启批处理且未显式设置INFERENCE_WORKERS时，推理并发数默认取LLM_MAX_BATCH_SIZE
+if LLM_BATCHING and "INFERENCE_WORKERS" not in os.environ:
+    INFERENCE_WORKERS = LLM_MAX_BATCH_SIZE
+
+# 解决方案缓存设置
+SOLUTION_CACHE_ENABLED = os.getenv("SOLUTION_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SOLUTION_CACHE_SIZE = int(os.getenv("SOLUTION_CACHE_SIZE", "512"))
+SOLUTION_CACHE_TTL = float(os.getenv("SOLUTION_CACHE_TTL", "86400"))  # 秒
+SOLUTION_CACHE_SEMANTIC = os.getenv("SOLUTION_CACHE_SEMANTIC", "false").lower() in ("1", "true", "yes")
+SOLUTION_CACHE_SIMILARITY = float(os.getenv("SOLUTION_CACHE_SIMILARITY", "0.97"))
+
+# 历史问题语义索引设置
+PROBLEM_INDEX_ENABLED = os.getenv("PROBLEM_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+PROBLEM_INDEX_MIN_SIMILARITY = float(os.getenv("PROBLEM_INDEX_MIN_SIMILARITY", "0.5"))
 
 # 路径设置
 KNOWLEDGE_DIR = BASE_DIR / "data" / "knowledge_base"
@@ -18,11 +102,21 @@ EMBEDDINGS_DIR = BASE_DIR / "data" / "embeddings"
 FEEDBACK_DIR = BASE_DIR / "data" / "feedback"
 MODELS_DIR = BASE_DIR / "models"
 
+# 反馈存储设置：json（data/feedback下的JSON文件）或 sqlite
+FEEDBACK_BACKEND = os.getenv("FEEDBACK_BACKEND", "json")
+FEEDBACK_DB_PATH = Path(os.getenv("FEEDBACK_DB_PATH", str(FEEDBACK_DIR / "feedback.db")))
+
 # 模型设置
 # 修改这一行
 DEFAULT_MODEL_PATH = MODELS_DIR / "deepseek-coder-1.3b-instruct"  # 更小的模型
 DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 
+# 嵌入模型后端：torch（sentence-transformers）或 onnx（ONNX Runtime，不导入torch）；
+# hashing为不需要模型的特征哈希编码，只用于基准测试
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_ONNX_DIR = Path(os.getenv("EMBEDDING_ONNX_DIR", str(EMBEDDINGS_DIR / "onnx")))
+EMBEDDING_ONNX_QUANTIZE = os.getenv("EMBEDDING_ONNX_QUANTIZE", "false").lower() in ("1", "true", "yes")
+
 # 创建必要的目录
 os.makedirs(KNOWLEDGE_DIR, exist_ok=True)
 os.makedirs(EMBEDDINGS_DIR, exist_ok=True)
@@ -0,0 +1,92 @@
+import logging
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+class BaseFeedbackStorage(ABC):
+    """反馈存储基类"""
+    
+    # 可选的问题语义索引，添加问题时同步追加
+    problem_index = None
+    
+    def attach_problem_index(self, problem_index):
+        """挂载问题语义索引，并补齐尚未建立索引的历史问题"""
+        problem_index.sync(self)
+        self.problem_index = problem_index
+    
+    def _index_problem(self, problem_id: str, problem_text: str):
+        """把新问题追加到语义索引（索引失败不影响存储本身）"""
+        if self.problem_index is None:
+            return
+        try:
+            self.problem_index.add(problem_id, problem_text)
+        except Exception as e:
+            logger.warning("更新问题索引失败: %s", e)
+    
+    @abstractmethod
+    def add_problem(self, problem_text: str, features: Dict[str, Any], feature_source: str = "llm") -> str:
+        """添加问题
+        
+        feature_source记录特征的来源："llm"为LLM提取，"fast"为快速提取器的预测。
+        """
+        pass
+    
+    @abstractmethod
+    def add_solution(self, problem_id: str, code: str, language: str, reasoning: str) -> str:
+        """添加解决方案"""
+        pass
+    
+    @abstractmethod
+    def add_feedback(self, solution_id: str, is_positive: bool, comment: str = None) -> str:
+        """添加反馈"""
+        pass
+    
+    @abstractmethod
+    def get_problem(self, problem_id: str) -> Optional[Dict[str, Any]]:
+        """获取问题"""
+        pass
+    
+    @abstractmethod
+    def get_problem_ids(self) -> List[str]:
+        """获取所有问题ID（按添加顺序）"""
+        pass
+    
+    @abstractmethod
+    def get_solution(self, solution_id: str) -> Optional[Dict[str, Any]]:
+        """获取解决方案"""
+        pass
+    
+    @abstractmethod
+    def get_solutions_for_problem(self, problem_id: str) -> List[str]:
+        """获取特定问题的所有解决方案ID"""
+        pass
+    
+    @abstractmethod
+    def get_feedback_for_solution(self, solution_id: str) -> List[Dict[str, Any]]:
+        """获取特定解决方案的所有反馈（按时间倒序）"""
+        pass
+    
+    def get_feedback_for_problems(self, problem_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """批量获取多个问题的所有反馈
+        
+        返回 problem_id -> 反馈列表，每个问题内按解决方案的添加顺序排列，
+        同一解决方案的反馈按时间倒序。
+        """
+        result = {}
+        for problem_id in problem_ids:
+            feedbacks = []
+            for solution_id in self.get_solutions_for_problem(problem_id):
+                feedbacks.extend(self.get_feedback_for_solution(solution_id))
+            result[problem_id] = feedbacks
+        return result
+    
+    @abstractmethod
+    def get_similar_problems(self, features: Dict[str, Any], limit: int = 5) -> List[Dict[str, Any]]:
+        """获取具有相似特征的问题"""
+        pass
+    
+    @abstractmethod
+    def get_feedback_statistics(self) -> Dict[str, Any]:
+        """获取反馈统计信息"""
+        pass
\ No newline at end of file
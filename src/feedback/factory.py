@@ -0,0 +1,15 @@
+from src.config import FEEDBACK_BACKEND
+from src.feedback.base import BaseFeedbackStorage
+
+def create_feedback_storage(backend: str = None) -> BaseFeedbackStorage:
+    """根据配置创建反馈存储"""
+    backend = (backend or FEEDBACK_BACKEND).lower()
+    
+    if backend == "json":
+        from src.feedback.storage import FeedbackStorage
+        return FeedbackStorage()
+    elif backend == "sqlite":
+        from src.feedback.sqlite_storage import SQLiteFeedbackStorage
+        return SQLiteFeedbackStorage()
+    else:
+        raise ValueError(f"未知的反馈存储后端: {backend}（可选: json, sqlite）")
@@ -1,21 +1,48 @@
 import re
-from typing import List, Dict, Any
-from src.feedback.storage import FeedbackStorage
+import numpy as np
+from typing import List, Dict, Any, Optional
+from src.config import PROBLEM_INDEX_MIN_SIMILARITY
+from src.feedback.base import BaseFeedbackStorage
 from src.llm.base import LLM
 from src.knowledge.retriever import KnowledgeRetriever
 
 class FeedbackLearner:
     """反馈学习器 - 从用户反馈中学习改进代码生成"""
     
-    def __init__(self, llm: LLM, retriever: KnowledgeRetriever, storage: FeedbackStorage):
+    def __init__(self, llm: LLM, retriever: KnowledgeRetriever, storage: BaseFeedbackStorage,
+                 min_similarity: float = PROBLEM_INDEX_MIN_SIMILARITY):
         self.llm = llm
         self.retriever = retriever
         self.storage = storage
+        self.min_similarity = min_similarity
     
-    def enhance_prompt_with_history(self, problem: str, features: Dict[str, Any]) -> str:
+    def find_similar_problems(self, problem: str, features: Dict[str, Any], limit: int = 3,
+                              embedding: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """查找相似的历史问题
+        
+        优先使用问题文本的语义索引（已有问题嵌入时可通过embedding传入）；
+        没有语义索引或没有足够相似的问题时，退回到基于提取特征的匹配。
+        """
+        problem_index = self.storage.problem_index
+        if problem_index is not None and len(problem_index) > 0:
+            similar_problems = []
+            for problem_id, score in problem_index.search(problem, k=limit, embedding=embedding):
+                if score < self.min_similarity:
+                    continue
+                similar_problem = self.storage.get_problem(problem_id)
+                if similar_problem:
+                    similar_problem["similarity_score"] = score
+                    similar_problems.append(similar_problem)
+            if similar_problems:
+                return similar_problems
+        
+        return self.storage.get_similar_problems(features, limit=limit)
+    
+    def enhance_prompt_with_history(self, problem: str, features: Dict[str, Any],
+                                    embedding: Optional[np.ndarray] = None) -> str:
         """使用历史反馈增强提示"""
         # 获取相似问题
-        similar_problems = self.storage.get_similar_problems(features, limit=3)
+        similar_problems = self.find_similar_problems(problem, features, limit=3, embedding=embedding)
         
         if not similar_problems:
             return ""
@@ -24,24 +51,17 @@ class FeedbackLearner:
         positive_insights = []
         negative_insights = []
         
+        # 一次性获取所有相似问题的反馈
+        feedback_by_problem = self.storage.get_feedback_for_problems(
+            [similar_problem["id"] for similar_problem in similar_problems]
+        )
+        
         for similar_problem in similar_problems:
-            problem_id = similar_problem["id"]
-            
-            # 找出该问题的所有解决方案
-            solution_ids = []
-            for solution_id, solution_info in self.storage.index["solutions"].items():
-                if solution_info["problem_id"] == problem_id:
-                    solution_ids.append(solution_id)
-            
-            for solution_id in solution_ids:
-                # 获取该解决方案的反馈
-                feedbacks = self.storage.get_feedback_for_solution(solution_id)
-                
-                for feedback in feedbacks:
-                    if feedback["is_positive"] and feedback.get("comment"):
-                        positive_insights.append(feedback["comment"])
-                    elif not feedback["is_positive"] and feedback.get("comment"):
-                        negative_insights.append(feedback["comment"])
+            for feedback in feedback_by_problem.get(similar_problem["id"], []):
+                if feedback["is_positive"] and feedback.get("comment"):
+                    positive_insights.append(feedback["comment"])
+                elif not feedback["is_positive"] and feedback.get("comment"):
+                    negative_insights.append(feedback["comment"])
         
         # 构建增强提示
         if positive_insights or negative_insights:
@@ -0,0 +1,227 @@
+import os
+import logging
+import threading
+import numpy as np
+from typing import List, Tuple, Callable, Optional
+from src.config import EMBEDDINGS_DIR
+from src.utils.tracing import fields
+
+# 尝试导入faiss，如果失败则尝试导入CPU版本
+try:
+    import faiss
+except ImportError:
+    try:
+        import faiss.contrib.faiss_contrib as faiss
+    except ImportError:
+        raise ImportError("无法导入faiss。请安装faiss-cpu或faiss-gpu。")
+
+logger = logging.getLogger(__name__)
+
+class ProblemEmbeddingIndex:
+    """历史问题的语义嵌入索引
+    
+    使用HNSW图索引（内积，向量已归一化即为余弦相似度）存放问题文本的嵌入，
+    支持增量追加，查询复杂度约为O(log n)。索引定期持久化到磁盘，
+    问题ID按添加顺序逐行追加到旁路文本文件中。
+    """
+    
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray], 
+                 index_path: str = None, ids_path: str = None,
+                 read_only: bool = False, save_every: int = 16,
+                 hnsw_m: int = 32, ef_search: int = 64):
+        self.encode_fn = encode_fn
+        self.index_path = index_path or os.path.join(EMBEDDINGS_DIR, "problem_index.faiss")
+        self.ids_path = ids_path or os.path.join(EMBEDDINGS_DIR, "problem_ids.txt")
+        self.read_only = read_only
+        self.save_every = save_every
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        
+        self.index = None
+        self.problem_ids: List[str] = []
+        self._known = set()
+        self._unsaved = 0
+        self._saved_ntotal = 0
+        self._lock = threading.Lock()
+        # 写磁盘使用单独的锁：序列化在_lock内完成（内存拷贝），写文件时不阻塞search
+        self._save_lock = threading.Lock()
+        
+        self._load()
+    
+    def __len__(self) -> int:
+        return len(self.problem_ids)
+    
+    def __contains__(self, problem_id: str) -> bool:
+        return problem_id in self._known
+    
+    def _load(self):
+        """加载已持久化的索引"""
+        if not os.path.exists(self.index_path):
+            return
+        
+        try:
+            if self.read_only:
+                # 只读的检索进程使用内存映射，多个进程共享同一份页缓存
+                try:
+                    self.index = faiss.read_index(self.index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+                except Exception:
+                    self.index = faiss.read_index(self.index_path)
+            else:
+                self.index = faiss.read_index(self.index_path)
+            self.index.hnsw.efSearch = self.ef_search
+            self._saved_ntotal = self.index.ntotal
+            
+            problem_ids = []
+            if os.path.exists(self.ids_path):
+                with open(self.ids_path, 'r', encoding='utf-8') as f:
+                    problem_ids = [line.strip() for line in f if line.strip()]
+            
+            # ID文件每次添加都会追加，索引则是定期保存：
+            # 多出来的ID在索引中不存在，丢弃后由sync重新补齐
+            if len(problem_ids) != self.index.ntotal:
+                logger.warning("问题索引与ID文件不一致，以索引为准", extra=fields(
+                    indexed=self.index.ntotal, ids=len(problem_ids)
+                ))
+                problem_ids = problem_ids[:self.index.ntotal]
+                if not self.read_only:
+                    self._rewrite_ids(problem_ids)
+            
+            self.problem_ids = problem_ids
+            self._known = set(problem_ids)
+            logger.info("成功加载问题索引", extra=fields(path=self.index_path, problems=len(problem_ids)))
+        except Exception as e:
+            logger.warning("加载问题索引失败: %s", e)
+            self.index = None
+            self.problem_ids = []
+            self._known = set()
+    
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """生成归一化的嵌入向量"""
+        embeddings = np.asarray(self.encode_fn(texts), dtype="float32")
+        faiss.normalize_L2(embeddings)
+        return embeddings
+    
+    def add(self, problem_id: str, text: str):
+        """追加一个问题"""
+        self.add_many([problem_id], [text])
+    
+    def add_many(self, problem_ids: List[str], texts: List[str]):
+        """批量追加问题（已存在的问题跳过）"""
+        if self.read_only:
+            raise RuntimeError("只读问题索引不能追加")
+        
+        pairs = [(pid, text) for pid, text in zip(problem_ids, texts) if pid not in self._known]
+        if not pairs:
+            return
+        
+        embeddings = self._embed([text for _, text in pairs])
+        
+        snapshot = None
+        with self._lock:
+            # 嵌入在锁外计算，期间其他线程可能已经追加了同一个问题，持锁后重新过滤
+            keep = []
+            new_ids = []
+            seen = set()
+            for i, (pid, _) in enumerate(pairs):
+                if pid not in self._known and pid not in seen:
+                    seen.add(pid)
+                    keep.append(i)
+                    new_ids.append(pid)
+            if not new_ids:
+                return
+            embeddings = embeddings[keep]
+            
+            if self.index is None:
+                self.index = faiss.IndexHNSWFlat(embeddings.shape[1], self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+                self.index.hnsw.efSearch = self.ef_search
+            
+            self.index.add(embeddings)
+            self.problem_ids.extend(new_ids)
+            self._known.update(new_ids)
+            
+            with open(self.ids_path, 'a', encoding='utf-8') as f:
+                f.writelines(f"{pid}\n" for pid in new_ids)
+            
+            self._unsaved += len(new_ids)
+            if self._unsaved >= self.save_every:
+                snapshot = self._snapshot()
+        
+        if snapshot is not None:
+            self._write(snapshot)
+    
+    def search(self, text: str, k: int = 5, 
+               embedding: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
+        """检索最相似的历史问题，返回 (problem_id, 余弦相似度) 列表"""
+        if self.index is None or not self.problem_ids:
+            return []
+        
+        if embedding is None:
+            query = self._embed([text])
+        else:
+            query = np.asarray(embedding, dtype="float32").reshape(1, -1).copy()
+            faiss.normalize_L2(query)
+        
+        with self._lock:
+            scores, indices = self.index.search(query, min(k, len(self.problem_ids)))
+            problem_ids = self.problem_ids
+        
+        return [
+            (problem_ids[idx], float(score))
+            for score, idx in zip(scores[0], indices[0])
+            if 0 <= idx < len(problem_ids)
+        ]
+    
+    def sync(self, storage):
+        """把存储中尚未建立索引的问题补充到索引中"""
+        if self.read_only:
+            return
+        
+        missing = [pid for pid in storage.get_problem_ids() if pid not in self._known]
+        if not missing:
+            return
+        
+        logger.info("为历史问题生成嵌入", extra=fields(missing=len(missing)))
+        problem_ids, texts = [], []
+        for problem_id in missing:
+            problem = storage.get_problem(problem_id)
+            if problem:
+                problem_ids.append(problem_id)
+                texts.append(problem["text"])
+        self.add_many(problem_ids, texts)
+        self.save()
+    
+    def save(self):
+        """持久化索引"""
+        if self.read_only:
+            return
+        with self._lock:
+            snapshot = self._snapshot()
+        if snapshot is not None:
+            self._write(snapshot)
+    
+    def _snapshot(self) -> Optional[Tuple[int, np.ndarray]]:
+        """把索引序列化到内存（需持有锁），返回 (向量数, 序列化数据)"""
+        if self.index is None:
+            return None
+        self._unsaved = 0
+        return self.index.ntotal, faiss.serialize_index(self.index)
+    
+    def _write(self, snapshot: Tuple[int, np.ndarray]):
+        """把快照写入磁盘；先写临时文件再替换，避免留下写了一半的文件"""
+        ntotal, data = snapshot
+        with self._save_lock:
+            # 并发保存时可能晚拿到锁的是较旧的快照，不能覆盖较新的文件
+            if ntotal <= self._saved_ntotal and os.path.exists(self.index_path):
+                return
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            tmp_path = f"{self.index_path}.tmp"
+            data.tofile(tmp_path)
+            os.replace(tmp_path, self.index_path)
+            self._saved_ntotal = ntotal
+    
+    def _rewrite_ids(self, problem_ids: List[str]):
+        """重写ID文件"""
+        tmp_path = f"{self.ids_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(f"{pid}\n" for pid in problem_ids)
+        os.replace(tmp_path, self.ids_path)
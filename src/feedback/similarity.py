@@ -0,0 +1,150 @@
+import json
+import threading
+import numpy as np
+from typing import List, Dict, Any, Tuple, Hashable
+
+# 各特征的权重（与逐对比较的打分规则一致）
+PROBLEM_TYPE_WEIGHT = 3.0    # 问题类型相同
+DIFFICULTY_WEIGHT = 1.0      # 难度相同
+DATA_STRUCTURE_WEIGHT = 2.0  # 每个共同的数据结构
+ALGORITHM_WEIGHT = 2.0       # 每个共同的算法
+
+def normalize_features(features: Dict[str, Any]) -> Dict[str, Any]:
+    """只保留参与相似度计算的特征字段，并补齐默认值"""
+    return {
+        "problem_type": features.get("problem_type", ""),
+        "difficulty": features.get("difficulty", ""),
+        "data_structures": features.get("data_structures", []),
+        "algorithms": features.get("algorithms", [])
+    }
+
+class FeatureMatrix:
+    """问题特征的稀疏多热编码
+    
+    每个 (特征字段, 取值) 占一列，列中按添加顺序保存包含该取值的问题行号（倒排列表），
+    列的权重即该字段的权重。查询时只累加查询特征对应列的倒排列表，相当于一次稀疏
+    矩阵-向量乘法：类型相同 +3，难度相同 +1，每个共同的数据结构/算法 +2。
+    每个问题只占用其非零特征的行号（约8个int32），不随取值种类数增长。
+    """
+    
+    def __init__(self, initial_capacity: int = 16):
+        self.initial_capacity = initial_capacity
+        self._columns: Dict[Tuple[str, Hashable], int] = {}
+        # 每列的倒排列表（按两倍扩容的int32数组）及其有效长度
+        self._postings: List[np.ndarray] = []
+        self._lengths: List[int] = []
+        self._problem_ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._problem_ids)
+    
+    def __contains__(self, problem_id: str) -> bool:
+        return problem_id in self._rows
+    
+    def add(self, problem_id: str, features: Dict[str, Any]):
+        """添加（或覆盖）一个问题的特征"""
+        with self._lock:
+            row = self._rows.get(problem_id)
+            if row is None:
+                row = len(self._problem_ids)
+                self._problem_ids.append(problem_id)
+                self._rows[problem_id] = row
+            else:
+                self._remove_row(row)
+            
+            for column, _ in self._encode(features, create=True):
+                self._append(column, row)
+    
+    def top_k(self, features: Dict[str, Any], limit: int = 5) -> List[Tuple[str, float]]:
+        """返回相似度最高的limit个问题及得分
+        
+        得分相同的问题按添加顺序排列，与对全部问题做稳定排序的结果一致。
+        """
+        with self._lock:
+            count = len(self._problem_ids)
+            if count == 0 or limit <= 0:
+                return []
+            # 倒排列表只在末尾追加、删除时整体替换，锁外读取前length个元素是安全的
+            terms = [
+                (self._postings[column], self._lengths[column], weight)
+                for column, weight in self._encode(features, create=False)
+            ]
+            problem_ids = self._problem_ids
+        
+        scores = np.zeros(count, dtype=np.float32)
+        for posting, length, weight in terms:
+            # 同一列中的行号互不相同，可以直接按索引累加
+            scores[posting[:length]] += weight
+        
+        if limit >= count:
+            order = np.argsort(-scores, kind="stable")
+        else:
+            # 先用argpartition取出前limit个候选，再处理边界上得分相同的问题
+            partition = np.argpartition(-scores, limit - 1)[:limit]
+            threshold = scores[partition].min()
+            above = np.flatnonzero(scores > threshold)
+            ties = np.flatnonzero(scores == threshold)[:limit - len(above)]
+            candidates = np.concatenate([above, ties])
+            order = candidates[np.argsort(-scores[candidates], kind="stable")]
+        
+        return [(problem_ids[idx], float(scores[idx])) for idx in order]
+    
+    def _encode(self, features: Dict[str, Any], create: bool) -> List[Tuple[int, float]]:
+        """把特征转换为 (列号, 权重) 列表，create为False时忽略未见过的取值（需持有锁）"""
+        keys = [
+            (("problem_type", self._hashable(features.get("problem_type"))), PROBLEM_TYPE_WEIGHT),
+            (("difficulty", self._hashable(features.get("difficulty"))), DIFFICULTY_WEIGHT)
+        ]
+        for value in set(features.get("data_structures") or []):
+            keys.append((("data_structures", value), DATA_STRUCTURE_WEIGHT))
+        for value in set(features.get("algorithms") or []):
+            keys.append((("algorithms", value), ALGORITHM_WEIGHT))
+        
+        encoded = []
+        for key, weight in keys:
+            column = self._columns.get(key)
+            if column is None:
+                if not create:
+                    continue
+                column = len(self._columns)
+                self._columns[key] = column
+                self._postings.append(np.empty(self.initial_capacity, dtype=np.int32))
+                self._lengths.append(0)
+            encoded.append((column, weight))
+        return encoded
+    
+    def _hashable(self, value: Any) -> Hashable:
+        """将列表等不可哈希的取值转换为可比较的键"""
+        try:
+            hash(value)
+            return value
+        except TypeError:
+            return ("__json__", json.dumps(value, ensure_ascii=False, sort_keys=True))
+    
+    def _append(self, column: int, row: int):
+        """把行号追加到列的倒排列表，容量不足时按两倍扩容（需持有锁）"""
+        posting = self._postings[column]
+        length = self._lengths[column]
+        if length == len(posting):
+            grown = np.empty(max(len(posting), 1) * 2, dtype=np.int32)
+            grown[:length] = posting[:length]
+            self._postings[column] = posting = grown
+        posting[length] = row
+        self._lengths[column] = length + 1
+    
+    def _remove_row(self, row: int):
+        """从所有倒排列表中删除一行（覆盖已有问题时使用，需持有锁）
+        
+        删除后的列表写入新数组，锁外正在读取旧数组的查询不受影响。
+        """
+        for column, posting in enumerate(self._postings):
+            length = self._lengths[column]
+            kept = posting[:length][posting[:length] != row]
+            if len(kept) == length:
+                continue
+            replaced = np.empty(len(posting), dtype=np.int32)
+            replaced[:len(kept)] = kept
+            self._postings[column] = replaced
+            self._lengths[column] = len(kept)
@@ -0,0 +1,374 @@
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+from src.config import FEEDBACK_DB_PATH
+from src.feedback.base import BaseFeedbackStorage
+from src.feedback.similarity import FeatureMatrix, normalize_features
+from src.utils.lru import LRUCache
+from src.utils.tracing import traced
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS problems (
+    id TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    features TEXT NOT NULL,
+    problem_type TEXT NOT NULL DEFAULT '""',
+    difficulty TEXT NOT NULL DEFAULT '""',
+    data_structures TEXT NOT NULL DEFAULT '[]',
+    algorithms TEXT NOT NULL DEFAULT '[]',
+    feature_source TEXT NOT NULL DEFAULT 'llm',
+    created_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS solutions (
+    id TEXT PRIMARY KEY,
+    problem_id TEXT NOT NULL,
+    code TEXT NOT NULL,
+    language TEXT NOT NULL,
+    reasoning TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_solutions_problem_id ON solutions(problem_id);
+
+CREATE TABLE IF NOT EXISTS feedback (
+    id TEXT PRIMARY KEY,
+    solution_id TEXT NOT NULL,
+    is_positive INTEGER NOT NULL,
+    comment TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_feedback_solution_id ON feedback(solution_id, created_at);
+"""
+
+class SQLiteFeedbackStorage(BaseFeedbackStorage):
+    """基于SQLite（WAL模式）的反馈存储
+    
+    每次写入只插入一行，写入耗时不随历史数据量增长；WAL模式下读写互不阻塞，
+    并发请求也不会丢失更新或留下写了一半的文件。
+    """
+    
+    def __init__(self, db_path: str = None, problem_cache_size: int = 256):
+        """初始化反馈存储"""
+        self.db_path = Path(db_path or FEEDBACK_DB_PATH)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        # 每个线程使用独立的连接
+        self._local = threading.local()
+        
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        self._migrate(conn)
+        conn.commit()
+        
+        # 问题内容缓存
+        self._problem_cache = LRUCache(max_size=problem_cache_size)
+        
+        # 相似问题检索用的特征矩阵：启动时从数据库加载，之后每次查询前补充
+        # 其他进程（多工作进程部署）新写入的问题
+        self._feature_matrix = FeatureMatrix()
+        self._matrix_rowid = 0
+        self._matrix_lock = threading.Lock()
+        self._refresh_feature_matrix()
+    
+    def _migrate(self, conn: sqlite3.Connection):
+        """为旧版本创建的数据库补充新增的列（旧数据的特征都由LLM提取）"""
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(problems)")}
+        if "feature_source" not in columns:
+            conn.execute("ALTER TABLE problems ADD COLUMN feature_source TEXT NOT NULL DEFAULT 'llm'")
+    
+    def _refresh_feature_matrix(self):
+        """把rowid大于上次读取位置的问题加入特征矩阵（问题只插入不删除，rowid递增）"""
+        with self._matrix_lock:
+            rows = self._connect().execute(
+                "SELECT rowid, id, problem_type, difficulty, data_structures, algorithms "
+                "FROM problems WHERE rowid > ? ORDER BY rowid",
+                (self._matrix_rowid,)
+            ).fetchall()
+            for row in rows:
+                # 本进程写入的问题在add_problem中已经加入
+                if row["id"] not in self._feature_matrix:
+                    self._feature_matrix.add(row["id"], self._features_from_row(row))
+            if rows:
+                self._matrix_rowid = rows[-1]["rowid"]
+    
+    def _connect(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def _generate_hash(self, text: str) -> str:
+        """生成文本的哈希值作为ID"""
+        return hashlib.md5(text.encode()).hexdigest()
+    
+    @traced("storage.add_problem")
+    def add_problem(self, problem_text: str, features: Dict[str, Any], feature_source: str = "llm") -> str:
+        """添加问题"""
+        problem_id = self._generate_hash(problem_text)
+        
+        conn = self._connect()
+        with conn:
+            # 问题已存在时忽略
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO problems "
+                "(id, text, features, problem_type, difficulty, data_structures, algorithms, feature_source, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    problem_id,
+                    problem_text,
+                    json.dumps(features, ensure_ascii=False),
+                    *self._feature_columns(features),
+                    feature_source,
+                    time.time()
+                )
+            )
+        
+        if cursor.rowcount:
+            self._feature_matrix.add(problem_id, normalize_features(features))
+            self._index_problem(problem_id, problem_text)
+        return problem_id
+    
+    @traced("storage.add_solution")
+    def add_solution(self, problem_id: str, code: str, language: str, reasoning: str) -> str:
+        """添加解决方案"""
+        solution_id = self._generate_hash(f"{problem_id}:{code}")
+        
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO solutions (id, problem_id, code, language, reasoning, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (solution_id, problem_id, code, language, reasoning, time.time())
+            )
+        return solution_id
+    
+    @traced("storage.add_feedback")
+    def add_feedback(self, solution_id: str, is_positive: bool, comment: str = None) -> str:
+        """添加反馈"""
+        created_at = time.time()
+        feedback_id = f"{solution_id}_{int(created_at)}"
+        
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO feedback (id, solution_id, is_positive, comment, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (feedback_id, solution_id, int(is_positive), comment, created_at)
+            )
+        return feedback_id
+    
+    def get_problem(self, problem_id: str) -> Optional[Dict[str, Any]]:
+        """获取问题"""
+        problem = self._problem_cache.get(problem_id)
+        if problem is None:
+            row = self._connect().execute(
+                "SELECT id, text, features, feature_source, created_at FROM problems WHERE id = ?", (problem_id,)
+            ).fetchone()
+            if not row:
+                return None
+            problem = self._problem_from_row(row)
+            self._problem_cache.put(problem_id, problem)
+        
+        # 返回副本，避免调用方修改缓存内容
+        return dict(problem)
+    
+    def get_problem_ids(self) -> List[str]:
+        """获取所有问题ID（按添加顺序）"""
+        rows = self._connect().execute("SELECT id FROM problems ORDER BY rowid").fetchall()
+        return [row["id"] for row in rows]
+    
+    def get_solution(self, solution_id: str) -> Optional[Dict[str, Any]]:
+        """获取解决方案"""
+        row = self._connect().execute(
+            "SELECT id, problem_id, code, language, reasoning, created_at FROM solutions WHERE id = ?",
+            (solution_id,)
+        ).fetchone()
+        return dict(row) if row else None
+    
+    def get_solutions_for_problem(self, problem_id: str) -> List[str]:
+        """获取特定问题的所有解决方案ID"""
+        rows = self._connect().execute(
+            "SELECT id FROM solutions WHERE problem_id = ? ORDER BY created_at", (problem_id,)
+        ).fetchall()
+        return [row["id"] for row in rows]
+    
+    @traced("storage.get_feedback_for_solution")
+    def get_feedback_for_solution(self, solution_id: str) -> List[Dict[str, Any]]:
+        """获取特定解决方案的所有反馈"""
+        rows = self._connect().execute(
+            "SELECT id, solution_id, is_positive, comment, created_at FROM feedback "
+            "WHERE solution_id = ? ORDER BY created_at DESC",
+            (solution_id,)
+        ).fetchall()
+        return [self._feedback_from_row(row) for row in rows]
+    
+    @traced("storage.get_feedback_for_problems")
+    def get_feedback_for_problems(self, problem_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """批量获取多个问题的所有反馈（一次查询）"""
+        result = {problem_id: [] for problem_id in problem_ids}
+        if not problem_ids:
+            return result
+        
+        placeholders = ", ".join("?" for _ in problem_ids)
+        rows = self._connect().execute(
+            "SELECT s.problem_id, f.id, f.solution_id, f.is_positive, f.comment, f.created_at "
+            "FROM solutions s JOIN feedback f ON f.solution_id = s.id "
+            f"WHERE s.problem_id IN ({placeholders}) "
+            "ORDER BY s.created_at, f.created_at DESC",
+            list(problem_ids)
+        ).fetchall()
+        
+        for row in rows:
+            result[row["problem_id"]].append(self._feedback_from_row(row))
+        return result
+    
+    @traced("storage.get_similar_problems")
+    def get_similar_problems(self, features: Dict[str, Any], limit: int = 5) -> List[Dict[str, Any]]:
+        """获取具有相似特征的问题"""
+        # 一次矩阵运算得到所有问题的相似度，并取前N个
+        self._refresh_feature_matrix()
+        problem_scores = self._feature_matrix.top_k(features, limit)
+        
+        # 获取前N个相似问题
+        similar_problems = []
+        for problem_id, score in problem_scores:
+            problem = self.get_problem(problem_id)
+            if problem:
+                problem["similarity_score"] = score
+                similar_problems.append(problem)
+        
+        return similar_problems
+    
+    def get_feedback_statistics(self) -> Dict[str, Any]:
+        """获取反馈统计信息"""
+        conn = self._connect()
+        total_problems = conn.execute("SELECT COUNT(*) FROM problems").fetchone()[0]
+        total_solutions = conn.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+        total_feedback, positive_feedback = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(is_positive), 0) FROM feedback"
+        ).fetchone()
+        negative_feedback = total_feedback - positive_feedback
+        
+        positive_rate = positive_feedback / total_feedback if total_feedback > 0 else 0
+        
+        return {
+            "total_problems": total_problems,
+            "total_solutions": total_solutions,
+            "total_feedback": total_feedback,
+            "positive_feedback": positive_feedback,
+            "negative_feedback": negative_feedback,
+            "positive_rate": positive_rate
+        }
+    
+    def import_records(self, problems: List[Dict[str, Any]], solutions: List[Dict[str, Any]], 
+                       feedbacks: List[Dict[str, Any]]) -> Dict[str, int]:
+        """批量导入已有记录（保留原有ID和时间戳，已存在的记录跳过）"""
+        conn = self._connect()
+        with conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO problems "
+                "(id, text, features, problem_type, difficulty, data_structures, algorithms, feature_source, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        problem["id"],
+                        problem["text"],
+                        json.dumps(problem.get("features", {}), ensure_ascii=False),
+                        *self._feature_columns(problem.get("features", {})),
+                        problem.get("feature_source", "llm"),
+                        problem.get("created_at", time.time())
+                    )
+                    for problem in problems
+                ]
+            )
+            imported_problems = conn.total_changes - before
+            
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO solutions (id, problem_id, code, language, reasoning, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        solution["id"],
+                        solution["problem_id"],
+                        solution.get("code", ""),
+                        solution.get("language", ""),
+                        solution.get("reasoning", ""),
+                        solution.get("created_at", time.time())
+                    )
+                    for solution in solutions
+                ]
+            )
+            imported_solutions = conn.total_changes - before
+            
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO feedback (id, solution_id, is_positive, comment, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        feedback["id"],
+                        feedback["solution_id"],
+                        int(bool(feedback["is_positive"])),
+                        feedback.get("comment"),
+                        feedback.get("created_at", time.time())
+                    )
+                    for feedback in feedbacks
+                ]
+            )
+            imported_feedback = conn.total_changes - before
+        
+        for problem in problems:
+            if problem["id"] not in self._feature_matrix:
+                self._feature_matrix.add(problem["id"], normalize_features(problem.get("features", {})))
+        
+        return {
+            "problems": imported_problems,
+            "solutions": imported_solutions,
+            "feedback": imported_feedback
+        }
+    
+    def _feature_columns(self, features: Dict[str, Any]) -> tuple:
+        """相似度计算用到的特征列（JSON编码，保留原始类型以便比较）"""
+        return tuple(
+            json.dumps(value, ensure_ascii=False) for value in normalize_features(features).values()
+        )
+    
+    def _features_from_row(self, row: sqlite3.Row) -> Dict[str, Any]:
+        """从特征列还原相似度计算用的特征"""
+        return {
+            "problem_type": json.loads(row["problem_type"]),
+            "difficulty": json.loads(row["difficulty"]),
+            "data_structures": json.loads(row["data_structures"]),
+            "algorithms": json.loads(row["algorithms"])
+        }
+    
+    def _problem_from_row(self, row: sqlite3.Row) -> Dict[str, Any]:
+        """将数据库行转换为问题字典"""
+        return {
+            "id": row["id"],
+            "text": row["text"],
+            "features": json.loads(row["features"]),
+            "feature_source": row["feature_source"],
+            "created_at": row["created_at"]
+        }
+    
+    def _feedback_from_row(self, row: sqlite3.Row) -> Dict[str, Any]:
+        """将数据库行转换为反馈字典"""
+        return {
+            "id": row["id"],
+            "solution_id": row["solution_id"],
+            "is_positive": bool(row["is_positive"]),
+            "comment": row["comment"],
+            "created_at": row["created_at"]
+        }
@@ -2,27 +2,61 @@ import os
 import json
 import time
 import hashlib
+import threading
+from collections import defaultdict
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 from src.config import FEEDBACK_DIR
+from src.feedback.base import BaseFeedbackStorage
+from src.feedback.similarity import FeatureMatrix, normalize_features
+from src.utils.lru import LRUCache
+from src.utils.tracing import traced
 
-class FeedbackStorage:
+class FeedbackStorage(BaseFeedbackStorage):
     """简化的反馈存储系统 - 使用JSON文件存储"""
     
-    def __init__(self):
-        """初始化反馈存储"""
-        self.problems_dir = FEEDBACK_DIR / "problems"
-        self.solutions_dir = FEEDBACK_DIR / "solutions"
-        self.feedback_dir = FEEDBACK_DIR / "feedback"
-        self.index_path = FEEDBACK_DIR / "index.json"
+    def __init__(self, feedback_cache_size: int = 10000, problem_cache_size: int = 256,
+                 feedback_dir: Path = None):
+        """初始化反馈存储（feedback_dir默认为data/feedback）"""
+        root = Path(feedback_dir) if feedback_dir else FEEDBACK_DIR
+        self.problems_dir = root / "problems"
+        self.solutions_dir = root / "solutions"
+        self.feedback_dir = root / "feedback"
+        self.index_path = root / "index.json"
         
         # 确保目录存在
         self.problems_dir.mkdir(parents=True, exist_ok=True)
         self.solutions_dir.mkdir(parents=True, exist_ok=True)
         self.feedback_dir.mkdir(parents=True, exist_ok=True)
         
+        # 写操作锁（请求在多个线程中并发处理）
+        self._lock = threading.RLock()
+        
         # 加载或创建索引
         self.index = self._load_or_create_index()
+        
+        # 反向索引：problem_id -> 解决方案ID列表，solution_id -> 反馈ID列表
+        self._build_reverse_indexes()
+        
+        # 反馈和问题内容缓存（写入后不会修改，可以安全缓存）
+        self._feedback_cache = LRUCache(max_size=feedback_cache_size)
+        self._problem_cache = LRUCache(max_size=problem_cache_size)
+    
+    def _build_reverse_indexes(self):
+        """根据主索引重建反向索引"""
+        with self._lock:
+            self._solutions_by_problem = defaultdict(list)
+            for solution_id, solution_info in self.index["solutions"].items():
+                self._solutions_by_problem[solution_info["problem_id"]].append(solution_id)
+            
+            self._feedback_by_solution = defaultdict(list)
+            for feedback_id, feedback_info in self.index["feedback"].items():
+                self._feedback_by_solution[feedback_info["solution_id"]].append(feedback_id)
+            
+            # 相似问题检索用的特征矩阵
+            self._feature_matrix = FeatureMatrix()
+            for problem_id, problem_features in self.index["problem_features"].items():
+                self._feature_matrix.add(problem_id, problem_features)
     
     def _load_or_create_index(self) -> Dict[str, Any]:
         """加载或创建索引文件"""
@@ -42,14 +76,16 @@ class FeedbackStorage:
     
     def _save_index(self):
         """保存索引文件"""
-        with open(self.index_path, 'w', encoding='utf-8') as f:
-            json.dump(self.index, f, ensure_ascii=False, indent=2)
+        with self._lock:
+            with open(self.index_path, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f, ensure_ascii=False, indent=2)
     
     def _generate_hash(self, text: str) -> str:
         """生成文本的哈希值作为ID"""
         return hashlib.md5(text.encode()).hexdigest()
     
-    def add_problem(self, problem_text: str, features: Dict[str, Any]) -> str:
+    @traced("storage.add_problem")
+    def add_problem(self, problem_text: str, features: Dict[str, Any], feature_source: str = "llm") -> str:
         """添加问题"""
         # 生成ID
         problem_id = self._generate_hash(problem_text)
@@ -63,29 +99,30 @@ class FeedbackStorage:
             "id": problem_id,
             "text": problem_text,
             "features": features,
+            "feature_source": feature_source,
             "created_at": time.time()
         }
         
         with open(self.problems_dir / f"{problem_id}.json", 'w', encoding='utf-8') as f:
             json.dump(problem_data, f, ensure_ascii=False, indent=2)
         
-        # 更新索引
-        self.index["problems"][problem_id] = {
-            "id": problem_id,
-            "created_at": problem_data["created_at"]
-        }
-        
-        # 将特征添加到特征索引中，用于后续相似性搜索
-        self.index["problem_features"][problem_id] = {
-            "problem_type": features.get("problem_type", ""),
-            "difficulty": features.get("difficulty", ""),
-            "data_structures": features.get("data_structures", []),
-            "algorithms": features.get("algorithms", [])
-        }
-        
-        self._save_index()
+        with self._lock:
+            # 更新索引
+            self.index["problems"][problem_id] = {
+                "id": problem_id,
+                "created_at": problem_data["created_at"]
+            }
+            
+            # 将特征添加到特征索引中，用于后续相似性搜索
+            self.index["problem_features"][problem_id] = normalize_features(features)
+            self._feature_matrix.add(problem_id, self.index["problem_features"][problem_id])
+            
+            self._save_index()
+        
+        self._index_problem(problem_id, problem_text)
         return problem_id
     
+    @traced("storage.add_solution")
     def add_solution(self, problem_id: str, code: str, language: str, reasoning: str) -> str:
         """添加解决方案"""
         # 生成ID
@@ -108,17 +145,20 @@ class FeedbackStorage:
         with open(self.solutions_dir / f"{solution_id}.json", 'w', encoding='utf-8') as f:
             json.dump(solution_data, f, ensure_ascii=False, indent=2)
         
-        # 更新索引
-        self.index["solutions"][solution_id] = {
-            "id": solution_id,
-            "problem_id": problem_id,
-            "language": language,
-            "created_at": solution_data["created_at"]
-        }
-        
-        self._save_index()
+        with self._lock:
+            # 更新索引
+            self.index["solutions"][solution_id] = {
+                "id": solution_id,
+                "problem_id": problem_id,
+                "language": language,
+                "created_at": solution_data["created_at"]
+            }
+            self._solutions_by_problem[problem_id].append(solution_id)
+            
+            self._save_index()
         return solution_id
     
+    @traced("storage.add_feedback")
     def add_feedback(self, solution_id: str, is_positive: bool, comment: str = None) -> str:
         """添加反馈"""
         # 生成ID
@@ -136,25 +176,42 @@ class FeedbackStorage:
         with open(self.feedback_dir / f"{feedback_id}.json", 'w', encoding='utf-8') as f:
             json.dump(feedback_data, f, ensure_ascii=False, indent=2)
         
-        # 更新索引
-        self.index["feedback"][feedback_id] = {
-            "id": feedback_id,
-            "solution_id": solution_id,
-            "is_positive": is_positive,
-            "created_at": feedback_data["created_at"]
-        }
-        
-        self._save_index()
+        with self._lock:
+            # 同一秒内的重复反馈会覆盖之前的记录，反向索引中不重复添加
+            if feedback_id not in self.index["feedback"]:
+                self._feedback_by_solution[solution_id].append(feedback_id)
+            self._feedback_cache.put(feedback_id, feedback_data)
+            
+            # 更新索引
+            self.index["feedback"][feedback_id] = {
+                "id": feedback_id,
+                "solution_id": solution_id,
+                "is_positive": is_positive,
+                "created_at": feedback_data["created_at"]
+            }
+            
+            self._save_index()
         return feedback_id
     
     def get_problem(self, problem_id: str) -> Optional[Dict[str, Any]]:
         """获取问题"""
-        problem_path = self.problems_dir / f"{problem_id}.json"
-        if not problem_path.exists():
-            return None
-        
-        with open(problem_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        problem = self._problem_cache.get(problem_id)
+        if problem is None:
+            problem_path = self.problems_dir / f"{problem_id}.json"
+            if not problem_path.exists():
+                return None
+            
+            with open(problem_path, 'r', encoding='utf-8') as f:
+                problem = json.load(f)
+            self._problem_cache.put(problem_id, problem)
+        
+        # 返回副本，避免调用方修改缓存内容
+        return dict(problem)
+    
+    def get_problem_ids(self) -> List[str]:
+        """获取所有问题ID（按添加顺序）"""
+        with self._lock:
+            return list(self.index["problems"].keys())
     
     def get_solution(self, solution_id: str) -> Optional[Dict[str, Any]]:
         """获取解决方案"""
@@ -165,37 +222,52 @@ class FeedbackStorage:
         with open(solution_path, 'r', encoding='utf-8') as f:
             return json.load(f)
     
+    def get_solutions_for_problem(self, problem_id: str) -> List[str]:
+        """获取特定问题的所有解决方案ID"""
+        with self._lock:
+            return list(self._solutions_by_problem.get(problem_id, []))
+    
+    @traced("storage.get_feedback_for_solution")
     def get_feedback_for_solution(self, solution_id: str) -> List[Dict[str, Any]]:
         """获取特定解决方案的所有反馈"""
         feedbacks = []
         
-        # 从索引中找到与解决方案相关的反馈
-        for feedback_id, feedback_info in self.index["feedback"].items():
-            if feedback_info["solution_id"] == solution_id:
-                feedback_path = self.feedback_dir / f"{feedback_id}.json"
-                if feedback_path.exists():
-                    with open(feedback_path, 'r', encoding='utf-8') as f:
-                        feedbacks.append(json.load(f))
+        # 从反向索引中找到与解决方案相关的反馈
+        with self._lock:
+            feedback_ids = list(self._feedback_by_solution.get(solution_id, []))
+        for feedback_id in feedback_ids:
+            feedback = self._load_feedback(feedback_id)
+            if feedback:
+                feedbacks.append(feedback)
         
         # 按时间排序
         feedbacks.sort(key=lambda x: x["created_at"], reverse=True)
         return feedbacks
     
+    def _load_feedback(self, feedback_id: str) -> Optional[Dict[str, Any]]:
+        """读取反馈内容（优先使用缓存）"""
+        feedback = self._feedback_cache.get(feedback_id)
+        if feedback is not None:
+            return feedback
+        
+        feedback_path = self.feedback_dir / f"{feedback_id}.json"
+        if not feedback_path.exists():
+            return None
+        
+        with open(feedback_path, 'r', encoding='utf-8') as f:
+            feedback = json.load(f)
+        self._feedback_cache.put(feedback_id, feedback)
+        return feedback
+    
+    @traced("storage.get_similar_problems")
     def get_similar_problems(self, features: Dict[str, Any], limit: int = 5) -> List[Dict[str, Any]]:
         """获取具有相似特征的问题"""
-        problem_scores = []
-        
-        # 计算每个问题的相似度得分
-        for problem_id, problem_features in self.index["problem_features"].items():
-            score = self._calculate_similarity(features, problem_features)
-            problem_scores.append((problem_id, score))
-        
-        # 按相似度排序
-        problem_scores.sort(key=lambda x: x[1], reverse=True)
+        # 一次矩阵运算得到所有问题的相似度，并取前N个
+        problem_scores = self._feature_matrix.top_k(features, limit)
         
         # 获取前N个相似问题
         similar_problems = []
-        for problem_id, score in problem_scores[:limit]:
+        for problem_id, score in problem_scores:
             problem = self.get_problem(problem_id)
             if problem:
                 problem["similarity_score"] = score
@@ -203,41 +275,14 @@ class FeedbackStorage:
         
         return similar_problems
     
-    def _calculate_similarity(self, features1: Dict[str, Any], features2: Dict[str, Any]) -> float:
-        """计算两组特征之间的相似度（简单实现）"""
-        score = 0.0
-        
-        # 问题类型相似度
-        if features1.get('problem_type') == features2.get('problem_type'):
-            score += 3.0
-        
-        # 难度相似度
-        if features1.get('difficulty') == features2.get('difficulty'):
-            score += 1.0
-        
-        # 数据结构相似度
-        data_structures1 = set(features1.get('data_structures', []))
-        data_structures2 = set(features2.get('data_structures', []))
-        if data_structures1 and data_structures2:
-            overlap = len(data_structures1.intersection(data_structures2))
-            score += overlap * 2.0
-        
-        # 算法相似度
-        algorithms1 = set(features1.get('algorithms', []))
-        algorithms2 = set(features2.get('algorithms', []))
-        if algorithms1 and algorithms2:
-            overlap = len(algorithms1.intersection(algorithms2))
-            score += overlap * 2.0
-        
-        return score
-    
     def get_feedback_statistics(self) -> Dict[str, Any]:
         """获取反馈统计信息"""
-        total_problems = len(self.index["problems"])
-        total_solutions = len(self.index["solutions"])
-        total_feedback = len(self.index["feedback"])
-        
-        positive_feedback = sum(1 for info in self.index["feedback"].values() if info["is_positive"])
+        with self._lock:
+            total_problems = len(self.index["problems"])
+            total_solutions = len(self.index["solutions"])
+            total_feedback = len(self.index["feedback"])
+            
+            positive_feedback = sum(1 for info in self.index["feedback"].values() if info["is_positive"])
         negative_feedback = total_feedback - positive_feedback
         
         positive_rate = positive_feedback / total_feedback if total_feedback > 0 else 0
@@ -0,0 +1,205 @@
+import json
+import random
+import hashlib
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Tuple, Iterable
+
+# 合成数据使用的特征取值（前面的取值出现得更频繁，接近真实数据的长尾分布）
+PROBLEM_TYPES = ["数组", "字符串", "树", "链表", "图", "矩阵", "数学", "unknown"]
+DIFFICULTIES = ["中等", "简单", "困难", "medium"]
+DATA_STRUCTURES = ["哈希表", "数组", "树", "堆/优先队列", "栈", "队列", "链表", "图", "并查集", "字典树"]
+ALGORITHMS = ["动态规划", "双指针技术", "二分查找", "贪心算法", "深度优先搜索", "广度优先搜索",
+              "回溯", "排序", "前缀和", "滑动窗口", "位运算", "拓扑排序"]
+
+# 合成记录的起始时间戳（固定值，同一个seed生成的数据完全相同）
+BASE_TIMESTAMP = 1700000000.0
+
+_TASKS = [
+    "找出和为目标值的两个元素并返回它们的下标",
+    "求最长的不含重复字符的连续片段长度",
+    "判断是否存在满足条件的路径",
+    "计算所有可能方案的数量，结果对 10^9 + 7 取模",
+    "返回按要求排序后的结果",
+    "求最小的操作次数",
+    "合并所有重叠的区间",
+    "找出出现次数超过一半的元素",
+]
+
+def _zipf_weights(count: int) -> List[float]:
+    return [1.0 / (rank + 1) for rank in range(count)]
+
+_TYPE_WEIGHTS = _zipf_weights(len(PROBLEM_TYPES))
+_DIFFICULTY_WEIGHTS = [4.0, 3.0, 2.0, 1.0]
+_DS_WEIGHTS = _zipf_weights(len(DATA_STRUCTURES))
+_ALGO_WEIGHTS = _zipf_weights(len(ALGORITHMS))
+
+def _hash(text: str) -> str:
+    """与FeedbackStorage相同的ID生成方式"""
+    return hashlib.md5(text.encode()).hexdigest()
+
+def _sample(rng: random.Random, values: List[str], weights: List[float], max_count: int) -> List[str]:
+    """按权重不放回地抽取0到max_count个取值"""
+    chosen = []
+    for _ in range(rng.randint(0, max_count)):
+        value = rng.choices(values, weights)[0]
+        if value not in chosen:
+            chosen.append(value)
+    return chosen
+
+def random_features(rng: random.Random) -> Dict[str, Any]:
+    """生成一组随机的问题特征"""
+    return {
+        "problem_type": rng.choices(PROBLEM_TYPES, _TYPE_WEIGHTS)[0],
+        "difficulty": rng.choices(DIFFICULTIES, _DIFFICULTY_WEIGHTS)[0],
+        "data_structures": _sample(rng, DATA_STRUCTURES, _DS_WEIGHTS, 3),
+        "algorithms": _sample(rng, ALGORITHMS, _ALGO_WEIGHTS, 3)
+    }
+
+def _problem_text(rng: random.Random, index: int, features: Dict[str, Any]) -> str:
+    """题目文本（包含序号，保证每个问题的ID不同）"""
+    subject = features["problem_type"] if features["problem_type"] != "unknown" else "输入"
+    size = rng.choice([10 ** 3, 10 ** 4, 10 ** 5])
+    values = [rng.randint(-100, 100) for _ in range(rng.randint(3, 8))]
+    return (
+        f"第 {index} 题：给定一个{subject} nums，{rng.choice(_TASKS)}。\n\n"
+        f"示例 1：\n\n输入：nums = {values}, target = {rng.randint(-50, 50)}\n"
+        f"输出：{rng.randint(0, len(values))}\n\n"
+        f"提示：\n\n1 <= nums.length <= {size}\n-10^9 <= nums[i] <= 10^9"
+    )
+
+def _solution_code(rng: random.Random, index: int, variant: int) -> str:
+    return (
+        f"def solve_{index}_{variant}(nums, target):\n"
+        f"    seen = {{}}\n"
+        f"    for i, num in enumerate(nums):\n"
+        f"        if target - num in seen:\n"
+        f"            return [seen[target - num], i]\n"
+        f"        seen[num] = i\n"
+        f"    return [{rng.randint(-1, 1)}]"
+    )
+
+def generate_records(num_problems: int, solutions_per_problem: float = 2.0,
+                     feedback_per_solution: float = 2.0, positive_rate: float = 0.7,
+                     seed: int = 0) -> Iterator[Tuple[Dict[str, Any], List[Dict[str, Any]], List[Dict[str, Any]]]]:
+    """按顺序生成 (问题, 解决方案列表, 反馈列表)，字段与data/feedback中的JSON文件一致
+    
+    每个问题的解决方案数和每个解决方案的反馈数在 [0, 2*平均值] 内均匀分布，
+    因此有的问题没有解决方案、有的解决方案没有反馈。
+    """
+    rng = random.Random(seed)
+    for index in range(num_problems):
+        created_at = BASE_TIMESTAMP + index * 60
+        features = random_features(rng)
+        text = _problem_text(rng, index, features)
+        problem = {
+            "id": _hash(text),
+            "text": text,
+            "features": features,
+            "feature_source": "llm",
+            "created_at": created_at
+        }
+        
+        solutions = []
+        feedbacks = []
+        for variant in range(rng.randint(0, int(2 * solutions_per_problem))):
+            code = _solution_code(rng, index, variant)
+            solution_id = _hash(f"{problem['id']}:{code}")
+            solution_time = created_at + 1 + variant
+            solutions.append({
+                "id": solution_id,
+                "problem_id": problem["id"],
+                "code": code,
+                "language": "python",
+                "reasoning": f"使用哈希表记录已经遍历过的元素，一次遍历即可。时间复杂度 O(n)。（方案 {variant}）",
+                "created_at": solution_time
+            })
+            
+            # 反馈ID为 solution_id_整数秒，每条反馈间隔至少1秒避免ID重复
+            for offset in range(rng.randint(0, int(2 * feedback_per_solution))):
+                feedback_time = solution_time + 10 + offset * 5 + rng.random()
+                is_positive = rng.random() < positive_rate
+                feedbacks.append({
+                    "id": f"{solution_id}_{int(feedback_time)}",
+                    "solution_id": solution_id,
+                    "is_positive": is_positive,
+                    "comment": "" if is_positive else rng.choice(["超时", "边界情况错误", "没有处理空输入", ""]),
+                    "created_at": feedback_time
+                })
+        yield problem, solutions, feedbacks
+
+def write_json_store(feedback_dir: Path, records: Iterable) -> Dict[str, int]:
+    """把合成记录写成JSON文件存储（与FeedbackStorage的目录结构和索引格式相同）
+    
+    索引在全部文件写完后一次性写入，避免逐条添加时反复重写index.json。
+    目录中已有索引时拒绝写入，防止覆盖真实数据。
+    """
+    feedback_dir = Path(feedback_dir)
+    index_path = feedback_dir / "index.json"
+    if index_path.exists():
+        raise FileExistsError(f"目录中已有反馈数据: {index_path}")
+    
+    directories = {name: feedback_dir / name for name in ("problems", "solutions", "feedback")}
+    for directory in directories.values():
+        directory.mkdir(parents=True, exist_ok=True)
+    
+    index = {"problems": {}, "solutions": {}, "feedback": {}, "problem_features": {}}
+    for problem, solutions, feedbacks in records:
+        _write_entity(directories["problems"], problem)
+        index["problems"][problem["id"]] = {"id": problem["id"], "created_at": problem["created_at"]}
+        index["problem_features"][problem["id"]] = problem["features"]
+        
+        for solution in solutions:
+            _write_entity(directories["solutions"], solution)
+            index["solutions"][solution["id"]] = {
+                "id": solution["id"],
+                "problem_id": solution["problem_id"],
+                "language": solution["language"],
+                "created_at": solution["created_at"]
+            }
+        
+        for feedback in feedbacks:
+            _write_entity(directories["feedback"], feedback)
+            index["feedback"][feedback["id"]] = {
+                "id": feedback["id"],
+                "solution_id": feedback["solution_id"],
+                "is_positive": feedback["is_positive"],
+                "created_at": feedback["created_at"]
+            }
+    
+    with open(index_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    
+    return {
+        "problems": len(index["problems"]),
+        "solutions": len(index["solutions"]),
+        "feedback": len(index["feedback"])
+    }
+
+def _write_entity(directory: Path, entity: Dict[str, Any]):
+    with open(directory / f"{entity['id']}.json", 'w', encoding='utf-8') as f:
+        json.dump(entity, f, ensure_ascii=False, indent=2)
+
+def write_sqlite_store(db_path: Path, records: Iterable, batch_size: int = 10000) -> Dict[str, int]:
+    """把合成记录分批导入SQLite存储"""
+    from src.feedback.sqlite_storage import SQLiteFeedbackStorage
+    
+    storage = SQLiteFeedbackStorage(db_path)
+    totals = {"problems": 0, "solutions": 0, "feedback": 0}
+    problems, solutions, feedbacks = [], [], []
+    
+    def flush():
+        imported = storage.import_records(problems, solutions, feedbacks)
+        for key, count in imported.items():
+            totals[key] += count
+        problems.clear()
+        solutions.clear()
+        feedbacks.clear()
+    
+    for problem, problem_solutions, problem_feedbacks in records:
+        problems.append(problem)
+        solutions.extend(problem_solutions)
+        feedbacks.extend(problem_feedbacks)
+        if len(problems) >= batch_size:
+            flush()
+    flush()
+    return totals
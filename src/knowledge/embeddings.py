@@ -0,0 +1,221 @@
+import os
+import logging
+import hashlib
+import numpy as np
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, Dict, Optional
+from src.config import EMBEDDING_BACKEND, EMBEDDING_ONNX_DIR, EMBEDDING_ONNX_QUANTIZE
+from src.utils.tracing import fields
+
+# 说明：本模块不在顶层导入torch/sentence_transformers/onnxruntime，
+# 使用ONNX后端时整个检索流程都不需要导入torch。
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "ipc", "hashing")
+
+# all-MiniLM-L6-v2的最大序列长度
+DEFAULT_MAX_SEQ_LENGTH = 256
+
+class TextEncoder(ABC):
+    """文本嵌入编码器基类"""
+    
+    # 写入索引清单的模型标识，不同后端/精度的向量不能混用
+    model_id: str = ""
+    
+    @abstractmethod
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """把文本编码为float32嵌入矩阵，形状为 [len(texts), dim]"""
+        pass
+
+class SentenceTransformerEncoder(TextEncoder):
+    """使用sentence-transformers（PyTorch）的编码器"""
+    
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        
+        self.model_name = model_name
+        self.model_id = model_name
+        self.model = SentenceTransformer(model_name)
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(texts), dtype="float32")
+
+class OnnxEncoder(TextEncoder):
+    """使用ONNX Runtime的编码器（均值池化 + L2归一化，与sentence-transformers的MiniLM一致）
+    
+    只依赖onnxruntime和tokenizers，不导入torch。
+    """
+    
+    def __init__(self, model_name: str, export_dir: Path, quantize: bool = False,
+                 max_seq_length: int = DEFAULT_MAX_SEQ_LENGTH, num_threads: int = 0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+        
+        self.model_name = model_name
+        self.model_id = f"{model_name}@onnx-int8" if quantize else f"{model_name}@onnx"
+        
+        paths = onnx_export_paths(export_dir)
+        model_path = paths["int8"] if quantize else paths["model"]
+        if not model_path.exists() or not paths["tokenizer"].exists():
+            raise FileNotFoundError(
+                f"未找到ONNX模型 {model_path}，请先运行 python scripts/export_embedding_onnx.py"
+                + (" --quantize" if quantize else "")
+            )
+        
+        options = ort.SessionOptions()
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        
+        self.tokenizer = Tokenizer.from_file(str(paths["tokenizer"]))
+        self.tokenizer.enable_truncation(max_length=max_seq_length)
+        self.tokenizer.enable_padding()
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype="float32")
+        
+        encodings = self.tokenizer.encode_batch(list(texts))
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype="int64")
+        feeds = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype="int64"),
+            "attention_mask": attention_mask,
+            "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype="int64")
+        }
+        feeds = {name: value for name, value in feeds.items() if name in self.input_names}
+        
+        token_embeddings = self.session.run(None, feeds)[0]
+        return mean_pool_and_normalize(token_embeddings, attention_mask)
+
+class HashingEncoder(TextEncoder):
+    """特征哈希编码器：分词后把每个token哈希到固定维度并做L2归一化
+    
+    不需要模型文件，速度快且结果确定，用于基准测试和没有嵌入模型的环境；
+    只反映词面重叠，语义质量远低于真实的嵌入模型。
+    """
+    
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+        self.model_id = f"hashing-{dimension}"
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        from src.knowledge.lexical import tokenize
+        
+        embeddings = np.zeros((len(texts), self.dimension), dtype="float32")
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                digest = hashlib.md5(token.encode("utf-8")).digest()
+                column = int.from_bytes(digest[:4], "little") % self.dimension
+                embeddings[row, column] += 1.0 if digest[4] & 1 else -1.0
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.clip(norms, 1e-12, None)
+
+def mean_pool_and_normalize(token_embeddings: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    """按attention mask做均值池化，然后L2归一化"""
+    mask = attention_mask[..., None].astype("float32")
+    summed = (token_embeddings * mask).sum(axis=1)
+    counts = np.clip(mask.sum(axis=1), 1e-9, None)
+    embeddings = summed / counts
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return (embeddings / np.clip(norms, 1e-12, None)).astype("float32")
+
+def onnx_export_dir(base_dir: Path, model_name: str) -> Path:
+    """ONNX导出目录：<base_dir>/<模型名>"""
+    return Path(base_dir) / model_name.replace("/", "__")
+
+def onnx_export_paths(export_dir: Path) -> Dict[str, Path]:
+    """导出目录中的文件路径"""
+    export_dir = Path(export_dir)
+    return {
+        "model": export_dir / "model.onnx",
+        "int8": export_dir / "model.int8.onnx",
+        "tokenizer": export_dir / "tokenizer.json"
+    }
+
+def export_onnx(model_name: str, export_dir: Path, quantize: bool = False,
+                opset: int = 14) -> Dict[str, Path]:
+    """把Hugging Face上的编码器导出为ONNX（需要torch和transformers，只需执行一次）
+    
+    导出的模型输出token级嵌入，池化和归一化在OnnxEncoder中完成。
+    quantize为True时额外生成动态int8量化的模型。
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    
+    paths = onnx_export_paths(export_dir)
+    os.makedirs(export_dir, exist_ok=True)
+    
+    if not paths["model"].exists() or not paths["tokenizer"].exists():
+        logger.info("导出ONNX模型", extra=fields(model=model_name, path=str(paths["model"])))
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name)
+        model.eval()
+        
+        sample = tokenizer(["导出示例", "export sample"], padding=True, return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+        
+        tmp_path = paths["model"].with_suffix(".onnx.tmp")
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(sample[name] for name in input_names),
+                str(tmp_path),
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=opset
+            )
+        os.replace(tmp_path, paths["model"])
+        
+        # 保存fast tokenizer（tokenizer.json），推理时只需要tokenizers库
+        tokenizer.save_pretrained(str(export_dir))
+    
+    if quantize and not paths["int8"].exists():
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        
+        logger.info("动态int8量化", extra=fields(path=str(paths["int8"])))
+        quantize_dynamic(str(paths["model"]), str(paths["int8"]), weight_type=QuantType.QInt8)
+    
+    return paths
+
+def cosine_agreement(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    """逐行比较两组嵌入的余弦相似度，返回最小值和平均值"""
+    reference = reference / np.clip(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12, None)
+    candidate = candidate / np.clip(np.linalg.norm(candidate, axis=1, keepdims=True), 1e-12, None)
+    cosines = (reference * candidate).sum(axis=1)
+    return {"min": float(cosines.min()), "mean": float(cosines.mean())}
+
+def create_encoder(model_name: str, backend: Optional[str] = None,
+                   onnx_dir: Optional[Path] = None, quantize: Optional[bool] = None) -> TextEncoder:
+    """根据配置创建编码器
+    
+    ONNX模型缺失或无法加载时退回到sentence-transformers。
+    """
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"未知的嵌入后端: {backend}（可选: {', '.join(EMBEDDING_BACKENDS)}）")
+    
+    if backend == "hashing":
+        return HashingEncoder()
+    
+    if backend == "ipc":
+        # 由模型服务进程计算嵌入，本进程不加载模型
+        from src.serving.client import IPCEncoder
+        return IPCEncoder()
+    
+    if backend == "onnx":
+        quantize = EMBEDDING_ONNX_QUANTIZE if quantize is None else quantize
+        export_dir = onnx_export_dir(onnx_dir or EMBEDDING_ONNX_DIR, model_name)
+        try:
+            encoder = OnnxEncoder(model_name, export_dir, quantize=quantize)
+            logger.info("使用ONNX Runtime嵌入模型", extra=fields(model_id=encoder.model_id))
+            return encoder
+        except Exception as e:
+            logger.warning("加载ONNX嵌入模型失败，使用sentence-transformers: %s", e)
+    
+    return SentenceTransformerEncoder(model_name)
@@ -0,0 +1,95 @@
+import logging
+import numpy as np
+from typing import Optional
+from src.utils.tracing import fields
+
+# 尝试导入faiss，如果失败则尝试导入CPU版本
+try:
+    import faiss
+except ImportError:
+    try:
+        import faiss.contrib.faiss_contrib as faiss
+    except ImportError:
+        raise ImportError("无法导入faiss。请安装faiss-cpu或faiss-gpu。")
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivfpq", "hnsw")
+
+# IVF每个聚类中心至少需要的训练样本数（faiss的建议值）
+MIN_POINTS_PER_CENTROID = 39
+# PQ每个子空间使用8位编码，需要至少256个训练样本
+MIN_PQ_TRAINING_POINTS = 256
+
+def build_index(embeddings: np.ndarray, index_type: str = "flat", nlist: int = 100, 
+                pq_m: int = 16, hnsw_m: int = 32, nprobe: int = 8, ef_search: int = 64):
+    """创建内积（余弦）索引并添加向量
+    
+    embeddings需要事先归一化。ivfpq会在首次构建时用全部向量训练；
+    数据量不足以训练时退回到flat索引。
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"未知的索引类型: {index_type}（可选: {', '.join(INDEX_TYPES)}）")
+    
+    count, dimension = embeddings.shape
+    
+    if index_type == "ivfpq":
+        nlist = max(1, min(nlist, count // MIN_POINTS_PER_CENTROID))
+        if count < max(MIN_PQ_TRAINING_POINTS, nlist * MIN_POINTS_PER_CENTROID) or dimension % pq_m != 0:
+            logger.warning("向量不足以训练IVF-PQ索引（或维度不能被pq_m整除），使用flat索引", extra=fields(
+                count=count, dimension=dimension, pq_m=pq_m
+            ))
+            index_type = "flat"
+        else:
+            quantizer = faiss.IndexFlatIP(dimension)
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, 8, faiss.METRIC_INNER_PRODUCT)
+            logger.info("训练IVF-PQ索引", extra=fields(nlist=nlist, pq_m=pq_m))
+            index.train(embeddings)
+    
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+    elif index_type == "flat":
+        index = faiss.IndexFlatIP(dimension)
+    
+    index.add(embeddings)
+    configure_search(index, nprobe=nprobe, ef_search=ef_search)
+    return index
+
+def configure_search(index, nprobe: int = 8, ef_search: int = 64):
+    """设置查询参数（从磁盘加载的索引也需要重新设置）"""
+    if hasattr(index, "nprobe"):
+        index.nprobe = nprobe
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+
+def index_type_of(index) -> str:
+    """返回索引对应的类型名"""
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexHNSWFlat):
+        return "hnsw"
+    return "flat"
+
+def evaluate_recall(index, embeddings: np.ndarray, k: int = 5, 
+                    num_queries: int = 100, seed: int = 0) -> Optional[float]:
+    """以flat索引的精确结果为基准，计算recall@k
+    
+    从已有向量中抽样作为查询；索引本身就是flat时返回1.0。
+    """
+    count = embeddings.shape[0]
+    if count == 0:
+        return None
+    if index_type_of(index) == "flat":
+        return 1.0
+    
+    k = min(k, count)
+    rng = np.random.default_rng(seed)
+    queries = embeddings[rng.choice(count, size=min(num_queries, count), replace=False)]
+    
+    exact = faiss.IndexFlatIP(embeddings.shape[1])
+    exact.add(embeddings)
+    _, truth = exact.search(queries, k)
+    _, found = index.search(queries, k)
+    
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return hits / float(truth.size)
@@ -0,0 +1,85 @@
+import re
+import math
+import heapq
+from collections import Counter, defaultdict
+from typing import List, Dict, Tuple, Iterable
+
+# 英文/数字单词，或连续的中日韩字符
+_TOKEN_RE = re.compile(r"[a-z0-9]+|[㐀-鿿豈-﫿]+")
+
+def _is_cjk(char: str) -> bool:
+    return "㐀" <= char <= "鿿" or "豈" <= char <= "﫿"
+
+def compile_keyword(keyword: str) -> re.Pattern:
+    """编译关键词的匹配模式（匹配小写文本）：英文关键词按单词边界匹配（避免"map"匹配到
+    "bitmap"、"dp"匹配到其他单词内部），中文关键词按子串匹配"""
+    escaped = re.escape(keyword.lower())
+    if keyword.isascii():
+        return re.compile(rf"(?<![a-z0-9]){escaped}(?![a-z0-9])")
+    return re.compile(escaped)
+
+def tokenize(text: str) -> List[str]:
+    """分词：英文按单词切分，中文使用单字和相邻双字（n-gram）
+    
+    中文没有空格分隔，单字保证召回，双字（如"二分"、"指针"）提升精度。
+    """
+    tokens = []
+    for run in _TOKEN_RE.findall(text.lower()):
+        if _is_cjk(run[0]):
+            tokens.extend(run)
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+class BM25Index:
+    """基于倒排索引的BM25检索"""
+    
+    def __init__(self, documents: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        
+        # 倒排索引：token -> [(文档序号, 词频)]
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.doc_lengths = []
+        for doc_id, text in enumerate(documents):
+            counts = Counter(tokenize(text))
+            self.doc_lengths.append(sum(counts.values()))
+            for token, tf in counts.items():
+                self.postings[token].append((doc_id, tf))
+        
+        self.avg_doc_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+        
+        count = len(self.doc_lengths)
+        self.idf = {
+            token: math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for token, docs in self.postings.items()
+        }
+    
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+    
+    def search(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """返回得分最高的k个 (文档序号, BM25得分)，只包含至少命中一个词的文档"""
+        scores = defaultdict(float)
+        for token in set(tokenize(query)):
+            docs = self.postings.get(token)
+            if not docs:
+                continue
+            idf = self.idf[token]
+            for doc_id, tf in docs:
+                norm = 1 - self.b + self.b * self.doc_lengths[doc_id] / self.avg_doc_length
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+        
+        return heapq.nlargest(k, scores.items(), key=lambda pair: pair[1])
+
+def reciprocal_rank_fusion(rankings: Iterable[List[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """倒数排名融合（RRF）：score(d) = Σ 1 / (k + rank)，rank从1开始
+    
+    只依赖排名而不依赖原始得分，因此可以直接合并BM25和余弦相似度两种量纲不同的结果。
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda pair: pair[1], reverse=True)
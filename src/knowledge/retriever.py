@@ -1,9 +1,23 @@
 import os
+import json
+import logging
+import hashlib
 import numpy as np
-from typing import List, Dict, Any
-from sentence_transformers import SentenceTransformer
-from src.config import EMBEDDINGS_DIR, DEFAULT_EMBEDDING_MODEL
+from typing import List, Dict, Any, Optional
+from src.config import (
+    EMBEDDINGS_DIR, DEFAULT_EMBEDDING_MODEL,
+    KNOWLEDGE_INDEX_TYPE, KNOWLEDGE_INDEX_NLIST, KNOWLEDGE_INDEX_PQ_M,
+    KNOWLEDGE_INDEX_HNSW_M, KNOWLEDGE_INDEX_NPROBE, KNOWLEDGE_INDEX_EF_SEARCH,
+    KNOWLEDGE_HYBRID_ENABLED, KNOWLEDGE_RRF_K, KNOWLEDGE_LEXICAL_CONFIDENCE,
+    KNOWLEDGE_QUERY_CACHE_SIZE
+)
 from src.knowledge.algorithms import AlgorithmKnowledge
+from src.knowledge.base import KnowledgeBase
+from src.knowledge.embeddings import TextEncoder, create_encoder
+from src.knowledge.index_factory import build_index, configure_search, evaluate_recall
+from src.knowledge.lexical import BM25Index, reciprocal_rank_fusion, compile_keyword
+from src.utils.lru import LRUCache
+from src.utils.tracing import span, Span, fields
 
 # 尝试导入faiss，如果失败则尝试导入CPU版本
 try:
@@ -14,21 +28,36 @@ except ImportError:
     except ImportError:
         raise ImportError("无法导入faiss。请安装faiss-cpu或faiss-gpu。")
 
+logger = logging.getLogger(__name__)
+
 class KnowledgeRetriever:
     """知识检索器"""
     
-    def __init__(self, embedding_model: str = None):
-        # 加载知识库
-        self.knowledge_base = AlgorithmKnowledge()
-        self.knowledge_base.load()
+    def __init__(self, embedding_model: str = None, index_type: str = None,
+                 encoder: Optional[TextEncoder] = None,
+                 knowledge_base: Optional[KnowledgeBase] = None, index_dir: str = None):
+        # 加载知识库（传入的知识库需已加载）
+        if knowledge_base is None:
+            knowledge_base = AlgorithmKnowledge()
+            knowledge_base.load()
+        self.knowledge_base = knowledge_base
+        
+        # 加载嵌入模型（后端由EMBEDDING_BACKEND决定）
+        self.encoder = encoder or create_encoder(embedding_model or DEFAULT_EMBEDDING_MODEL)
+        # 清单中的模型标识包含后端和精度，切换后端时会重新生成嵌入
+        self.embedding_model = self.encoder.model_id
         
-        # 加载嵌入模型
-        self.embedding_model = embedding_model or DEFAULT_EMBEDDING_MODEL
-        self.model = SentenceTransformer(self.embedding_model)
+        # 索引类型和查询参数
+        self.index_type = index_type or KNOWLEDGE_INDEX_TYPE
+        self.nprobe = KNOWLEDGE_INDEX_NPROBE
+        self.ef_search = KNOWLEDGE_INDEX_EF_SEARCH
+        self.index_recall = None
         
         # 索引路径
-        self.index_path = os.path.join(EMBEDDINGS_DIR, "knowledge_index.faiss")
-        self.items_path = os.path.join(EMBEDDINGS_DIR, "knowledge_items.npy")
+        self.index_dir = str(index_dir or EMBEDDINGS_DIR)
+        self.index_path = os.path.join(self.index_dir, "knowledge_index.faiss")
+        self.embeddings_path = os.path.join(self.index_dir, "knowledge_embeddings.npy")
+        self.manifest_path = os.path.join(self.index_dir, "knowledge_manifest.json")
         
         # 初始化索引
         self.index = None
@@ -36,86 +65,319 @@ class KnowledgeRetriever:
         
         # 加载或创建索引
         self._load_or_create_index()
+        
+        # 关键词倒排索引（BM25），加载时构建
+        self.hybrid = KNOWLEDGE_HYBRID_ENABLED
+        self.rrf_k = KNOWLEDGE_RRF_K
+        self.lexical_confidence = KNOWLEDGE_LEXICAL_CONFIDENCE
+        self._build_lexical_index()
+        self.lexical_fast_path_hits = 0
+        
+        # 查询嵌入缓存：规范化查询文本的哈希 -> 归一化嵌入向量
+        self._query_cache = LRUCache(max_size=KNOWLEDGE_QUERY_CACHE_SIZE)
+    
+    def _item_text(self, item: Dict[str, Any]) -> str:
+        """组合多个字段作为嵌入文本，以提高匹配质量"""
+        return f"{item.get('name', '')} {item.get('description', '')} {' '.join(item.get('keywords', []))}"
+    
+    def _lexical_text(self, item: Dict[str, Any]) -> str:
+        """关键词检索使用的文本：名称、关键词、适用场景和描述"""
+        return " ".join([
+            item.get('name', ''),
+            " ".join(item.get('keywords', [])),
+            " ".join(item.get('applications', [])),
+            item.get('description', '')
+        ])
+    
+    def _build_lexical_index(self):
+        """为当前知识条目构建BM25倒排索引和关键词表"""
+        self.lexical_index = BM25Index([self._lexical_text(item) for item in self.items])
+        self._item_keywords = [
+            [compile_keyword(keyword) for keyword in item.get('keywords', []) if keyword]
+            for item in self.items
+        ]
+    
+    def _hash(self, data: Any) -> str:
+        """计算内容哈希"""
+        if not isinstance(data, str):
+            data = json.dumps(data, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+    
+    def _load_manifest(self) -> Optional[Dict[str, Any]]:
+        """读取索引清单，不存在或损坏时返回None"""
+        if not os.path.exists(self.manifest_path):
+            return None
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning("读取索引清单失败: %s", e)
+            return None
     
     def _load_or_create_index(self):
-        """加载或创建知识索引"""
+        """加载或创建知识索引
+        
+        清单中记录了嵌入模型、向量维度以及每个知识条目的内容哈希。
+        知识库未变化时直接加载索引；有变化时只为新增或修改的条目重新生成嵌入，
+        其余条目复用已保存的向量，然后重建FAISS索引。
+        """
         # 确保目录存在
         os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
         
-        # 检查是否有现有索引
-        if os.path.exists(self.index_path) and os.path.exists(self.items_path):
+        all_items = self.knowledge_base.get_items()
+        texts = [self._item_text(item) for item in all_items]
+        text_hashes = [self._hash(text) for text in texts]
+        content_hashes = [self._hash(item) for item in all_items]
+        
+        manifest = self._load_manifest()
+        same_model = manifest is not None and manifest.get("embedding_model") == self.embedding_model
+        
+        # 知识库、模型和索引类型都未变化：直接加载
+        if (same_model 
+                and manifest.get("index_type") == self.index_type
+                and manifest.get("metric") == "inner_product"
+                and [entry["content_hash"] for entry in manifest.get("items", [])] == content_hashes
+                and os.path.exists(self.index_path)):
             try:
-                # 加载现有索引
-                self.index = faiss.read_index(self.index_path)
-                self.items = np.load(self.items_path, allow_pickle=True).tolist()
-                print(f"成功加载索引: {self.index_path}")
+                index = faiss.read_index(self.index_path)
+                if index.d == manifest.get("dimension") and index.ntotal == len(all_items):
+                    configure_search(index, nprobe=self.nprobe, ef_search=self.ef_search)
+                    self.index = index
+                    self.items = all_items
+                    self.index_recall = manifest.get("recall_at_5")
+                    logger.info("成功加载索引", extra=fields(path=self.index_path, items=len(all_items)))
+                    return
+                logger.warning("索引与清单不一致，重新构建索引")
             except Exception as e:
-                print(f"加载索引失败: {str(e)}")
-                self._create_index()
-        else:
-            # 创建新索引
-            self._create_index()
-    
-    def _create_index(self):
-        """创建知识索引"""
+                logger.warning("加载索引失败: %s", e)
+        
+        # 复用未变化条目的嵌入（按嵌入文本的哈希匹配）
+        cached = {}
+        if same_model and os.path.exists(self.embeddings_path):
+            try:
+                saved = np.load(self.embeddings_path, allow_pickle=False)
+                for entry, vector in zip(manifest.get("items", []), saved):
+                    cached[entry["text_hash"]] = vector
+            except Exception as e:
+                logger.warning("加载已保存的嵌入失败: %s", e)
+        
         try:
-            # 获取所有知识条目
-            all_items = self.knowledge_base.get_items()
-            self.items = all_items
-            
-            # 准备文本用于嵌入
-            texts = []
-            for item in all_items:
-                # 组合多个字段以提高匹配质量
-                text = f"{item.get('name', '')} {item.get('description', '')} {' '.join(item.get('keywords', []))}"
-                texts.append(text)
-            
-            print(f"为{len(texts)}个知识条目生成嵌入...")
+            missing = [i for i, text_hash in enumerate(text_hashes) if text_hash not in cached]
+            if missing:
+                logger.info("为新增或修改的知识条目生成嵌入", extra=fields(missing=len(missing), items=len(all_items)))
+                new_embeddings = np.asarray(self.encode([texts[i] for i in missing]), dtype="float32")
+                for i, vector in zip(missing, new_embeddings):
+                    cached[text_hashes[i]] = vector
             
-            # 生成嵌入
-            embeddings = self.model.encode(texts)
+            if not all_items:
+                raise ValueError("知识库为空")
+            embeddings = np.stack([cached[text_hash] for text_hash in text_hashes]).astype("float32")
             
-            # 创建索引
-            dimension = embeddings.shape[1]
-            print(f"创建维度为{dimension}的索引")
-            self.index = faiss.IndexFlatL2(dimension)
-            self.index.add(np.array(embeddings).astype('float32'))
-            
-            # 保存索引和条目
-            faiss.write_index(self.index, self.index_path)
-            np.save(self.items_path, np.array(self.items, dtype=object))
-            print(f"索引已保存到: {self.index_path}")
+            self.items = all_items
+            self._build_index(embeddings)
+            self._save(embeddings, text_hashes, content_hashes)
         except Exception as e:
-            print(f"创建索引失败: {str(e)}")
+            logger.exception("创建索引失败")
             # 创建一个空索引以确保程序可以继续运行
             self.items = []
-            dimension = 384  # SentenceTransformer默认维度
-            self.index = faiss.IndexFlatL2(dimension)
+            dimension = 384  # all-MiniLM-L6-v2的维度
+            self.index = faiss.IndexFlatIP(dimension)
+    
+    def _build_index(self, embeddings: np.ndarray):
+        """根据嵌入向量创建FAISS索引（归一化后使用内积，即余弦相似度）"""
+        dimension = embeddings.shape[1]
+        logger.info("创建知识索引", extra=fields(index_type=self.index_type, dimension=dimension))
+        
+        normalized = embeddings.copy()
+        faiss.normalize_L2(normalized)
+        self.index = build_index(
+            normalized,
+            index_type=self.index_type,
+            nlist=KNOWLEDGE_INDEX_NLIST,
+            pq_m=KNOWLEDGE_INDEX_PQ_M,
+            hnsw_m=KNOWLEDGE_INDEX_HNSW_M,
+            nprobe=self.nprobe,
+            ef_search=self.ef_search
+        )
+        
+        # 近似索引与精确结果对比，报告召回率
+        self.index_recall = evaluate_recall(self.index, normalized, k=5)
+        if self.index_type != "flat":
+            logger.info("知识索引召回率", extra=fields(index_type=self.index_type, recall_at_5=round(self.index_recall, 3)))
+    
+    def _save(self, embeddings: np.ndarray, text_hashes: List[str], content_hashes: List[str]):
+        """保存索引、嵌入和清单（清单最后写入，作为完成标记）"""
+        faiss.write_index(self.index, self.index_path)
+        np.save(self.embeddings_path, embeddings, allow_pickle=False)
+        
+        # 旧版本用pickle保存的条目文件已不再需要（条目直接来自知识库JSON）
+        legacy_items_path = os.path.join(self.index_dir, "knowledge_items.npy")
+        if os.path.exists(legacy_items_path):
+            os.remove(legacy_items_path)
+        
+        manifest = {
+            "embedding_model": self.embedding_model,
+            "dimension": int(embeddings.shape[1]),
+            "index_type": self.index_type,
+            "metric": "inner_product",
+            "recall_at_5": self.index_recall,
+            "items": [
+                {"id": item.get("id"), "text_hash": text_hash, "content_hash": content_hash}
+                for item, text_hash, content_hash in zip(self.items, text_hashes, content_hashes)
+            ]
+        }
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+        logger.info("索引已保存", extra=fields(path=self.index_path))
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """生成文本嵌入"""
+        return self.encoder.encode(texts)
+    
+    def _query_key(self, query: str) -> str:
+        """查询缓存键：合并空白后的查询文本哈希"""
+        return self._hash(" ".join(query.split()))
+    
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """生成归一化的查询嵌入（float32，形状为 [len(queries), dim]）
+        
+        命中缓存的查询直接复用，其余查询在一次前向计算中批量编码。
+        返回的数组是新分配的，调用方可以原地修改。
+        """
+        keys = [self._query_key(query) for query in queries]
+        vectors = [self._query_cache.get(key) for key in keys]
+        
+        missing = {}
+        for i, (key, vector) in enumerate(zip(keys, vectors)):
+            if vector is None:
+                missing.setdefault(key, []).append(i)
+        
+        if missing:
+            with span("retriever.encode", queries=len(missing), cached=len(queries) - len(missing)):
+                encoded = np.asarray(
+                    self.encode([queries[positions[0]] for positions in missing.values()]), dtype="float32"
+                )
+            faiss.normalize_L2(encoded)
+            for (key, positions), vector in zip(missing.items(), encoded):
+                self._query_cache.put(key, vector)
+                for i in positions:
+                    vectors[i] = vector
+        
+        if not vectors:
+            return np.zeros((0, self.index.d if self.index is not None else 0), dtype="float32")
+        return np.stack(vectors)
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        """生成单个查询的归一化嵌入（带缓存），可在同一请求的各组件间共享"""
+        return self.embed_queries([query])[0]
+    
+    def retrieve(self, query: str, k: int = 5, 
+                 embedding: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """检索相关知识
+        
+        启用混合检索时，BM25和向量检索结果通过倒数排名融合（RRF）合并；关键词命中
+        足够明确时只用BM25结果，不调用嵌入模型。两种情况的score都是RRF得分，
+        未启用混合检索时为余弦相似度。已有查询嵌入时可通过embedding传入。
+        """
+        return self.retrieve_many([query], k, None if embedding is None else [embedding])[0]
     
-    def retrieve(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
-        """检索相关知识"""
+    def retrieve_many(self, queries: List[str], k: int = 5,
+                      embeddings: Optional[List[np.ndarray]] = None) -> List[List[Dict[str, Any]]]:
+        """批量检索，需要向量检索的查询在一次前向计算中编码"""
+        with span("retriever.retrieve", queries=len(queries), k=k) as current:
+            results = self._retrieve_many(queries, k, embeddings, current)
+        return results
+    
+    def _retrieve_many(self, queries: List[str], k: int,
+                       embeddings: Optional[List[np.ndarray]],
+                       current: Span) -> List[List[Dict[str, Any]]]:
         if not self.items or self.index is None:
-            print("警告: 索引未正确初始化，返回空结果")
-            return []
-            
+            logger.warning("索引未正确初始化，返回空结果")
+            return [[] for _ in queries]
+        
+        candidates = min(len(self.items), max(k * 2, 10))
+        results: List[Optional[List[Dict[str, Any]]]] = [None] * len(queries)
+        lexical = [[] for _ in queries]
+        
+        # 关键词快速路径
+        fast_path = 0
+        if self.hybrid:
+            for i, query in enumerate(queries):
+                lexical[i] = self.lexical_index.search(query, candidates)
+                if self._lexical_is_confident(query, lexical[i]):
+                    fast_path += 1
+                    results[i] = self._fuse([lexical[i]], k)
+            self.lexical_fast_path_hits += fast_path
+        # 本次调用中走关键词快速路径的查询数
+        current.set(lexical_fast_path=fast_path)
+        
+        # 其余查询批量做向量检索
+        pending = [i for i, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+        
+        dense_k = candidates if self.hybrid else k
+        dense = self._dense_search(
+            [queries[i] for i in pending],
+            dense_k,
+            None if embeddings is None else [embeddings[i] for i in pending]
+        )
+        
+        for i, dense_results in zip(pending, dense):
+            if not self.hybrid:
+                results[i] = self._format_results(dense_results[:k])
+            else:
+                # 只有一路有结果时同样按排名计分，混合检索的score始终是RRF得分
+                results[i] = self._fuse([ranked for ranked in (dense_results, lexical[i]) if ranked], k)
+        
+        return results
+    
+    def _fuse(self, rankings: List[List[tuple]], k: int) -> List[Dict[str, Any]]:
+        """按排名融合多路 (条目序号, 得分) 结果，取前k个"""
+        fused = reciprocal_rank_fusion([[idx for idx, _ in ranked] for ranked in rankings], k=self.rrf_k)
+        return self._format_results(fused[:k])
+    
+    def _format_results(self, ranked: List[tuple]) -> List[Dict[str, Any]]:
+        """把 (条目序号, 得分) 列表转换为检索结果"""
+        return [{'item': self.items[idx], 'score': float(score)} for idx, score in ranked]
+    
+    def _lexical_is_confident(self, query: str, lexical: List[tuple]) -> bool:
+        """第一名的关键词出现在查询中，且BM25得分明显领先第二名"""
+        if self.lexical_confidence <= 0 or not lexical:
+            return False
+        
+        top_idx, top_score = lexical[0]
+        query_lower = query.lower()
+        if not any(pattern.search(query_lower) for pattern in self._item_keywords[top_idx]):
+            return False
+        
+        second_score = lexical[1][1] if len(lexical) > 1 else 0.0
+        return top_score >= self.lexical_confidence * second_score
+    
+    def _dense_search(self, queries: List[str], k: int, 
+                      embeddings: Optional[List[np.ndarray]] = None) -> List[List[tuple]]:
+        """批量向量检索，每个查询返回 (条目序号, 余弦相似度) 列表"""
         try:
-            # 生成查询嵌入
-            query_embedding = self.model.encode([query])
+            # 查询嵌入（归一化后内积即余弦相似度）
+            if embeddings is None:
+                query_embeddings = self.embed_queries(queries)
+            else:
+                query_embeddings = np.stack([np.asarray(e, dtype='float32').reshape(-1) for e in embeddings])
+                faiss.normalize_L2(query_embeddings)
             
             # 搜索最近邻
-            distances, indices = self.index.search(query_embedding.astype('float32'), min(k, len(self.items)))
-            
-            # 整理结果
-            results = []
-            for i, idx in enumerate(indices[0]):
-                if idx < len(self.items):
-                    item = self.items[idx]
-                    results.append({
-                        'item': item,
-                        'score': float(1.0 / (1.0 + distances[0][i]))  # 转换距离为相似度分数
-                    })
+            scores, indices = self.index.search(query_embeddings, min(k, len(self.items)))
             
-            return results
+            return [
+                [
+                    (int(idx), float(score))
+                    for score, idx in zip(row_scores, row_indices)
+                    if 0 <= idx < len(self.items)
+                ]
+                for row_scores, row_indices in zip(scores, indices)
+            ]
         except Exception as e:
-            print(f"检索失败: {str(e)}")
-            return []
\ No newline at end of file
+            logger.exception("检索失败")
+            return [[] for _ in queries]
\ No newline at end of file
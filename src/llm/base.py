@@ -1,5 +1,12 @@
+import logging
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, Iterator
+from src.config import LLM_STOP_STRINGS, LLM_EARLY_STOPPING
+from src.llm.stopping import StopSpec, build_stop_condition, make_usage
+from src.llm.features import build_feature_prompt, parse_features, default_features
+from src.utils.tracing import traced
+
+logger = logging.getLogger(__name__)
 
 class LLM(ABC):
     """语言模型基类"""
@@ -9,7 +16,37 @@ class LLM(ABC):
         """生成文本"""
         pass
     
-    @abstractmethod
+    def generate_with_usage(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2048,
+                            stop: StopSpec = None) -> Dict[str, Any]:
+        """生成文本并返回 {"text": ..., "usage": ...}
+        
+        默认实现生成完整结果后再按停止条件截断，不统计token数；
+        支持的实现在满足停止条件时立即结束解码。
+        """
+        text = self.generate(prompt, temperature=temperature, max_tokens=max_tokens)
+        condition = build_stop_condition(stop, extra_strings=LLM_STOP_STRINGS)
+        stop_reason = "eos"
+        if condition is not None and condition(text):
+            text = condition.truncate(text).strip()
+            stop_reason = "stop"
+        return {"text": text, "usage": make_usage(None, None, max_tokens, stop_reason)}
+    
+    def generate_stream(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2048,
+                        stop: StopSpec = None) -> Iterator[str]:
+        """流式生成文本，逐段返回新生成的内容（默认实现一次性返回完整结果）"""
+        yield self.generate_with_usage(prompt, temperature=temperature, max_tokens=max_tokens, stop=stop)["text"]
+    
+    def register_prompt_prefix(self, prefix: str):
+        """登记一个固定的提示开头，支持的实现可以预先计算其KV缓存（默认不做任何事）"""
+        pass
+    
+    @traced("llm.extract_features")
     def extract_features(self, text: str) -> Dict[str, Any]:
-        """提取特征"""
-        pass
\ No newline at end of file
+        """提取问题特征：用特征提取提示调用generate并解析JSON，失败时返回默认特征"""
+        try:
+            stop = "json" if LLM_EARLY_STOPPING else None
+            response = self.generate(build_feature_prompt(text), temperature=0.1, stop=stop)
+            return parse_features(response)
+        except Exception as e:
+            logger.warning("特征提取失败: %s", e)
+            return default_features()
\ No newline at end of file
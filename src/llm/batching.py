@@ -0,0 +1,183 @@
+import time
+import threading
+from concurrent.futures import Future
+from typing import List, Dict, Any, Iterator, Optional
+from src.config import LLM_STOP_STRINGS
+from src.llm.base import LLM
+from src.llm.stopping import StopCondition, StopSpec, build_stop_condition, make_usage
+from src.utils.tracing import span, get_request_id
+
+class _PendingRequest:
+    """等待调度的生成请求"""
+    
+    __slots__ = ("prompt", "temperature", "max_tokens", "stop", "future", "enqueued_at", "request_id")
+    
+    def __init__(self, prompt: str, temperature: float, max_tokens: int,
+                 stop: Optional[StopCondition] = None):
+        self.prompt = prompt
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.stop = stop
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+        # 批量生成在调度线程中执行，记录提交时的请求ID用于追踪
+        self.request_id = get_request_id()
+
+class BatchScheduler:
+    """动态批处理调度器
+    
+    在一个很短的时间窗口内收集并发的generate调用，按采样参数（temperature）分组，
+    每组作为一个batch交给llm.generate_batch，再把结果路由回各自的调用方。
+    不同的max_tokens和停止条件在同一batch内按行处理。
+    """
+    
+    def __init__(self, llm, max_batch_size: int = 8, max_wait_ms: float = 20.0):
+        if not hasattr(llm, "generate_batch"):
+            raise ValueError(f"{type(llm).__name__} 不支持批量生成")
+        
+        self.llm = llm
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        
+        self._pending: List[_PendingRequest] = []
+        self._cond = threading.Condition()
+        self._stopped = False
+        
+        # 统计信息
+        self._batches = 0
+        self._requests = 0
+        
+        self._worker = threading.Thread(target=self._loop, name="batch-scheduler", daemon=True)
+        self._worker.start()
+    
+    def submit(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2048,
+               stop: Optional[StopCondition] = None) -> Future:
+        """提交一个生成请求，返回Future"""
+        request = _PendingRequest(prompt, temperature, max_tokens, stop)
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("批处理调度器已关闭")
+            self._pending.append(request)
+            self._cond.notify()
+        return request.future
+    
+    def generate(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2048,
+                 stop: Optional[StopCondition] = None) -> str:
+        """提交请求并阻塞等待结果"""
+        return self.submit(prompt, temperature, max_tokens, stop).result()
+    
+    def _loop(self):
+        """调度循环：等待窗口期或batch填满后执行一批"""
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped and not self._pending:
+                    return
+                
+                # 以最早的请求为准等待窗口期，期间batch填满则立即执行
+                deadline = self._pending[0].enqueued_at + self.max_wait
+                while len(self._pending) < self.max_batch_size and not self._stopped:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                
+                batch = self._take_batch()
+            
+            self._run_batch(batch)
+    
+    def _take_batch(self) -> List[_PendingRequest]:
+        """取出与最早请求采样参数兼容的一批请求（需持有锁）"""
+        temperature = self._pending[0].temperature
+        batch = []
+        remaining = []
+        for request in self._pending:
+            if request.temperature == temperature and len(batch) < self.max_batch_size:
+                batch.append(request)
+            else:
+                remaining.append(request)
+        self._pending = remaining
+        return batch
+    
+    def _run_batch(self, batch: List[_PendingRequest]):
+        """执行一批请求并分发结果"""
+        try:
+            with span("batch.run", batch_size=len(batch),
+                      request_ids=[request.request_id for request in batch],
+                      max_queue_wait_ms=round((time.perf_counter() - batch[0].enqueued_at) * 1000, 3)):
+                outputs = self.llm.generate_batch(
+                    [request.prompt for request in batch],
+                    temperature=batch[0].temperature,
+                    max_tokens=[request.max_tokens for request in batch],
+                    stop=[request.stop for request in batch]
+                )
+            for request, output in zip(batch, outputs):
+                request.future.set_result(output)
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+        
+        with self._cond:
+            self._batches += 1
+            self._requests += len(batch)
+    
+    def stats(self) -> Dict[str, Any]:
+        """获取批处理统计信息"""
+        with self._cond:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "pending": len(self._pending),
+                "batches": self._batches,
+                "requests": self._requests,
+                "avg_batch_size": self._requests / self._batches if self._batches else 0.0
+            }
+    
+    def shutdown(self):
+        """停止调度循环（已排队的请求会先执行完）"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._worker.join()
+
+class BatchedLLM(LLM):
+    """为支持generate_batch的LLM加上动态批处理"""
+    
+    def __init__(self, llm, max_batch_size: int = 8, max_wait_ms: float = 20.0):
+        self.llm = llm
+        self.scheduler = BatchScheduler(llm, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    
+    def generate(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2048,
+                 stop: StopSpec = None) -> str:
+        """生成文本（与其他并发请求合并为一个batch）"""
+        return self.generate_with_usage(prompt, temperature, max_tokens, stop)["text"]
+    
+    def generate_with_usage(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2048,
+                            stop: StopSpec = None) -> Dict[str, Any]:
+        """生成文本并返回用量信息
+        
+        batch内所有行都满足各自的停止条件（或生成eos）后整批提前结束；
+        批量生成不统计单行的token数。
+        """
+        condition = build_stop_condition(stop, extra_strings=LLM_STOP_STRINGS)
+        text = self.scheduler.generate(prompt, temperature, max_tokens, condition)
+        stop_reason = "stop" if condition is not None and condition(text) else "eos"
+        if condition is not None:
+            text = condition.truncate(text).strip()
+        return {"text": text, "usage": make_usage(None, None, max_tokens, stop_reason)}
+    
+    def generate_stream(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2048,
+                        stop: StopSpec = None) -> Iterator[str]:
+        """流式生成不参与批处理，直接交给底层LLM"""
+        return self.llm.generate_stream(prompt, temperature=temperature, max_tokens=max_tokens, stop=stop)
+    
+    def register_prompt_prefix(self, prefix: str):
+        """前缀缓存由底层LLM维护"""
+        self.llm.register_prompt_prefix(prefix)
+    
+    def __getattr__(self, name: str):
+        # 其他属性（tokenizer、model等）透传给底层LLM
+        if name == "llm":
+            raise AttributeError(name)
+        return getattr(self.llm, name)
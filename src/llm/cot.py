@@ -1,7 +1,33 @@
 import re
-from typing import List, Dict, Any
+import logging
+from typing import List, Dict, Any, Optional, Iterator
+from src.config import LLM_EARLY_STOPPING
 from src.llm.base import LLM
+from src.llm.stopping import CodeBlockStop, StopCondition
 from src.knowledge.retriever import KnowledgeRetriever
+from src.pipeline.context import PipelineContext
+from src.utils.tracing import fields
+
+logger = logging.getLogger(__name__)
+
+# CoT提示模板版本，修改提示模板时需要递增，使旧的缓存结果失效
+PROMPT_TEMPLATE_VERSION = "2"
+
+# CoT提示的固定开头：解题步骤说明放在问题描述之前，LLM可以预先计算这部分的KV缓存，
+# 问题描述之后只保留与请求相关的内容
+COT_PROMPT_PREFIX = """
+# LeetCode问题解决
+
+请一步步解决下面的问题：
+1. 理解问题：明确输入、输出和约束条件。
+2. 思考解决方案：参考相关的算法知识和历史经验，考虑几种可行的方法。
+3. 分析复杂度：比较不同解决方案的时间和空间复杂度，选择最优的方案。
+4. 设计算法：确定具体的算法步骤。
+5. 边界情况：考虑空输入、极端值和特殊情况。
+6. 代码实现：在代码块中给出完整的实现。
+
+## 问题描述
+"""
 
 class ChainOfThoughtReasoner:
     """Chain-of-Thought推理器"""
@@ -9,79 +35,116 @@ class ChainOfThoughtReasoner:
     def __init__(self, llm: LLM, retriever: KnowledgeRetriever):
         self.llm = llm
         self.retriever = retriever
+        self.llm.register_prompt_prefix(COT_PROMPT_PREFIX)
     
-    def generate_solution(self, problem: str, language: str = "python") -> Dict[str, Any]:
-        """生成解决方案"""
-        # 提取问题特征
-        features = self.llm.extract_features(problem)
-        print(f"提取的问题特征: {features}")
+    def generate_solution(self, problem: str, language: str = "python", 
+                          context: Optional[PipelineContext] = None) -> Dict[str, Any]:
+        """生成解决方案
         
-        # 检索相关知识
-        retrieved_knowledge = self.retriever.retrieve(problem, k=5)
-        print(f"检索到 {len(retrieved_knowledge)} 条相关知识")
-        
-        # 准备CoT提示
-        prompt = self._prepare_deepseek_cot_prompt(
-            problem, 
-            features, 
-            retrieved_knowledge, 
-            language
-        )
+        如果传入context，则复用其中已计算的特征、检索结果和历史提示，
+        只补算缺失的阶段，并把各阶段耗时记录到context中。
+        """
+        ctx = context or PipelineContext(problem, language)
+        prompt = self._prepare_prompt(ctx)
         
         # 生成解决方案
-        print("生成代码解决方案...")
-        response = self.llm.generate(prompt)
+        logger.debug("生成代码解决方案")
+        with ctx.stage("generate"):
+            result = self.llm.generate_with_usage(prompt, stop=self._stop_condition(ctx))
+        response = result["text"]
+        ctx.usage = result["usage"]
         
         # 提取代码
-        code = self._extract_code(response, language)
+        code = self._extract_code(response, ctx.language)
         
         return {
             "code": code,
             "reasoning": response,
-            "features": features
+            "features": ctx.features
+        }
+    
+    def stream_solution(self, problem: str, language: str = "python", 
+                        context: Optional[PipelineContext] = None) -> Iterator[Dict[str, Any]]:
+        """流式生成解决方案
+        
+        逐段产出 {"type": "token", "text": ...} 事件，最后产出
+        {"type": "solution", "code": ..., "reasoning": ..., "features": ...}。
+        """
+        ctx = context or PipelineContext(problem, language)
+        prompt = self._prepare_prompt(ctx)
+        
+        logger.debug("流式生成代码解决方案")
+        chunks = []
+        stop = self._stop_condition(ctx)
+        with ctx.stage("generate"):
+            for text in self.llm.generate_stream(prompt, stop=stop):
+                chunks.append(text)
+                yield {"type": "token", "text": text}
+        
+        # 最后一个片段可能越过代码块结尾
+        response = "".join(chunks)
+        if stop is not None:
+            response = stop.truncate(response)
+        response = response.strip()
+        yield {
+            "type": "solution",
+            "code": self._extract_code(response, ctx.language),
+            "reasoning": response,
+            "features": ctx.features
         }
     
+    def _stop_condition(self, ctx: PipelineContext) -> Optional[StopCondition]:
+        """提示以"下面是{language}实现"结尾，第一个代码块闭合后的内容不会被使用"""
+        return CodeBlockStop(ctx.language) if LLM_EARLY_STOPPING else None
+    
+    def _prepare_prompt(self, ctx: PipelineContext) -> str:
+        """补算上下文中缺失的特征和检索结果，并构造CoT提示"""
+        # 提取问题特征
+        if ctx.features is None:
+            with ctx.stage("extract_features"):
+                ctx.features = self.llm.extract_features(ctx.problem)
+        logger.debug("提取的问题特征", extra=fields(features=ctx.features))
+        
+        # 检索相关知识
+        if ctx.retrieved_knowledge is None:
+            with ctx.stage("retrieve"):
+                ctx.retrieved_knowledge = self.retriever.retrieve(
+                    ctx.problem, k=5, embedding=ctx.query_embedding
+                )
+        logger.debug("检索到相关知识", extra=fields(count=len(ctx.retrieved_knowledge)))
+        
+        # 准备CoT提示
+        return self._prepare_deepseek_cot_prompt(
+            ctx.problem, 
+            ctx.features, 
+            ctx.retrieved_knowledge, 
+            ctx.language,
+            ctx.history_prompt or ""
+        )
+    
     def _prepare_deepseek_cot_prompt(self, problem: str, features: Dict[str, Any], 
                                    retrieved_knowledge: List[Dict[str, Any]], 
-                                   language: str = "python") -> str:
+                                   language: str = "python", history_prompt: str = "") -> str:
         """为DeepSeek-Coder准备CoT提示"""
-        prompt = f"""
-# LeetCode问题解决
-
-## 问题描述
-{problem}
+        prompt = f"""{COT_PROMPT_PREFIX}{problem}
 
 ## 分析思路
-让我一步步解决这个问题：
-
-### 1. 理解问题
 这是一个涉及{features.get('problem_type', '算法')}的问题，难度为{features.get('difficulty', '中等')}。
-我需要理解输入、输出和约束条件。
-
-### 2. 思考解决方案
 """
         
         # 添加知识库检索结果
         if retrieved_knowledge:
-            prompt += "根据相关算法知识，我可以考虑以下几种方法：\n\n"
+            prompt += "\n根据相关算法知识，我可以考虑以下几种方法：\n\n"
             for i, item in enumerate(retrieved_knowledge[:3]):
                 if 'item' in item and 'name' in item['item']:
                     prompt += f"- **{item['item']['name']}**: {item['item'].get('description', '')}\n"
         
-        prompt += """
-### 3. 分析复杂度
-我需要考虑不同解决方案的时间和空间复杂度，选择最优的方案。
-
-### 4. 设计算法
-现在我将设计具体的算法步骤。
-
-### 5. 边界情况
-我需要考虑以下边界情况：
-- 空输入
-- 极端值
-- 特殊情况
-
-### 6. 代码实现
+        # 添加历史反馈中学到的经验
+        if history_prompt:
+            prompt += f"\n{history_prompt}\n"
+        
+        prompt += f"""
+### 代码实现
 下面是{language}实现：
 """
         
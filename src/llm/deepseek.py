@@ -1,121 +1,505 @@
-import re
 import os
+import logging
+import threading
 import torch
-from typing import Dict, Any, Optional
-from transformers import AutoModelForCausalLM, AutoTokenizer
-from src.config import DEFAULT_MODEL_PATH
+from typing import List, Dict, Any, Optional, Union, Iterator, Tuple
+from transformers import (
+    AutoModelForCausalLM, AutoTokenizer, TextIteratorStreamer, 
+    StoppingCriteria, StoppingCriteriaList
+)
+from src.config import (
+    DEFAULT_MODEL_PATH, LLM_QUANTIZATION, LLM_NUM_THREADS, LLM_PREFIX_CACHE,
+    LLM_SPECULATIVE, LLM_SPECULATIVE_TOKENS, LLM_DRAFT_MODEL_PATH,
+    LLM_STOP_STRINGS
+)
 from src.llm.base import LLM
+from src.llm.quantization import (
+    QUANTIZATION_MODES, int8_artifact_path, load_int8_model, quantize_dynamic_int8
+)
+from src.llm.features import FEATURE_PROMPT_PREFIX
+from src.llm.speculative import (
+    PromptLookupDrafter, DraftModelDrafter, SpeculativeStats, speculative_generate, crop_cache
+)
+
+from src.llm.stopping import StopCondition, StopSpec, UsageStats, build_stop_condition, make_usage
+from src.utils.tracing import span, traced, fields
+
+logger = logging.getLogger(__name__)
+
+SPECULATIVE_MODES = ("off", "prompt_lookup", "draft_model")
 
 class DeepSeekLLM(LLM):
     """DeepSeek-Coder 本地LLM实现"""
     
-    def __init__(self, model_path: str = None):
-        """初始化DeepSeek-Coder模型"""
+    def __init__(self, model_path: str = None, quantization: str = None):
+        """初始化DeepSeek-Coder模型
+        
+        quantization为"int8"时在CPU上使用动态int8量化的模型（默认读取LLM_QUANTIZATION）。
+        """
         self.model_path = model_path or DEFAULT_MODEL_PATH
+        self.quantization = (quantization or LLM_QUANTIZATION).lower()
+        if self.quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"未知的量化模式: {self.quantization}（可选: {', '.join(QUANTIZATION_MODES)}）")
+        
+        # 量化模型的输出与bf16不同，缓存键中需要区分
+        self.model_id = os.path.basename(str(self.model_path))
+        if self.quantization != "none":
+            self.model_id = f"{self.model_id}-{self.quantization}"
         
         if not os.path.exists(self.model_path):
             raise ValueError(f"模型路径不存在: {self.model_path}，请先运行下载脚本")
         
+        if LLM_NUM_THREADS > 0:
+            torch.set_num_threads(LLM_NUM_THREADS)
+        
         # 加载模型和tokenizer
-        print(f"正在加载DeepSeek-Coder模型: {self.model_path}")
+        logger.info("正在加载DeepSeek-Coder模型", extra=fields(path=self.model_path, quantization=self.quantization))
         self.tokenizer = AutoTokenizer.from_pretrained(self.model_path, trust_remote_code=True)
-        self.model = AutoModelForCausalLM.from_pretrained(
+        self.model = self._load_model()
+        
+        # 批量生成时需要左侧填充，保证各行的生成位置对齐
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        
+        # 设置设备（量化模型只能在CPU上运行）
+        if self.quantization == "int8":
+            self.device = "cpu"
+        else:
+            self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        logger.info("DeepSeek-Coder 加载完成", extra=fields(device=self.device))
+        
+        # 前缀KV缓存：聊天模板 + 固定提示开头 -> (token ids, past_key_values)
+        self.prefix_cache_enabled = LLM_PREFIX_CACHE
+        self._prefix_cache: Dict[str, Tuple[torch.Tensor, Any]] = {}
+        self._prefix_lock = threading.Lock()
+        self.prefix_cache_hits = 0
+        self.prefix_cache_misses = 0
+        self.prefix_tokens_reused = 0
+        self.register_prompt_prefix("")
+        self.register_prompt_prefix(FEATURE_PROMPT_PREFIX)
+        
+        # 推测解码（只用于贪心解码）
+        self.speculative_stats = SpeculativeStats()
+        self.usage_stats = UsageStats()
+        self.drafter = self._create_drafter(LLM_SPECULATIVE)
+    
+    def _create_drafter(self, mode: str):
+        """按配置创建推测解码的草稿生成器，off或加载失败时返回None"""
+        if mode not in SPECULATIVE_MODES:
+            raise ValueError(f"未知的推测解码模式: {mode}（可选: {', '.join(SPECULATIVE_MODES)}）")
+        
+        if mode == "prompt_lookup":
+            logger.info("启用推测解码", extra=fields(mode="prompt_lookup"))
+            return PromptLookupDrafter(num_tokens=LLM_SPECULATIVE_TOKENS or 10)
+        
+        if mode == "draft_model":
+            if not LLM_DRAFT_MODEL_PATH or not os.path.exists(LLM_DRAFT_MODEL_PATH):
+                logger.warning("草稿模型路径不存在，不启用推测解码", extra=fields(path=LLM_DRAFT_MODEL_PATH))
+                return None
+            draft_model = AutoModelForCausalLM.from_pretrained(
+                LLM_DRAFT_MODEL_PATH,
+                trust_remote_code=True,
+                torch_dtype=next(self.model.parameters()).dtype
+            ).to(self.device)
+            draft_model.eval()
+            logger.info("启用推测解码", extra=fields(mode="draft_model", path=LLM_DRAFT_MODEL_PATH))
+            return DraftModelDrafter(draft_model, num_tokens=LLM_SPECULATIVE_TOKENS or 4)
+        
+        return None
+    
+    def _load_model(self):
+        """按量化模式加载模型"""
+        if self.quantization == "int8":
+            if int8_artifact_path(self.model_path).exists():
+                try:
+                    return load_int8_model(self.model_path)
+                except Exception as e:
+                    # 例如torch版本的weights_only加载不支持量化张量，或权重与当前模型结构不匹配
+                    logger.warning("加载int8量化模型失败，改为现场量化: %s", e)
+            else:
+                # 没有预先生成的量化模型：加载fp32后现场量化（较慢，建议先运行setup_model.py --quantize int8）
+                logger.info("未找到int8量化模型，加载后现场量化")
+            
+            model = AutoModelForCausalLM.from_pretrained(
+                self.model_path,
+                trust_remote_code=True,
+                torch_dtype=torch.float32,
+                low_cpu_mem_usage=True
+            )
+            return quantize_dynamic_int8(model)
+        
+        return AutoModelForCausalLM.from_pretrained(
             self.model_path,
             device_map="auto",
             trust_remote_code=True,
             torch_dtype=torch.bfloat16
         )
+    
+    def _build_input_text(self, prompt: str) -> str:
+        """套用DeepSeek-Coder的聊天模板"""
+        messages = [
+            {"role": "user", "content": prompt}
+        ]
         
-        # 设置设备
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        print(f"DeepSeek-Coder 已加载到 {self.device}")
+        return self.tokenizer.apply_chat_template(
+            messages, 
+            tokenize=False, 
+            add_generation_prompt=True
+        )
     
-    def generate(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2048) -> str:
-        """生成文本"""
+    def register_prompt_prefix(self, prefix: str):
+        """预先计算 聊天模板开头 + prefix 的KV缓存
+        
+        之后以该前缀开头的单条生成请求从缓存继续，prefill只需要处理剩余部分。
+        """
+        if not self.prefix_cache_enabled:
+            return
+        
+        text = self._template_prefix() + prefix
+        with self._prefix_lock:
+            if text in self._prefix_cache:
+                return
+        
         try:
-            # 设置DeepSeek-Coder的聊天模板
-            messages = [
-                {"role": "user", "content": prompt}
-            ]
+            prefix_ids = self.tokenizer(text, return_tensors="pt").input_ids.to(self.device)
+            with torch.no_grad():
+                outputs = self.model(prefix_ids, use_cache=True)
+            past_key_values = outputs.past_key_values
+            if hasattr(past_key_values, "to_legacy_cache"):
+                past_key_values = past_key_values.to_legacy_cache()
             
-            # 处理输入为模型格式
-            input_text = self.tokenizer.apply_chat_template(
-                messages, 
-                tokenize=False, 
-                add_generation_prompt=True
+            with self._prefix_lock:
+                self._prefix_cache[text] = (prefix_ids, past_key_values)
+            logger.info("已缓存提示前缀的KV", extra=fields(tokens=prefix_ids.shape[1]))
+        except Exception as e:
+            logger.warning("计算前缀KV缓存失败: %s", e)
+    
+    def _template_prefix(self) -> str:
+        """聊天模板中位于用户内容之前的固定部分（系统提示等）"""
+        marker = "\x00PROMPT\x00"
+        return self._build_input_text(marker).split(marker)[0]
+    
+    def _prefix_past(self, input_text: str, input_ids: torch.Tensor) -> Dict[str, Any]:
+        """查找与输入匹配的最长前缀缓存，返回传给generate的past_key_values参数
+        
+        前缀单独分词的结果在边界处可能与完整输入不同，此时截取两者共同的token部分。
+        缓存本身不会被修改：生成时新的KV通过拼接得到新张量。
+        """
+        if not self._prefix_cache:
+            return {}
+        
+        with self._prefix_lock:
+            candidates = [
+                (text, entry) for text, entry in self._prefix_cache.items()
+                if input_text.startswith(text)
+            ]
+        if not candidates:
+            self.prefix_cache_misses += 1
+            return {}
+        
+        _, (prefix_ids, past_key_values) = max(candidates, key=lambda candidate: len(candidate[0]))
+        
+        # 共同前缀的token数；至少要留一个token给本次prefill
+        limit = min(prefix_ids.shape[1], input_ids.shape[1] - 1)
+        matches = (prefix_ids[0, :limit] == input_ids[0, :limit]).tolist()
+        reused = matches.index(False) if False in matches else limit
+        if reused == 0:
+            self.prefix_cache_misses += 1
+            return {}
+        
+        if reused < prefix_ids.shape[1]:
+            past_key_values = crop_cache(past_key_values, reused)
+        
+        self.prefix_cache_hits += 1
+        self.prefix_tokens_reused += reused
+        return {"past_key_values": past_key_values}
+    
+    def prefix_cache_stats(self) -> Dict[str, Any]:
+        """前缀缓存统计信息"""
+        return {
+            "enabled": self.prefix_cache_enabled,
+            "prefixes": len(self._prefix_cache),
+            "hits": self.prefix_cache_hits,
+            "misses": self.prefix_cache_misses,
+            "tokens_reused": self.prefix_tokens_reused
+        }
+    
+    def generate(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2048,
+                 stop: StopSpec = None) -> str:
+        """生成文本"""
+        return self.generate_with_usage(prompt, temperature, max_tokens, stop)["text"]
+    
+    def generate_with_usage(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2048,
+                            stop: StopSpec = None) -> Dict[str, Any]:
+        """生成文本并返回用量信息
+        
+        stop为停止条件（"code_block"、"json"、停止字符串列表或StopCondition），
+        满足后立即结束解码，并截掉条件之后多生成的内容。
+        """
+        condition = build_stop_condition(stop, extra_strings=LLM_STOP_STRINGS)
+        with span("llm.generate", max_tokens=max_tokens) as current:
+            result = self._generate_with_usage(prompt, temperature, max_tokens, condition)
+            usage = result["usage"]
+            current.set(
+                prompt_tokens=usage["prompt_tokens"],
+                completion_tokens=usage["completion_tokens"],
+                stop_reason=usage["stop_reason"]
             )
+        return result
+    
+    def _generate_with_usage(self, prompt: str, temperature: float, max_tokens: int,
+                             condition: Optional[StopCondition]) -> Dict[str, Any]:
+        try:
+            # 处理输入为模型格式
+            input_text = self._build_input_text(prompt)
             
             # 编码输入
             inputs = self.tokenizer(input_text, return_tensors="pt").to(self.device)
+            prompt_length = inputs.input_ids.shape[1]
+            
+            # 贪心解码时使用推测解码，输出与普通贪心解码相同
+            if self.drafter is not None and temperature <= 0.1:
+                new_tokens = self._generate_speculative(input_text, inputs.input_ids, max_tokens, condition)
+            else:
+                stopping_criteria = StoppingCriteriaList()
+                if condition is not None:
+                    stopping_criteria.append(_TextStopCriteria(self.tokenizer, prompt_length, condition))
+                
+                # 生成响应（命中前缀缓存时只对剩余部分做prefill）
+                with torch.no_grad():
+                    outputs = self.model.generate(
+                        inputs.input_ids,
+                        max_new_tokens=max_tokens,
+                        temperature=temperature,
+                        top_p=0.95,
+                        do_sample=(temperature > 0.1),
+                        pad_token_id=self.tokenizer.eos_token_id,
+                        stopping_criteria=stopping_criteria,
+                        **self._prefix_past(input_text, inputs.input_ids)
+                    )
+                new_tokens = outputs[0, prompt_length:].tolist()
+            
+            # 只解码模型回复部分
+            response = self.tokenizer.decode(new_tokens, skip_special_tokens=True)
+            usage = make_usage(prompt_length, len(new_tokens), max_tokens, 
+                               self._stop_reason(new_tokens, max_tokens, condition, response))
+            if condition is not None:
+                response = condition.truncate(response)
+            
+            self.usage_stats.record(usage)
+            return {"text": response.strip(), "usage": usage}
+        except Exception as e:
+            logger.exception("DeepSeek-Coder 生成失败")
+            return {"text": f"生成失败: {str(e)}", "usage": make_usage(None, None, max_tokens, "error")}
+    
+    def _stop_reason(self, new_tokens: List[int], max_tokens: int, 
+                     condition: Optional[StopCondition], response: str) -> str:
+        """判断生成结束的原因：stop（停止条件）、eos或length"""
+        if new_tokens and new_tokens[-1] == self.tokenizer.eos_token_id:
+            return "eos"
+        if condition is not None and condition(response):
+            return "stop"
+        return "length" if len(new_tokens) >= max_tokens else "eos"
+    
+    def _generate_speculative(self, input_text: str, input_ids: torch.Tensor, max_tokens: int,
+                              condition: Optional[StopCondition] = None) -> List[int]:
+        """用推测解码做贪心生成，返回新生成的token"""
+        should_stop = None
+        if condition is not None:
+            decoder = _IncrementalDecoder(self.tokenizer)
+            should_stop = lambda tokens: condition(decoder.update(tokens))
+        
+        with torch.no_grad():
+            return speculative_generate(
+                self.model,
+                input_ids[0].tolist(),
+                self.drafter,
+                max_new_tokens=max_tokens,
+                eos_token_id=self.tokenizer.eos_token_id,
+                past_key_values=self._prefix_past(input_text, input_ids).get("past_key_values"),
+                stats=self.speculative_stats,
+                should_stop=should_stop
+            )
+    
+    @traced("llm.generate_stream")
+    def generate_stream(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2048,
+                        stop: StopSpec = None) -> Iterator[str]:
+        """流式生成文本，解码出的新文本片段逐个返回
+        
+        生成在后台线程中进行；调用方提前关闭迭代器时（例如客户端断开），
+        通过停止条件让后台生成尽快结束。stop满足时同样提前结束，
+        最后一个片段可能包含少量条件之后的内容，由调用方截断。
+        """
+        input_text = self._build_input_text(prompt)
+        inputs = self.tokenizer(input_text, return_tensors="pt").to(self.device)
+        
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        cancelled = threading.Event()
+        prefix_past = self._prefix_past(input_text, inputs.input_ids)
+        
+        stopping_criteria = StoppingCriteriaList([_CancelCriteria(cancelled)])
+        condition = build_stop_condition(stop, extra_strings=LLM_STOP_STRINGS)
+        if condition is not None:
+            stopping_criteria.append(_TextStopCriteria(self.tokenizer, inputs.input_ids.shape[1], condition))
+        
+        # 后台线程中的生成异常，在消费方读完已生成的片段后重新抛出
+        errors: List[Exception] = []
+        
+        def run():
+            try:
+                with torch.no_grad():
+                    self.model.generate(
+                        inputs.input_ids,
+                        max_new_tokens=max_tokens,
+                        temperature=temperature,
+                        top_p=0.95,
+                        do_sample=(temperature > 0.1),
+                        pad_token_id=self.tokenizer.eos_token_id,
+                        streamer=streamer,
+                        stopping_criteria=stopping_criteria,
+                        **prefix_past
+                    )
+            except Exception as e:
+                logger.exception("DeepSeek-Coder 流式生成失败")
+                errors.append(e)
+                # 确保消费方不会一直阻塞
+                streamer.end()
+        
+        thread = threading.Thread(target=run, name="deepseek-stream", daemon=True)
+        thread.start()
+        
+        try:
+            for text in streamer:
+                if text:
+                    yield text
+            # streamer.end()在记录异常之后调用，迭代结束时异常已经可见
+            if errors:
+                raise errors[0]
+        finally:
+            cancelled.set()
+    
+    def generate_batch(self, prompts: List[str], temperature: float = 0.7, 
+                       max_tokens: Union[int, List[int]] = 2048,
+                       stop: Optional[List[Optional[StopCondition]]] = None) -> List[str]:
+        """批量生成文本
+        
+        所有提示左侧填充后作为一个batch调用model.generate。max_tokens可以按行指定，
+        整个batch按最大值解码，每行再按自己的上限截断。stop为每行的停止条件，
+        所有行都已结束时整批提前停止（截断由调用方完成）。
+        """
+        if isinstance(max_tokens, int):
+            max_tokens = [max_tokens] * len(prompts)
+        stop = stop or [None] * len(prompts)
+        
+        with span("llm.generate_batch", batch_size=len(prompts)):
+            return self._generate_batch(prompts, temperature, max_tokens, stop)
+    
+    def _generate_batch(self, prompts: List[str], temperature: float, max_tokens: List[int],
+                        stop: List[Optional[StopCondition]]) -> List[str]:
+        try:
+            input_texts = [self._build_input_text(prompt) for prompt in prompts]
+            inputs = self.tokenizer(input_texts, return_tensors="pt", padding=True).to(self.device)
+            
+            stopping_criteria = StoppingCriteriaList()
+            if any(condition is not None for condition in stop):
+                stopping_criteria.append(_BatchTextStopCriteria(
+                    self.tokenizer, inputs.input_ids.shape[1], stop, max_tokens
+                ))
             
-            # 生成响应
             with torch.no_grad():
                 outputs = self.model.generate(
                     inputs.input_ids,
-                    max_new_tokens=max_tokens,
+                    attention_mask=inputs.attention_mask,
+                    max_new_tokens=max(max_tokens),
                     temperature=temperature,
                     top_p=0.95,
                     do_sample=(temperature > 0.1),
-                    pad_token_id=self.tokenizer.eos_token_id
+                    pad_token_id=self.tokenizer.pad_token_id,
+                    stopping_criteria=stopping_criteria
                 )
             
-            # 解码输出
-            generated_text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-            
-            # 提取模型回复部分
-            response = generated_text[len(input_text):].strip()
-            
-            return response
+            # 只解码新生成的部分，并按每行的max_tokens截断
+            new_tokens = outputs[:, inputs.input_ids.shape[1]:]
+            return [
+                self.tokenizer.decode(row[:limit], skip_special_tokens=True).strip()
+                for row, limit in zip(new_tokens, max_tokens)
+            ]
         except Exception as e:
-            print(f"DeepSeek-Coder 生成失败: {str(e)}")
-            return f"生成失败: {str(e)}"
+            logger.exception("DeepSeek-Coder 批量生成失败")
+            return [f"生成失败: {str(e)}"] * len(prompts)
+
+class _CancelCriteria(StoppingCriteria):
+    """外部取消时停止生成"""
     
-    def extract_features(self, text: str) -> Dict[str, Any]:
-        """提取问题特征"""
-        prompt = f"""
-分析以下LeetCode问题，提取关键特征:
+    def __init__(self, cancelled: threading.Event):
+        self.cancelled = cancelled
+    
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.cancelled.is_set()
 
-{text}
+class _IncrementalDecoder:
+    """增量解码已生成的token，每次只解码上次确认位置之后的一小段（与TextStreamer的做法相同）
+    
+    每一步的解码量与已生成长度无关。末尾是不完整的多字节字符时先不确认这段文本，
+    等后续token补齐（最多等待MAX_PENDING个token，避免无效字节使解码窗口一直增长），
+    但仍然包含在返回的文本中，停止条件的判断不会因此推迟。
+    """
+    
+    MAX_PENDING = 8
+    
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.text = ""
+        self._prefix_offset = 0
+        self._read_offset = 0
+    
+    def update(self, tokens) -> str:
+        """tokens为到目前为止生成的全部token（列表或一维张量），返回到目前为止解码的文本"""
+        prefix = self.tokenizer.decode(tokens[self._prefix_offset:self._read_offset], skip_special_tokens=True)
+        current = self.tokenizer.decode(tokens[self._prefix_offset:], skip_special_tokens=True)
+        if len(current) <= len(prefix):
+            return self.text
+        
+        new_text = current[len(prefix):]
+        if not new_text.endswith("\ufffd") or len(tokens) - self._read_offset >= self.MAX_PENDING:
+            self.text += new_text
+            self._prefix_offset = self._read_offset
+            self._read_offset = len(tokens)
+            return self.text
+        return self.text + new_text
 
-请以JSON格式返回以下字段:
-1. problem_type: 问题类型（如数组、字符串、树等）
-2. difficulty: 难度（简单、中等、困难）
-3. data_structures: 可能涉及的数据结构（数组形式）
-4. algorithms: 可能适用的算法（数组形式）
+class _TextStopCriteria(StoppingCriteria):
+    """已生成的文本满足停止条件时结束生成（只支持单条生成）"""
+    
+    def __init__(self, tokenizer, prompt_length: int, condition: StopCondition):
+        self.prompt_length = prompt_length
+        self.condition = condition
+        self.decoder = _IncrementalDecoder(tokenizer)
+    
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.condition(self.decoder.update(input_ids[0, self.prompt_length:]))
 
-仅返回JSON格式，不要有其他文字。
-"""
-        try:
-            response = self.generate(prompt, temperature=0.1)
-            # 尝试从回复中提取JSON
-            import json
-            
-            # 查找JSON块
-            json_match = re.search(r'```json\s*(.*?)\s*```', response, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group(1))
-            
-            # 尝试直接解析
-            try:
-                return json.loads(response)
-            except:
-                # 尝试提取可能是JSON的部分
-                json_like = re.search(r'\{.*\}', response, re.DOTALL)
-                if json_like:
-                    return json.loads(json_like.group(0))
-            
-            # 如果无法提取，返回默认值
-            return {
-                "problem_type": "unknown",
-                "difficulty": "medium",
-                "data_structures": [],
-                "algorithms": []
-            }
-        except Exception as e:
-            print(f"特征提取失败: {str(e)}")
-            return {
-                "problem_type": "unknown",
-                "difficulty": "medium",
-                "data_structures": [],
-                "algorithms": []
-            }
\ No newline at end of file
+class _BatchTextStopCriteria(StoppingCriteria):
+    """batch内每一行都已结束（满足停止条件、生成eos或达到该行上限）时结束生成"""
+    
+    def __init__(self, tokenizer, prompt_length: int, conditions: List[Optional[StopCondition]],
+                 max_tokens: List[int]):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.conditions = conditions
+        self.max_tokens = max_tokens
+        self.finished = [False] * len(conditions)
+        self.decoders = [_IncrementalDecoder(tokenizer) for _ in conditions]
+    
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        for i, condition in enumerate(self.conditions):
+            if self.finished[i]:
+                continue
+            row = input_ids[i, self.prompt_length:]
+            # 每一步都会检查，只需看最新的token是否为eos
+            if len(row) >= self.max_tokens[i] or (len(row) and int(row[-1]) == self.tokenizer.eos_token_id):
+                self.finished[i] = True
+            elif condition is not None:
+                self.finished[i] = condition(self.decoders[i].update(row))
+        return all(self.finished)
\ No newline at end of file
@@ -0,0 +1,207 @@
+import threading
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+import numpy as np
+from src.llm.base import LLM
+from src.llm.features import default_features
+from src.knowledge.lexical import compile_keyword
+
+# 问题类型关键词：题面中出现的次数越多，越可能是该类型
+PROBLEM_TYPE_KEYWORDS = {
+    "数组": ["数组", "array", "nums", "子数组", "subarray"],
+    "字符串": ["字符串", "string", "子串", "substring", "字符", "回文"],
+    "链表": ["链表", "linked list", "listnode"],
+    "树": ["二叉树", "binary tree", "treenode", "根节点", "叶子节点", "二叉搜索树"],
+    "图": ["图", "graph", "边", "edges", "连通"],
+    "矩阵": ["矩阵", "matrix", "网格", "grid", "二维"],
+    "数学": ["整数", "integer", "质数", "阶乘", "进制", "位运算"],
+}
+
+# 信息不足时的难度默认值（与default_features一致）
+DEFAULT_DIFFICULTY = default_features()["difficulty"]
+
+class FeatureExtractionStats:
+    """特征提取来源统计：快速路径命中次数和回退到LLM的次数"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.fast = 0
+        self.llm = 0
+    
+    def record(self, source: str):
+        with self._lock:
+            if source == "llm":
+                self.llm += 1
+            else:
+                self.fast += 1
+    
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.fast + self.llm
+            return {
+                "fast": self.fast,
+                "llm": self.llm,
+                "fast_rate": self.fast / total if total else 0.0
+            }
+
+class FastFeatureExtractor:
+    """基于规则和近邻的问题特征提取器，置信度不足时回退到LLM
+    
+    - 关键词：知识库条目的keywords命中题面时，把条目名称加入data_structures/algorithms；
+      PROBLEM_TYPE_KEYWORDS投票决定问题类型。
+    - 近邻：在历史问题语义索引中查找相似问题，按相似度加权投票其已标注的特征。
+      只有feature_source为"llm"的历史问题参与投票，快速路径自己的预测不会被当作标注，
+      避免错误的预测自我强化。
+    两者得出的问题类型置信度取较高者，低于min_confidence时调用llm.extract_features。
+    """
+    
+    def __init__(self, llm: LLM, knowledge_items: List[Dict[str, Any]],
+                 storage=None, min_confidence: float = 0.6,
+                 neighbors: int = 5, min_similarity: float = 0.85):
+        self.llm = llm
+        self.storage = storage
+        self.min_confidence = min_confidence
+        self.neighbors = neighbors
+        self.min_similarity = min_similarity
+        self.stats = FeatureExtractionStats()
+        
+        # (类别, 名称, 关键词正则列表)
+        self._item_patterns = [
+            (item.get("category", ""), item.get("name", ""),
+             [compile_keyword(keyword) for keyword in item.get("keywords", []) if keyword])
+            for item in knowledge_items
+        ]
+        self._type_patterns = {
+            problem_type: [compile_keyword(keyword) for keyword in keywords]
+            for problem_type, keywords in PROBLEM_TYPE_KEYWORDS.items()
+        }
+    
+    def extract_features(self, text: str, embedding: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """提取问题特征（接口与LLM.extract_features一致）"""
+        return self.extract(text, embedding=embedding)[0]
+    
+    def extract(self, text: str, embedding: Optional[np.ndarray] = None,
+                exclude: Iterable[str] = ()) -> Tuple[Dict[str, Any], str, float]:
+        """提取问题特征，返回 (特征, 来源"fast"/"llm", 置信度)
+        
+        exclude为不参与近邻投票的问题ID（离线评估时排除问题本身）。
+        """
+        features, confidence = self.predict(text, embedding=embedding, exclude=exclude)
+        if confidence >= self.min_confidence:
+            source = "fast"
+        else:
+            features = self.llm.extract_features(text)
+            source = "llm"
+        
+        self.stats.record(source)
+        return features, source, confidence
+    
+    def predict(self, text: str, embedding: Optional[np.ndarray] = None,
+                exclude: Iterable[str] = ()) -> Tuple[Dict[str, Any], float]:
+        """只用关键词和近邻预测特征，返回 (特征, 置信度)"""
+        keyword_type, keyword_confidence, data_structures, algorithms = self._keyword_features(text)
+        neighbor = self._neighbor_features(text, embedding, set(exclude))
+        
+        features = default_features()
+        features["data_structures"] = data_structures
+        features["algorithms"] = algorithms
+        confidence = keyword_confidence
+        if keyword_type:
+            features["problem_type"] = keyword_type
+        
+        if neighbor is not None:
+            neighbor_type, neighbor_confidence, neighbor_features = neighbor
+            if neighbor_confidence > confidence:
+                features["problem_type"] = neighbor_type
+                confidence = neighbor_confidence
+            features["difficulty"] = neighbor_features["difficulty"]
+            features["data_structures"] = self._merge(data_structures, neighbor_features["data_structures"])
+            features["algorithms"] = self._merge(algorithms, neighbor_features["algorithms"])
+        
+        # 没有识别出任何数据结构和算法时，特征对检索和历史匹配帮助有限
+        if not features["data_structures"] and not features["algorithms"]:
+            confidence *= 0.5
+        return features, confidence
+    
+    def _keyword_features(self, text: str) -> Tuple[Optional[str], float, List[str], List[str]]:
+        """关键词匹配：返回 (问题类型, 类型置信度, 数据结构, 算法)"""
+        lowered = text.lower()
+        
+        data_structures, algorithms = [], []
+        for category, name, patterns in self._item_patterns:
+            if any(pattern.search(lowered) for pattern in patterns):
+                (data_structures if category == "data_structures" else algorithms).append(name)
+        
+        counts = {
+            problem_type: sum(len(pattern.findall(lowered)) for pattern in patterns)
+            for problem_type, patterns in self._type_patterns.items()
+        }
+        total = sum(counts.values())
+        if total == 0:
+            return None, 0.0, data_structures, algorithms
+        
+        problem_type, top = max(counts.items(), key=lambda pair: pair[1])
+        # 占比越高、命中越多越可信；只命中一次时最多0.5
+        confidence = (top / total) * min(1.0, top / 2)
+        return problem_type, confidence, data_structures, algorithms
+    
+    def _neighbor_features(self, text: str, embedding: Optional[np.ndarray],
+                           exclude: set) -> Optional[Tuple[str, float, Dict[str, Any]]]:
+        """相似历史问题加权投票：返回 (问题类型, 置信度, 投票得出的特征)，没有可用近邻时返回None"""
+        problem_index = getattr(self.storage, "problem_index", None)
+        if problem_index is None:
+            return None
+        
+        neighbors = []
+        for problem_id, similarity in problem_index.search(text, k=self.neighbors + len(exclude), embedding=embedding):
+            if problem_id in exclude or similarity < self.min_similarity:
+                continue
+            problem = self.storage.get_problem(problem_id)
+            if not problem or problem.get("feature_source", "llm") != "llm":
+                continue
+            features = problem.get("features") or {}
+            # 未能提取出类型的历史问题不参与投票
+            if features.get("problem_type") in (None, "", "unknown"):
+                continue
+            neighbors.append((features, similarity))
+            if len(neighbors) >= self.neighbors:
+                break
+        
+        if not neighbors:
+            return None
+        
+        total_weight = sum(similarity for _, similarity in neighbors)
+        problem_type, type_weight = self._vote(neighbors, "problem_type")
+        difficulty, _ = self._vote(neighbors, "difficulty")
+        voted = {
+            "difficulty": difficulty or DEFAULT_DIFFICULTY,
+            "data_structures": self._vote_list(neighbors, "data_structures", total_weight),
+            "algorithms": self._vote_list(neighbors, "algorithms", total_weight)
+        }
+        # 类型一致的权重占比 × 最相似近邻的相似度
+        confidence = (type_weight / total_weight) * max(similarity for _, similarity in neighbors)
+        return problem_type, confidence, voted
+    
+    def _vote(self, neighbors: List[Tuple[Dict[str, Any], float]], field: str) -> Tuple[Optional[str], float]:
+        """单值字段按相似度加权投票"""
+        weights = defaultdict(float)
+        for features, similarity in neighbors:
+            value = features.get(field)
+            if isinstance(value, str) and value:
+                weights[value] += similarity
+        if not weights:
+            return None, 0.0
+        return max(weights.items(), key=lambda pair: pair[1])
+    
+    def _vote_list(self, neighbors: List[Tuple[Dict[str, Any], float]], field: str,
+                   total_weight: float) -> List[str]:
+        """列表字段保留加权得票过半的取值"""
+        weights = defaultdict(float)
+        for features, similarity in neighbors:
+            for value in set(features.get(field) or []):
+                weights[value] += similarity
+        return [value for value, weight in weights.items() if weight * 2 > total_weight]
+    
+    def _merge(self, first: List[str], second: List[str]) -> List[str]:
+        """合并两个标签列表并去重，保持顺序"""
+        return list(dict.fromkeys(first + second))
@@ -0,0 +1,55 @@
+import re
+import json
+import logging
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+# 特征提取提示的固定开头：字段说明放在问题文本之前，可以预先计算这部分的KV缓存
+FEATURE_PROMPT_PREFIX = """
+分析下面的LeetCode问题，提取关键特征，以JSON格式返回以下字段:
+1. problem_type: 问题类型（如数组、字符串、树等）
+2. difficulty: 难度（简单、中等、困难）
+3. data_structures: 可能涉及的数据结构（数组形式）
+4. algorithms: 可能适用的算法（数组形式）
+
+仅返回JSON格式，不要有其他文字。
+
+问题:
+"""
+
+def default_features() -> Dict[str, Any]:
+    """无法提取特征时使用的默认值"""
+    return {
+        "problem_type": "unknown",
+        "difficulty": "medium",
+        "data_structures": [],
+        "algorithms": []
+    }
+
+def build_feature_prompt(text: str) -> str:
+    """构造特征提取提示"""
+    return f"{FEATURE_PROMPT_PREFIX}{text}\n"
+
+def parse_features(response: str) -> Dict[str, Any]:
+    """从模型回复中解析特征JSON"""
+    try:
+        # 查找JSON块
+        json_match = re.search(r'```json\s*(.*?)\s*```', response, re.DOTALL)
+        if json_match:
+            return json.loads(json_match.group(1))
+        
+        # 尝试直接解析
+        try:
+            return json.loads(response)
+        except:
+            # 尝试提取可能是JSON的部分
+            json_like = re.search(r'\{.*\}', response, re.DOTALL)
+            if json_like:
+                return json.loads(json_like.group(0))
+        
+        # 如果无法提取，返回默认值
+        return default_features()
+    except Exception as e:
+        logger.warning("特征提取失败: %s", e)
+        return default_features()
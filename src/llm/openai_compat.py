@@ -0,0 +1,144 @@
+import json
+import logging
+import requests
+from typing import List, Dict, Any, Iterator, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from src.config import LLM_STOP_STRINGS
+from src.llm.base import LLM
+from src.llm.stopping import StopSpec, UsageStats, build_stop_condition, make_usage
+
+logger = logging.getLogger(__name__)
+
+class OpenAICompatibleLLM(LLM):
+    """OpenAI兼容推理服务的HTTP客户端（vLLM、llama.cpp server、TGI等）
+    
+    模型权重只保存在推理服务中，API进程只维护一个带连接池的HTTP会话。
+    聊天模板由推理服务负责套用。
+    """
+    
+    def __init__(self, base_url: str, model: str, api_key: str = "",
+                 timeout: float = 120.0, connect_timeout: float = 5.0,
+                 pool_size: int = 16, max_retries: int = 2):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.model_id = model
+        self.timeout = (connect_timeout, timeout)
+        self.usage_stats = UsageStats()
+        
+        # 连接池：复用TCP连接；连接失败和502/503/504时自动重试
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=0,
+            status=max_retries,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "POST"}),
+            backoff_factor=0.2
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Content-Type"] = "application/json"
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+        
+        print(f"使用OpenAI兼容推理服务: {self.base_url}（模型: {self.model}）")
+    
+    def _payload(self, prompt: str, temperature: float, max_tokens: int, stream: bool) -> Dict[str, Any]:
+        """构造chat completions请求体"""
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+            "top_p": 0.95,
+            "max_tokens": max_tokens,
+            "stream": stream
+        }
+    
+    def generate(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2048,
+                 stop: StopSpec = None) -> str:
+        """生成文本"""
+        return self.generate_with_usage(prompt, temperature, max_tokens, stop)["text"]
+    
+    def generate_with_usage(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2048,
+                            stop: StopSpec = None) -> Dict[str, Any]:
+        """生成文本并返回用量信息
+        
+        有停止条件时改用流式请求，条件满足后立即关闭连接，推理服务随之中止生成；
+        此时服务端不返回token数。
+        """
+        condition = build_stop_condition(stop, extra_strings=LLM_STOP_STRINGS)
+        if condition is not None:
+            text = "".join(self.generate_stream(prompt, temperature, max_tokens, stop=stop))
+            stop_reason = "stop" if condition(text) else "eos"
+            usage = make_usage(None, None, max_tokens, stop_reason)
+            self.usage_stats.record(usage)
+            return {"text": condition.truncate(text).strip(), "usage": usage}
+        
+        try:
+            response = self.session.post(
+                f"{self.base_url}/v1/chat/completions",
+                data=json.dumps(self._payload(prompt, temperature, max_tokens, stream=False)),
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            body = response.json()
+            choice = body["choices"][0]
+            server_usage = body.get("usage") or {}
+            usage = make_usage(
+                server_usage.get("prompt_tokens"),
+                server_usage.get("completion_tokens"),
+                max_tokens,
+                "length" if choice.get("finish_reason") == "length" else "eos"
+            )
+            self.usage_stats.record(usage)
+            return {"text": choice["message"]["content"].strip(), "usage": usage}
+        except Exception as e:
+            logger.exception("推理服务生成失败")
+            return {"text": f"生成失败: {str(e)}", "usage": make_usage(None, None, max_tokens, "error")}
+    
+    def generate_stream(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2048,
+                        stop: StopSpec = None) -> Iterator[str]:
+        """流式生成文本（服务端SSE），调用方提前关闭迭代器或满足停止条件时关闭连接"""
+        condition = build_stop_condition(stop, extra_strings=LLM_STOP_STRINGS)
+        generated = ""
+        try:
+            with self.session.post(
+                f"{self.base_url}/v1/chat/completions",
+                data=json.dumps(self._payload(prompt, temperature, max_tokens, stream=True)),
+                timeout=self.timeout,
+                stream=True
+            ) as response:
+                response.raise_for_status()
+                # 按字节切分行后再解码，避免多字节字符被拆开或按错误的编码解码
+                for raw_line in response.iter_lines():
+                    line = raw_line.decode("utf-8")
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    text = self._delta_text(json.loads(data))
+                    if text:
+                        yield text
+                        generated += text
+                        if condition is not None and condition(generated):
+                            break
+        except Exception as e:
+            logger.exception("推理服务流式生成失败")
+            yield f"生成失败: {str(e)}"
+    
+    def _delta_text(self, chunk: Dict[str, Any]) -> Optional[str]:
+        """从流式响应块中取出新增文本"""
+        choices = chunk.get("choices") or []
+        if not choices:
+            return None
+        return (choices[0].get("delta") or {}).get("content")
+    
+    def list_models(self) -> List[str]:
+        """查询推理服务提供的模型"""
+        response = self.session.get(f"{self.base_url}/v1/models", timeout=self.timeout)
+        response.raise_for_status()
+        return [model["id"] for model in response.json().get("data", [])]
@@ -0,0 +1,48 @@
+import os
+import contextlib
+import torch
+from pathlib import Path
+from typing import Union
+
+# 支持的CPU推理模式：none（bf16，原有行为）、int8（Linear层动态int8量化）
+QUANTIZATION_MODES = ("none", "int8")
+
+# 量化后的权重（state_dict）保存在原模型目录下
+INT8_ARTIFACT_NAME = "model-int8.state_dict.pt"
+
+def int8_artifact_path(model_path: Union[str, Path]) -> Path:
+    """动态int8量化权重的保存路径"""
+    return Path(model_path) / INT8_ARTIFACT_NAME
+
+def quantize_dynamic_int8(model: torch.nn.Module) -> torch.nn.Module:
+    """对所有Linear层做动态int8量化（权重int8，激活在运行时量化），只能在CPU上运行"""
+    model = model.to("cpu").float()
+    model.eval()
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def save_int8_model(model: torch.nn.Module, model_path: Union[str, Path]) -> Path:
+    """保存量化后模型的state_dict（只包含张量，加载时不执行任意代码）"""
+    path = int8_artifact_path(model_path)
+    tmp_path = path.with_suffix(".pt.tmp")
+    torch.save(model.state_dict(), tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+def load_int8_model(model_path: Union[str, Path]) -> torch.nn.Module:
+    """加载setup_model.py生成的int8模型：按config构建模型骨架，量化后载入保存的权重"""
+    from transformers import AutoConfig, AutoModelForCausalLM
+    
+    config = AutoConfig.from_pretrained(model_path, trust_remote_code=True)
+    try:
+        from transformers.modeling_utils import no_init_weights
+    except ImportError:
+        no_init_weights = contextlib.nullcontext
+    # 权重随后会被覆盖，跳过随机初始化
+    with no_init_weights():
+        model = AutoModelForCausalLM.from_config(config, trust_remote_code=True, torch_dtype=torch.float32)
+    model = quantize_dynamic_int8(model)
+    
+    state_dict = torch.load(int8_artifact_path(model_path), map_location="cpu", weights_only=True)
+    model.load_state_dict(state_dict)
+    model.eval()
+    return model
@@ -0,0 +1,65 @@
+from typing import Callable, Dict, List
+from src.config import (
+    LLM_BACKEND, LLM_SERVER_URL, LLM_SERVER_MODEL, LLM_SERVER_API_KEY,
+    LLM_SERVER_TIMEOUT, LLM_SERVER_CONNECT_TIMEOUT, LLM_SERVER_POOL_SIZE, LLM_SERVER_MAX_RETRIES,
+    LLM_STUB_TOKEN_MS, LLM_STUB_PREFILL_MS
+)
+from src.llm.base import LLM
+
+# 后端名称 -> 工厂函数；工厂函数内部再导入具体实现，
+# 这样只使用HTTP后端的API进程不需要导入torch/transformers
+_BACKENDS: Dict[str, Callable[..., LLM]] = {}
+
+def register_backend(name: str):
+    """注册LLM后端的装饰器"""
+    def decorator(factory: Callable[..., LLM]) -> Callable[..., LLM]:
+        _BACKENDS[name] = factory
+        return factory
+    return decorator
+
+def available_backends() -> List[str]:
+    """已注册的后端名称"""
+    return sorted(_BACKENDS)
+
+def create_llm(backend: str = None, **kwargs) -> LLM:
+    """根据配置（LLM_BACKEND）创建LLM实例"""
+    backend = (backend or LLM_BACKEND).lower()
+    if backend not in _BACKENDS:
+        raise ValueError(f"未知的LLM后端: {backend}（可选: {', '.join(available_backends())}）")
+    return _BACKENDS[backend](**kwargs)
+
+@register_backend("transformers")
+def _create_transformers_llm(**kwargs) -> LLM:
+    """进程内加载DeepSeek-Coder"""
+    from src.llm.deepseek import DeepSeekLLM
+    return DeepSeekLLM(**kwargs)
+
+@register_backend("openai")
+def _create_openai_llm(**kwargs) -> LLM:
+    """OpenAI兼容的推理服务"""
+    from src.llm.openai_compat import OpenAICompatibleLLM
+    options = {
+        "base_url": LLM_SERVER_URL,
+        "model": LLM_SERVER_MODEL,
+        "api_key": LLM_SERVER_API_KEY,
+        "timeout": LLM_SERVER_TIMEOUT,
+        "connect_timeout": LLM_SERVER_CONNECT_TIMEOUT,
+        "pool_size": LLM_SERVER_POOL_SIZE,
+        "max_retries": LLM_SERVER_MAX_RETRIES
+    }
+    options.update(kwargs)
+    return OpenAICompatibleLLM(**options)
+
+@register_backend("stub")
+def _create_stub_llm(**kwargs) -> LLM:
+    """确定性的桩LLM（基准测试和联调）"""
+    from src.llm.stub import StubLLM
+    options = {"token_latency_ms": LLM_STUB_TOKEN_MS, "prefill_ms": LLM_STUB_PREFILL_MS}
+    options.update(kwargs)
+    return StubLLM(**options)
+
+@register_backend("ipc")
+def _create_ipc_llm(**kwargs) -> LLM:
+    """本机模型服务进程（python -m src.serving.model_server）"""
+    from src.serving.client import IPCLLM
+    return IPCLLM(**kwargs)
@@ -0,0 +1,202 @@
+import threading
+import numpy as np
+import torch
+from typing import List, Dict, Any, Optional, Tuple, Callable
+
+def crop_cache(past_key_values, length: int):
+    """把旧格式（逐层 (key, value) 元组）的KV缓存截断到前length个位置"""
+    if hasattr(past_key_values, "to_legacy_cache"):
+        past_key_values = past_key_values.to_legacy_cache()
+    return tuple(
+        (key[:, :, :length, :], value[:, :, :length, :]) for key, value in past_key_values
+    )
+
+def _forward(model, input_ids: List[int], past_key_values, device) -> Tuple[torch.Tensor, Any]:
+    """在已有KV缓存之后追加input_ids做一次前向计算，返回 (logits, 新的KV缓存)"""
+    outputs = model(
+        torch.tensor([input_ids], dtype=torch.long, device=device),
+        past_key_values=past_key_values,
+        use_cache=True
+    )
+    past = outputs.past_key_values
+    if hasattr(past, "to_legacy_cache"):
+        past = past.to_legacy_cache()
+    return outputs.logits[0], past
+
+class PromptLookupDrafter:
+    """提示查找草稿：在已有序列（提示 + 已生成内容）中查找与末尾n-gram相同的位置，
+    把它后面的token作为草稿
+    
+    生成的代码经常复用提示中的标识符、检索到的知识描述和已写过的代码片段，
+    因此无需额外模型就能得到不少可被接受的草稿。
+    """
+    
+    def __init__(self, num_tokens: int = 10, max_ngram: int = 3, min_ngram: int = 1):
+        self.num_tokens = num_tokens
+        self.max_ngram = max_ngram
+        self.min_ngram = min_ngram
+    
+    def begin(self, prompt_ids: List[int]):
+        """开始一次生成，返回本次生成的草稿状态（提示查找不需要状态）"""
+        return None
+    
+    def propose(self, tokens: List[int], k: int, state=None) -> List[int]:
+        """根据当前完整序列给出最多k个草稿token"""
+        if k <= 0:
+            return []
+        
+        sequence = np.asarray(tokens)
+        for n in range(self.max_ngram, self.min_ngram - 1, -1):
+            if len(sequence) <= n:
+                continue
+            pattern = sequence[-n:]
+            # 只在末尾n-gram之前的位置中查找，优先使用最近一次出现
+            windows = np.lib.stride_tricks.sliding_window_view(sequence[:-1], n)
+            matches = np.nonzero((windows == pattern).all(axis=1))[0]
+            for start in matches[::-1]:
+                follow = sequence[start + n:start + n + k]
+                if len(follow) > 0:
+                    return follow.tolist()
+        return []
+
+class _DraftState:
+    """一次生成中草稿模型的KV缓存及其对应的token"""
+    
+    __slots__ = ("past", "tokens")
+    
+    def __init__(self):
+        self.past = None
+        self.tokens: List[int] = []
+
+class DraftModelDrafter:
+    """小模型草稿：用同一分词器家族的小模型贪心生成草稿
+    
+    草稿模型的KV缓存保存在begin()返回的状态中，并发的生成调用互不影响。
+    """
+    
+    def __init__(self, model, num_tokens: int = 4):
+        self.model = model
+        self.num_tokens = num_tokens
+        self.device = next(model.parameters()).device
+    
+    def begin(self, prompt_ids: List[int]) -> _DraftState:
+        """开始一次生成，返回本次生成的草稿状态"""
+        return _DraftState()
+    
+    def propose(self, tokens: List[int], k: int, state: Optional[_DraftState] = None) -> List[int]:
+        if k <= 0:
+            return []
+        if state is None:
+            state = _DraftState()
+        
+        # 丢弃缓存中被拒绝的草稿部分，至少留一个token重新计算，以便得到下一个位置的logits
+        common = 0
+        limit = min(len(state.tokens), len(tokens) - 1)
+        while common < limit and state.tokens[common] == tokens[common]:
+            common += 1
+        past = crop_cache(state.past, common) if state.past is not None and common > 0 else None
+        
+        with torch.no_grad():
+            logits, past = _forward(self.model, tokens[common:], past, self.device)
+            draft = [int(torch.argmax(logits[-1]))]
+            cached = list(tokens)
+            for _ in range(k - 1):
+                logits, past = _forward(self.model, [draft[-1]], past, self.device)
+                cached.append(draft[-1])
+                draft.append(int(torch.argmax(logits[-1])))
+        
+        state.past = past
+        state.tokens = cached
+        return draft
+
+class SpeculativeStats:
+    """推测解码统计：草稿token数、被接受的token数和每次验证的平均产出"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.verify_steps = 0
+        self.drafted_tokens = 0
+        self.accepted_tokens = 0
+        self.generated_tokens = 0
+    
+    def record(self, verify_steps: int, drafted: int, accepted: int, generated: int):
+        with self._lock:
+            self.calls += 1
+            self.verify_steps += verify_steps
+            self.drafted_tokens += drafted
+            self.accepted_tokens += accepted
+            self.generated_tokens += generated
+    
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "drafted_tokens": self.drafted_tokens,
+                "accepted_tokens": self.accepted_tokens,
+                "acceptance_rate": self.accepted_tokens / self.drafted_tokens if self.drafted_tokens else 0.0,
+                "tokens_per_step": self.generated_tokens / self.verify_steps if self.verify_steps else 0.0
+            }
+
+def speculative_generate(model, input_ids: List[int], drafter, max_new_tokens: int,
+                         eos_token_id: Optional[int] = None, past_key_values=None,
+                         stats: Optional[SpeculativeStats] = None,
+                         should_stop: Optional[Callable[[List[int]], bool]] = None) -> List[int]:
+    """贪心推测解码，返回新生成的token id
+    
+    每一步先由drafter给出草稿，再用目标模型对 [上一个token] + 草稿 做一次前向计算，
+    接受与目标模型贪心预测一致的最长前缀，并追加目标模型在第一个不一致位置的预测。
+    因此输出与普通贪心解码相同，只是每次前向计算可能产出多个token。
+    past_key_values可以是输入前缀的KV缓存（例如提示前缀缓存），不会被修改。
+    """
+    device = next(model.parameters()).device
+    draft_state = drafter.begin(input_ids)
+    
+    # prefill：缓存中已有的前缀不再计算
+    cached_length = past_key_values[0][0].shape[2] if past_key_values is not None else 0
+    with torch.no_grad():
+        logits, past = _forward(model, input_ids[cached_length:], past_key_values, device)
+    generated = [int(torch.argmax(logits[-1]))]
+    cached_length = len(input_ids)
+    
+    verify_steps = 0
+    drafted = 0
+    accepted = 0
+    while len(generated) < max_new_tokens and generated[-1] != eos_token_id:
+        if should_stop is not None and should_stop(generated):
+            break
+        
+        tokens = input_ids + generated
+        draft = drafter.propose(tokens, min(drafter.num_tokens, max_new_tokens - len(generated) - 1), draft_state)
+        
+        # 验证：缓存中还没有最后一个已生成的token，与草稿一起送入模型
+        with torch.no_grad():
+            logits, past = _forward(model, [generated[-1]] + draft, past, device)
+        predictions = torch.argmax(logits, dim=-1).tolist()
+        
+        n = 0
+        while n < len(draft) and draft[n] == predictions[n]:
+            n += 1
+        
+        verify_steps += 1
+        drafted += len(draft)
+        accepted += n
+        
+        # 缓存中只保留已确认的token：上一个token + 被接受的草稿
+        cached_length += 1 + n
+        if n < len(draft):
+            past = crop_cache(past, cached_length)
+        
+        new_tokens = draft[:n] + [predictions[n]]
+        generated.extend(new_tokens)
+        if eos_token_id is not None and eos_token_id in new_tokens:
+            break
+    
+    # 截断到eos和长度上限（一次验证可能越过eos）
+    if eos_token_id is not None and eos_token_id in generated:
+        generated = generated[:generated.index(eos_token_id) + 1]
+    generated = generated[:max_new_tokens]
+    
+    if stats is not None:
+        stats.record(verify_steps, drafted, accepted, len(generated))
+    return generated
@@ -0,0 +1,164 @@
+import threading
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional, Union, Sequence
+
+class StopCondition(ABC):
+    """基于已生成文本的停止条件"""
+    
+    @abstractmethod
+    def stop_index(self, text: str) -> Optional[int]:
+        """条件满足时返回应保留的文本长度，否则返回None"""
+        pass
+    
+    def __call__(self, text: str) -> bool:
+        return self.stop_index(text) is not None
+    
+    def truncate(self, text: str) -> str:
+        """截掉满足条件之后多生成的内容"""
+        index = self.stop_index(text)
+        return text if index is None else text[:index]
+
+class CodeBlockStop(StopCondition):
+    """第一个代码块闭合后停止，与ChainOfThoughtReasoner._extract_code一致
+    
+    优先匹配指定语言的代码块；模型使用其他语言标记（如```py）或不带标记时，
+    退回到第一个任意语言的代码块，避免一直生成到max_tokens。
+    """
+    
+    def __init__(self, language: Optional[str] = None):
+        self.openings = [f"```{language}", "```"] if language else ["```"]
+    
+    def stop_index(self, text: str) -> Optional[int]:
+        for opening in self.openings:
+            start = text.find(opening)
+            if start < 0:
+                continue
+            end = text.find("```", start + len(opening))
+            if end >= 0:
+                return end + 3
+        return None
+
+class JsonObjectStop(StopCondition):
+    """第一个JSON对象的花括号配对完成后停止（忽略字符串中的括号）"""
+    
+    def stop_index(self, text: str) -> Optional[int]:
+        start = text.find("{")
+        if start < 0:
+            return None
+        
+        depth = 0
+        in_string = False
+        escaped = False
+        for i in range(start, len(text)):
+            char = text[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == "{":
+                depth += 1
+            elif char == "}":
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+        return None
+
+class StopStrings(StopCondition):
+    """出现任意停止字符串时停止，结果不包含停止字符串"""
+    
+    def __init__(self, strings: Sequence[str]):
+        self.strings = [s for s in strings if s]
+    
+    def stop_index(self, text: str) -> Optional[int]:
+        positions = [text.find(s) for s in self.strings]
+        positions = [p for p in positions if p >= 0]
+        return min(positions) if positions else None
+
+class AnyStop(StopCondition):
+    """任一条件满足即停止，保留到最早的截断位置"""
+    
+    def __init__(self, conditions: List[StopCondition]):
+        self.conditions = conditions
+    
+    def stop_index(self, text: str) -> Optional[int]:
+        indexes = [condition.stop_index(text) for condition in self.conditions]
+        indexes = [index for index in indexes if index is not None]
+        return min(indexes) if indexes else None
+
+StopSpec = Union[None, str, Sequence[str], StopCondition]
+
+def build_stop_condition(stop: StopSpec, language: Optional[str] = None,
+                         extra_strings: Sequence[str] = ()) -> Optional[StopCondition]:
+    """把停止条件描述转换为StopCondition
+    
+    stop可以是StopCondition、"code_block"、"json"或停止字符串列表；
+    extra_strings为全局配置的停止字符串。
+    """
+    conditions = []
+    if isinstance(stop, StopCondition):
+        conditions.append(stop)
+    elif stop == "code_block":
+        conditions.append(CodeBlockStop(language))
+    elif stop == "json":
+        conditions.append(JsonObjectStop())
+    elif isinstance(stop, str):
+        conditions.append(StopStrings([stop]))
+    elif stop:
+        conditions.append(StopStrings(list(stop)))
+    
+    if extra_strings:
+        conditions.append(StopStrings(list(extra_strings)))
+    
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else AnyStop(conditions)
+
+def make_usage(prompt_tokens: Optional[int], completion_tokens: Optional[int],
+               max_tokens: int, stop_reason: str) -> Dict[str, Any]:
+    """生成一次生成调用的用量信息
+    
+    tokens_saved为停止条件提前结束时距max_tokens的剩余token数（模型可能更早生成eos，
+    因此这是节省量的上限）。
+    """
+    saved = 0
+    if stop_reason == "stop" and completion_tokens is not None:
+        saved = max(0, max_tokens - completion_tokens)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "max_tokens": max_tokens,
+        "stop_reason": stop_reason,
+        "tokens_saved": saved
+    }
+
+class UsageStats:
+    """累计的生成用量统计"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.completion_tokens = 0
+        self.early_stops = 0
+        self.tokens_saved = 0
+    
+    def record(self, usage: Dict[str, Any]):
+        with self._lock:
+            self.calls += 1
+            self.completion_tokens += usage.get("completion_tokens") or 0
+            if usage.get("stop_reason") == "stop":
+                self.early_stops += 1
+            self.tokens_saved += usage.get("tokens_saved") or 0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "completion_tokens": self.completion_tokens,
+                "early_stops": self.early_stops,
+                "tokens_saved": self.tokens_saved
+            }
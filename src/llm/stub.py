@@ -0,0 +1,99 @@
+import re
+import time
+import hashlib
+from typing import List, Dict, Any, Iterator
+from src.config import LLM_STOP_STRINGS
+from src.llm.base import LLM
+from src.llm.stopping import StopSpec, UsageStats, build_stop_condition, make_usage
+
+# 按问题类型给出的固定特征，选择方式只取决于问题文本的哈希
+_STUB_FEATURES = [
+    {"problem_type": "数组", "difficulty": "简单", "data_structures": ["哈希表"], "algorithms": ["双指针技术"]},
+    {"problem_type": "字符串", "difficulty": "中等", "data_structures": ["哈希表"], "algorithms": ["双指针技术"]},
+    {"problem_type": "树", "difficulty": "中等", "data_structures": ["树"], "algorithms": ["动态规划"]},
+    {"problem_type": "数组", "difficulty": "困难", "data_structures": ["堆/优先队列"], "algorithms": ["贪心算法"]},
+]
+
+_STUB_RESPONSE = """### 1. 问题理解
+题目给定输入 {seed}，需要按要求计算结果。
+
+### 2. 解题思路
+使用哈希表记录已经处理过的元素，一次遍历即可得到答案。
+
+### 6. 代码实现
+```{language}
+def solve(nums, target):
+    seen = {{}}
+    for i, num in enumerate(nums):
+        if target - num in seen:
+            return [seen[target - num], i]
+        seen[num] = i
+    return []
+```
+
+### 7. 复杂度分析
+时间复杂度 O(n)，空间复杂度 O(n)。以上代码块之后的内容在开启提前停止时不会被生成。
+"""
+
+class StubLLM(LLM):
+    """确定性的桩LLM，用于在没有模型的CPU环境中做基准测试和联调
+    
+    输出只取决于提示内容；token按空白切分计数。token_latency_ms和prefill_ms
+    模拟解码和prefill的耗时，使各阶段的耗时分布接近真实模型。
+    """
+    
+    def __init__(self, token_latency_ms: float = 0.0, prefill_ms: float = 0.0):
+        self.model_id = "stub"
+        self.token_latency = token_latency_ms / 1000.0
+        self.prefill = prefill_ms / 1000.0
+        self.usage_stats = UsageStats()
+    
+    def _response_tokens(self, prompt: str) -> List[str]:
+        """按提示生成固定的回复，切分为带空白的token"""
+        match = re.search(r"下面是(\w+)实现", prompt)
+        language = match.group(1) if match else "python"
+        seed = hashlib.md5(prompt.encode("utf-8")).hexdigest()[:8]
+        text = _STUB_RESPONSE.format(language=language, seed=seed)
+        return re.findall(r"\s*\S+", text)
+    
+    def _tokens(self, prompt: str, max_tokens: int, stop: StopSpec) -> Iterator[str]:
+        """逐个产出token并模拟解码耗时，满足停止条件或达到max_tokens时结束"""
+        condition = build_stop_condition(stop, extra_strings=LLM_STOP_STRINGS)
+        time.sleep(self.prefill)
+        text = ""
+        for token in self._response_tokens(prompt)[:max_tokens]:
+            time.sleep(self.token_latency)
+            text += token
+            yield token
+            if condition is not None and condition(text):
+                return
+    
+    def generate(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2048,
+                 stop: StopSpec = None) -> str:
+        return self.generate_with_usage(prompt, temperature, max_tokens, stop)["text"]
+    
+    def generate_with_usage(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2048,
+                            stop: StopSpec = None) -> Dict[str, Any]:
+        tokens = list(self._tokens(prompt, max_tokens, stop))
+        text = "".join(tokens)
+        condition = build_stop_condition(stop, extra_strings=LLM_STOP_STRINGS)
+        if condition is not None and condition(text):
+            stop_reason = "stop"
+            text = condition.truncate(text)
+        else:
+            stop_reason = "length" if len(tokens) >= max_tokens else "eos"
+        usage = make_usage(len(prompt.split()), len(tokens), max_tokens, stop_reason)
+        self.usage_stats.record(usage)
+        return {"text": text.strip(), "usage": usage}
+    
+    def generate_stream(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2048,
+                        stop: StopSpec = None) -> Iterator[str]:
+        yield from self._tokens(prompt, max_tokens, stop)
+    
+    def extract_features(self, text: str) -> Dict[str, Any]:
+        time.sleep(self.prefill)
+        index = int(hashlib.md5(text.encode("utf-8")).hexdigest(), 16) % len(_STUB_FEATURES)
+        return {
+            key: list(value) if isinstance(value, list) else value
+            for key, value in _STUB_FEATURES[index].items()
+        }
@@ -0,0 +1,161 @@
+import hashlib
+import numpy as np
+from typing import List, Dict, Any, Optional, Callable, Tuple
+from src.utils.lru import LRUCache
+
+class SolutionCache:
+    """解决方案缓存 - 精确匹配 + 可选的语义匹配
+    
+    精确匹配的键为 (问题哈希, 语言, 模型ID, 提示模板版本)；开启语义匹配时，
+    未精确命中的请求再用问题文本的嵌入向量与同语言、同模型、同模板版本的
+    缓存条目比较余弦相似度。收到负面反馈的解决方案不会再从缓存返回。
+    """
+    
+    def __init__(self, storage, model_id: str, template_version: str, 
+                 max_size: int = 512, ttl: Optional[float] = None,
+                 encode_fn: Optional[Callable[[List[str]], np.ndarray]] = None,
+                 similarity_threshold: float = 0.97):
+        self.storage = storage
+        self.model_id = model_id
+        self.template_version = template_version
+        self.encode_fn = encode_fn
+        self.similarity_threshold = similarity_threshold
+        self._entries = LRUCache(max_size=max_size, ttl=ttl)
+        
+        # 统计信息
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.skipped_negative = 0
+    
+    @property
+    def semantic(self) -> bool:
+        """是否开启语义匹配"""
+        return self.encode_fn is not None
+    
+    def embed(self, problem: str) -> np.ndarray:
+        """计算问题文本的归一化嵌入向量"""
+        embedding = np.asarray(self.encode_fn([problem]), dtype="float32")[0]
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm > 0 else embedding
+    
+    def _key(self, problem: str, language: str) -> Tuple[str, str, str, str]:
+        """生成精确匹配的缓存键"""
+        problem_hash = hashlib.md5(problem.encode()).hexdigest()
+        return (problem_hash, language, self.model_id, self.template_version)
+    
+    def get(self, problem: str, language: str, 
+            embedding: Optional[np.ndarray] = None,
+            embed_fn: Optional[Callable[[], np.ndarray]] = None) -> Optional[Dict[str, Any]]:
+        """查找缓存的解决方案，未命中返回None
+        
+        先查精确匹配；未命中且开启语义匹配时才需要嵌入向量：优先使用embedding，
+        其次调用embed_fn（调用方可借此保存嵌入供后续阶段复用），都没有则自行计算。
+        """
+        key = self._key(problem, language)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if self._is_valid(entry):
+                self.exact_hits += 1
+                return self._to_solution(entry, "exact")
+            self._entries.pop(key)
+        
+        if self.semantic:
+            if embedding is None:
+                embedding = embed_fn() if embed_fn is not None else self.embed(problem)
+            match = self._semantic_lookup(key, embedding)
+            if match is not None:
+                self.semantic_hits += 1
+                return self._to_solution(match, "semantic")
+        
+        self.misses += 1
+        return None
+    
+    def _semantic_lookup(self, key: Tuple[str, str, str, str], 
+                         embedding: np.ndarray) -> Optional[Dict[str, Any]]:
+        """在同语言、同模型、同模板版本的条目中查找最相似的问题"""
+        candidates = [
+            (entry_key, entry) for entry_key, entry in self._entries.items()
+            if entry_key[1:] == key[1:] and entry.get("embedding") is not None
+        ]
+        if not candidates:
+            return None
+        
+        matrix = np.stack([entry["embedding"] for _, entry in candidates])
+        scores = matrix @ embedding
+        
+        # 按相似度从高到低检查，跳过有负面反馈的条目
+        for idx in np.argsort(-scores):
+            if scores[idx] < self.similarity_threshold:
+                break
+            entry_key, entry = candidates[idx]
+            if self._is_valid(entry):
+                # 刷新LRU位置
+                self._entries.get(entry_key)
+                return entry
+            self._entries.pop(entry_key)
+        return None
+    
+    def put(self, problem: str, language: str, solution: Dict[str, Any], 
+            embedding: Optional[np.ndarray] = None):
+        """缓存解决方案"""
+        if not solution.get("code"):
+            # 没有提取到代码的结果不缓存
+            return
+        
+        if self.semantic and embedding is None:
+            embedding = self.embed(problem)
+        
+        self._entries.put(self._key(problem, language), {
+            "code": solution["code"],
+            "reasoning": solution["reasoning"],
+            "features": solution["features"],
+            "solution_id": solution["solution_id"],
+            "embedding": embedding
+        })
+    
+    def invalidate_solution(self, solution_id: str) -> int:
+        """移除指定解决方案的缓存条目，返回移除的数量"""
+        removed = 0
+        for key, entry in self._entries.items():
+            if entry["solution_id"] == solution_id:
+                self._entries.pop(key)
+                removed += 1
+        return removed
+    
+    def _is_valid(self, entry: Dict[str, Any]) -> bool:
+        """有负面反馈的解决方案视为无效"""
+        feedbacks = self.storage.get_feedback_for_solution(entry["solution_id"])
+        if any(not feedback["is_positive"] for feedback in feedbacks):
+            self.skipped_negative += 1
+            return False
+        return True
+    
+    def _to_solution(self, entry: Dict[str, Any], match_type: str) -> Dict[str, Any]:
+        """把缓存条目转换为解决方案（返回副本，避免调用方修改缓存）"""
+        return {
+            "code": entry["code"],
+            "reasoning": entry["reasoning"],
+            "features": dict(entry["features"]),
+            "solution_id": entry["solution_id"],
+            "cache": match_type
+        }
+    
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self._entries.max_size,
+            "ttl": self._entries.ttl,
+            "semantic": self.semantic,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "skipped_negative": self.skipped_negative,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0
+        }
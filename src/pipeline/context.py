@@ -0,0 +1,53 @@
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
+from src.utils.metrics import STAGE_LATENCY
+from src.utils.tracing import span, get_request_id
+
+class PipelineContext:
+    """请求级流水线上下文 - 在各阶段之间传递中间结果，保证每个耗时阶段只执行一次"""
+    
+    def __init__(self, problem: str, language: str = "python"):
+        self.problem = problem
+        self.language = language
+        self.request_id = get_request_id()
+        
+        # 各阶段的中间结果（None表示尚未计算）
+        self.features: Optional[Dict[str, Any]] = None
+        self.feature_source: Optional[str] = None  # "llm"或"fast"
+        self.retrieved_knowledge: Optional[List[Dict[str, Any]]] = None
+        self.history_prompt: Optional[str] = None
+        self.problem_id: Optional[str] = None
+        self.query_embedding = None
+        
+        # 缓存命中类型（"exact"/"semantic"），未命中为None
+        self.cache_hit: Optional[str] = None
+        
+        # 生成阶段的用量信息（token数、停止原因），缓存命中时为None
+        self.usage: Optional[Dict[str, Any]] = None
+        
+        # 各阶段耗时（秒）
+        self.timings: Dict[str, float] = {}
+        self._start_time = time.perf_counter()
+    
+    @contextmanager
+    def stage(self, name: str):
+        """记录一个阶段的耗时（同时写入阶段耗时直方图，并作为span追踪）"""
+        start = time.perf_counter()
+        try:
+            with span(f"stage.{name}"):
+                yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed
+            STAGE_LATENCY.observe(elapsed, stage=name)
+    
+    def total_time(self) -> float:
+        """从创建上下文到现在的总耗时"""
+        return time.perf_counter() - self._start_time
+    
+    def timing_breakdown(self) -> Dict[str, float]:
+        """返回各阶段耗时及总耗时"""
+        breakdown = dict(self.timings)
+        breakdown["total"] = self.total_time()
+        return breakdown
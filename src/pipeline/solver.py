@@ -0,0 +1,169 @@
+from typing import Dict, Any, Tuple, Iterator, Optional
+from src.llm.base import LLM
+from src.llm.cot import ChainOfThoughtReasoner
+from src.feedback.base import BaseFeedbackStorage
+from src.feedback.learner import FeedbackLearner
+from src.pipeline.context import PipelineContext
+from src.pipeline.cache import SolutionCache
+from src.llm.fast_features import FastFeatureExtractor
+from src.utils.metrics import PIPELINE_LATENCY, PROMPT_TOKENS, COMPLETION_TOKENS, GENERATIONS, CACHE_LOOKUPS
+
+class SolvePipeline:
+    """解题流水线 - 每个请求中的每个耗时阶段只执行一次"""
+    
+    def __init__(self, llm: LLM, reasoner: ChainOfThoughtReasoner, 
+                 storage: BaseFeedbackStorage, learner: FeedbackLearner,
+                 cache: Optional[SolutionCache] = None,
+                 feature_extractor: Optional[FastFeatureExtractor] = None):
+        self.llm = llm
+        self.reasoner = reasoner
+        self.storage = storage
+        self.learner = learner
+        self.cache = cache
+        self.feature_extractor = feature_extractor
+    
+    def run(self, problem: str, language: str = "python", 
+            use_cache: bool = True) -> Tuple[Dict[str, Any], PipelineContext]:
+        """执行完整的解题流程，返回解决方案和请求上下文"""
+        ctx = PipelineContext(problem, language)
+        cached = self._lookup_cache(ctx, use_cache)
+        if cached is not None:
+            self._record_metrics(ctx)
+            return cached, ctx
+        
+        for _ in self._prepare(ctx):
+            pass
+        
+        # 生成解决方案（检索和生成阶段在推理器中完成）
+        solution = self.reasoner.generate_solution(problem, language, context=ctx)
+        
+        # 存储解决方案
+        solution["solution_id"] = self._store_solution(ctx, solution)
+        self._update_cache(ctx, solution)
+        self._record_metrics(ctx)
+        return solution, ctx
+    
+    def stream(self, problem: str, language: str = "python", 
+               use_cache: bool = True) -> Iterator[Dict[str, Any]]:
+        """流式执行解题流程
+        
+        依次产出阶段事件 {"type": "stage"}、生成的文本片段 {"type": "token"}，
+        最后产出带有代码和solution_id的 {"type": "done"} 事件。
+        """
+        ctx = PipelineContext(problem, language)
+        cached = self._lookup_cache(ctx, use_cache)
+        if cached is not None:
+            self._record_metrics(ctx)
+            yield self._done_event(cached, ctx)
+            return
+        
+        yield from self._prepare(ctx)
+        
+        yield {"type": "stage", "stage": "generate"}
+        solution = None
+        for event in self.reasoner.stream_solution(problem, language, context=ctx):
+            if event["type"] == "solution":
+                solution = event
+            else:
+                yield event
+        
+        solution = dict(solution, solution_id=self._store_solution(ctx, solution))
+        self._update_cache(ctx, solution)
+        self._record_metrics(ctx)
+        yield self._done_event(solution, ctx)
+    
+    def _done_event(self, solution: Dict[str, Any], ctx: PipelineContext) -> Dict[str, Any]:
+        """构造流式输出的结束事件"""
+        return {
+            "type": "done",
+            "code": solution["code"],
+            "reasoning": solution["reasoning"],
+            "features": solution["features"],
+            "solution_id": solution["solution_id"],
+            "timings": ctx.timing_breakdown(),
+            "cache_hit": ctx.cache_hit,
+            "usage": ctx.usage
+        }
+    
+    def _lookup_cache(self, ctx: PipelineContext, use_cache: bool) -> Optional[Dict[str, Any]]:
+        """查找缓存的解决方案"""
+        if self.cache is None or not use_cache:
+            return None
+        
+        def embed():
+            # 只有精确匹配未命中时才计算嵌入，保存下来供后续阶段复用
+            ctx.query_embedding = self.cache.embed(ctx.problem)
+            return ctx.query_embedding
+        
+        with ctx.stage("cache"):
+            solution = self.cache.get(ctx.problem, ctx.language, ctx.query_embedding, embed_fn=embed)
+        
+        if solution is not None:
+            ctx.cache_hit = solution["cache"]
+        CACHE_LOOKUPS.inc(result=ctx.cache_hit or "miss")
+        return solution
+    
+    def _record_metrics(self, ctx: PipelineContext):
+        """记录总耗时和生成用量（阶段耗时由ctx.stage记录）"""
+        PIPELINE_LATENCY.observe(ctx.total_time(), cache="hit" if ctx.cache_hit else "miss")
+        if ctx.usage is None:
+            return
+        GENERATIONS.inc(stop_reason=ctx.usage.get("stop_reason") or "unknown")
+        if ctx.usage.get("prompt_tokens") is not None:
+            PROMPT_TOKENS.inc(ctx.usage["prompt_tokens"])
+        if ctx.usage.get("completion_tokens") is not None:
+            COMPLETION_TOKENS.inc(ctx.usage["completion_tokens"])
+    
+    def _update_cache(self, ctx: PipelineContext, solution: Dict[str, Any]):
+        """缓存新生成的解决方案（跳过缓存的请求同样会刷新缓存）"""
+        if self.cache is None:
+            return
+        
+        with ctx.stage("cache"):
+            self.cache.put(ctx.problem, ctx.language, solution, ctx.query_embedding)
+    
+    def _prepare(self, ctx: PipelineContext) -> Iterator[Dict[str, Any]]:
+        """生成之前的阶段：特征提取、存储问题、历史反馈增强"""
+        # 问题语义索引需要问题嵌入：计算一次，后续特征提取、历史检索和知识检索共用
+        if ctx.query_embedding is None and self.storage.problem_index is not None:
+            with ctx.stage("embed"):
+                ctx.query_embedding = self.reasoner.retriever.embed_query(ctx.problem)
+        
+        # 提取问题特征（只执行一次，后续阶段复用）；快速提取器置信度不足时才调用LLM
+        yield {"type": "stage", "stage": "extract_features"}
+        with ctx.stage("extract_features"):
+            if self.feature_extractor is not None:
+                ctx.features, ctx.feature_source, _ = self.feature_extractor.extract(
+                    ctx.problem, embedding=ctx.query_embedding
+                )
+            else:
+                ctx.features = self.llm.extract_features(ctx.problem)
+                ctx.feature_source = "llm"
+        
+        # 存储问题（记录特征来源，快速提取器只用LLM提取的特征做近邻投票）
+        with ctx.stage("storage"):
+            ctx.problem_id = self.storage.add_problem(ctx.problem, ctx.features, feature_source=ctx.feature_source)
+        
+        # 增强提示（添加历史反馈）
+        yield {"type": "stage", "stage": "history"}
+        with ctx.stage("history"):
+            ctx.history_prompt = self.learner.enhance_prompt_with_history(
+                ctx.problem, ctx.features, embedding=ctx.query_embedding
+            )
+        
+        # 检索相关知识
+        yield {"type": "stage", "stage": "retrieve"}
+        with ctx.stage("retrieve"):
+            ctx.retrieved_knowledge = self.reasoner.retriever.retrieve(
+                ctx.problem, k=5, embedding=ctx.query_embedding
+            )
+    
+    def _store_solution(self, ctx: PipelineContext, solution: Dict[str, Any]) -> str:
+        """存储解决方案"""
+        with ctx.stage("storage"):
+            return self.storage.add_solution(
+                ctx.problem_id, 
+                solution["code"], 
+                ctx.language, 
+                solution["reasoning"]
+            )
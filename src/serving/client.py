@@ -0,0 +1,189 @@
+import time
+import queue
+import numpy as np
+from multiprocessing.connection import Client
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from src.config import (
+    MODEL_SERVER_SOCKET, MODEL_SERVER_AUTHKEY, MODEL_SERVER_POOL_SIZE, MODEL_SERVER_CONNECT_TIMEOUT
+)
+from src.llm.base import LLM
+from src.llm.stopping import StopSpec
+from src.knowledge.embeddings import TextEncoder
+from src.serving.protocol import ERROR, CHUNK
+
+class ModelServerError(Exception):
+    """模型服务返回的错误"""
+    pass
+
+class ModelServerClient:
+    """模型服务客户端，维护一个连接池，多个线程可以同时发起请求
+    
+    每个连接同一时间只处理一个请求；连接出错（包括流式生成被提前关闭）时丢弃该连接。
+    """
+    
+    def __init__(self, address: str = None, authkey: Optional[bytes] = None,
+                 pool_size: int = None, connect_timeout: float = None):
+        self.address = address or MODEL_SERVER_SOCKET
+        self.authkey = MODEL_SERVER_AUTHKEY if authkey is None else authkey
+        self.connect_timeout = MODEL_SERVER_CONNECT_TIMEOUT if connect_timeout is None else connect_timeout
+        self._idle = queue.LifoQueue(maxsize=pool_size or MODEL_SERVER_POOL_SIZE)
+    
+    def _connect(self):
+        """建立新连接；模型服务可能还在加载模型，在connect_timeout内重试"""
+        deadline = time.perf_counter() + self.connect_timeout
+        while True:
+            try:
+                return Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            except (FileNotFoundError, ConnectionRefusedError) as e:
+                if time.perf_counter() >= deadline:
+                    raise ModelServerError(f"无法连接模型服务 {self.address}: {str(e)}")
+                time.sleep(0.5)
+    
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+    
+    def _release(self, conn):
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+    
+    def _unwrap(self, response: Tuple[str, Any]) -> Any:
+        status, payload = response
+        if status == ERROR:
+            raise ModelServerError(payload)
+        return payload
+    
+    def call(self, op: str, **kwargs) -> Any:
+        """发送一个请求并等待结果"""
+        conn = self._acquire()
+        try:
+            conn.send((op, kwargs))
+            response = conn.recv()
+        except Exception:
+            conn.close()
+            raise
+        self._release(conn)
+        return self._unwrap(response)
+    
+    def stream(self, op: str, **kwargs) -> Iterator[Any]:
+        """发送流式请求，逐个返回结果片段
+        
+        调用方提前关闭迭代器时关闭连接，模型服务在下一次发送时发现连接断开并停止生成。
+        """
+        conn = self._acquire()
+        finished = False
+        try:
+            conn.send((op, kwargs))
+            while True:
+                status, payload = conn.recv()
+                if status == CHUNK:
+                    yield payload
+                    continue
+                finished = True
+                self._unwrap((status, payload))
+                return
+        finally:
+            if finished:
+                self._release(conn)
+            else:
+                conn.close()
+    
+    def close(self):
+        """关闭池中的空闲连接"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+class IPCLLM(LLM):
+    """通过模型服务调用的LLM，本进程不加载任何模型权重"""
+    
+    def __init__(self, client: Optional[ModelServerClient] = None):
+        self.client = client or ModelServerClient()
+        info = self.client.call("info")
+        if not info.get("llm_model_id"):
+            raise ModelServerError("模型服务未加载LLM")
+        self.model_id = info["llm_model_id"]
+        print(f"使用模型服务中的LLM: {self.model_id}（{self.client.address}）")
+    
+    def generate(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2048,
+                 stop: StopSpec = None) -> str:
+        """生成文本（模型服务会与其他工作进程的并发请求合并为batch）"""
+        return self.generate_with_usage(prompt, temperature, max_tokens, stop)["text"]
+    
+    def generate_with_usage(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2048,
+                            stop: StopSpec = None) -> Dict[str, Any]:
+        return self.client.call(
+            "generate_with_usage",
+            prompt=prompt, temperature=temperature, max_tokens=max_tokens, stop=stop
+        )
+    
+    def generate_stream(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2048,
+                        stop: StopSpec = None) -> Iterator[str]:
+        return self.client.stream(
+            "generate_stream",
+            prompt=prompt, temperature=temperature, max_tokens=max_tokens, stop=stop
+        )
+    
+    def extract_features(self, text: str) -> Dict[str, Any]:
+        return self.client.call("extract_features", text=text)
+    
+    def register_prompt_prefix(self, prefix: str):
+        self.client.call("register_prompt_prefix", prefix=prefix)
+    
+    def server_stats(self) -> Dict[str, Any]:
+        """模型服务的统计信息（批处理、前缀缓存、用量等）"""
+        return self.client.call("stats")
+
+class IPCEncoder(TextEncoder):
+    """通过模型服务计算嵌入的编码器"""
+    
+    def __init__(self, client: Optional[ModelServerClient] = None):
+        self.client = client or ModelServerClient()
+        info = self.client.call("info")
+        if not info.get("encoder_model_id"):
+            raise ModelServerError("模型服务未加载嵌入模型")
+        # 与模型服务中的编码器使用相同的模型标识，索引清单保持一致
+        self.model_id = info["encoder_model_id"]
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.client.call("encode", texts=list(texts)), dtype="float32")
+
+class IPCProblemIndex:
+    """由模型服务托管的问题语义索引（接口与ProblemEmbeddingIndex一致）
+    
+    多个API工作进程共享同一个索引，只有模型服务进程写入索引文件。
+    """
+    
+    def __init__(self, client: Optional[ModelServerClient] = None):
+        self.client = client or ModelServerClient()
+        if not self.client.call("info").get("problem_index"):
+            raise ModelServerError("模型服务未托管问题索引")
+    
+    def __len__(self) -> int:
+        return self.client.call("problem_index_len")
+    
+    def __contains__(self, problem_id: str) -> bool:
+        return not self.client.call("problem_index_missing", problem_ids=[problem_id])
+    
+    def add(self, problem_id: str, text: str):
+        self.add_many([problem_id], [text])
+    
+    def add_many(self, problem_ids: List[str], texts: List[str]):
+        self.client.call("problem_index_add", problem_ids=list(problem_ids), texts=list(texts))
+    
+    def search(self, text: str, k: int = 5,
+               embedding: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
+        return self.client.call("problem_index_search", text=text, k=k, embedding=embedding)
+    
+    def sync(self, storage):
+        """历史问题由模型服务在开始监听前补齐，工作进程不重复补齐"""
+        pass
+    
+    def save(self):
+        pass
@@ -0,0 +1,237 @@
+"""
+模型服务进程：独占LLM和嵌入模型的权重，API工作进程通过Unix套接字调用
+
+多个uvicorn工作进程共享同一份模型，内存不再随工作进程数线性增长。
+并发的generate请求经BatchScheduler合并为batch；问题语义索引也只由本进程写入，
+避免多个工作进程同时追加同一个FAISS文件。
+
+启动: python -m src.serving.model_server [--socket PATH]
+"""
+import os
+import sys
+import time
+import signal
+import logging
+import argparse
+import threading
+from multiprocessing.connection import Listener
+from typing import Dict, Any, Callable, Optional
+
+from src.config import (
+    MODEL_SERVER_SOCKET, MODEL_SERVER_AUTHKEY, LLM_BACKEND, EMBEDDING_BACKEND,
+    DEFAULT_EMBEDDING_MODEL, LLM_MAX_BATCH_SIZE, LLM_MAX_WAIT_MS, PROBLEM_INDEX_ENABLED
+)
+from src.serving.protocol import OK, ERROR, CHUNK
+from src.utils.tracing import configure_logging, fields
+
+logger = logging.getLogger(__name__)
+
+class ModelServer:
+    """在Unix套接字上提供模型调用
+    
+    每个连接一个线程，请求为 (op, kwargs)，响应为 (OK, 结果) 或 (ERROR, 错误信息)；
+    流式生成先逐段发送 (CHUNK, 文本)，最后发送 (OK, None)。
+    """
+    
+    def __init__(self, llm=None, encoder=None, problem_index=None,
+                 address: str = None, authkey: Optional[bytes] = None):
+        self.llm = llm
+        self.encoder = encoder
+        self.problem_index = problem_index
+        self.address = address or MODEL_SERVER_SOCKET
+        self.authkey = authkey
+        
+        self._ops: Dict[str, Callable] = {
+            "info": self._info,
+            "stats": self._stats,
+            "generate_with_usage": self._require("llm", lambda **kw: self.llm.generate_with_usage(**kw)),
+            "extract_features": self._require("llm", lambda text: self.llm.extract_features(text)),
+            "register_prompt_prefix": self._require("llm", lambda prefix: self.llm.register_prompt_prefix(prefix)),
+            "encode": self._require("encoder", lambda texts: self.encoder.encode(texts)),
+            "problem_index_len": self._require("problem_index", lambda: len(self.problem_index)),
+            "problem_index_missing": self._require("problem_index", self._missing_problems),
+            "problem_index_add": self._require("problem_index", self._add_problems),
+            "problem_index_search": self._require("problem_index", lambda **kw: self.problem_index.search(**kw)),
+        }
+        
+        self._lock = threading.Lock()
+        self._connections = 0
+        self._requests = 0
+        self._started_at = time.time()
+    
+    def _require(self, name: str, fn: Callable) -> Callable:
+        """未加载对应组件时给出明确的错误"""
+        def wrapper(**kwargs):
+            if getattr(self, name) is None:
+                raise RuntimeError(f"模型服务未加载{name}")
+            return fn(**kwargs)
+        return wrapper
+    
+    def _info(self) -> Dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "llm_model_id": getattr(self.llm, "model_id", None),
+            "encoder_model_id": getattr(self.encoder, "model_id", None),
+            "problem_index": self.problem_index is not None
+        }
+    
+    def _stats(self) -> Dict[str, Any]:
+        """服务统计以及LLM的批处理、前缀缓存、推测解码和用量统计"""
+        with self._lock:
+            stats = {
+                "connections": self._connections,
+                "requests": self._requests,
+                "uptime": time.time() - self._started_at
+            }
+        llm = self.llm
+        if llm is None:
+            return stats
+        if hasattr(llm, "scheduler"):
+            stats["batching"] = llm.scheduler.stats()
+        if hasattr(llm, "prefix_cache_stats"):
+            stats["prefix_cache"] = llm.prefix_cache_stats()
+        if getattr(llm, "drafter", None) is not None:
+            stats["speculative"] = llm.speculative_stats.to_dict()
+        if getattr(llm, "usage_stats", None) is not None:
+            stats["usage"] = llm.usage_stats.to_dict()
+        return stats
+    
+    def _missing_problems(self, problem_ids):
+        return [pid for pid in problem_ids if pid not in self.problem_index]
+    
+    def _add_problems(self, problem_ids, texts):
+        self.problem_index.add_many(problem_ids, texts)
+    
+    def serve_forever(self):
+        """监听套接字并为每个连接启动一个线程"""
+        if os.path.exists(self.address):
+            os.remove(self.address)
+        
+        with Listener(self.address, family="AF_UNIX", authkey=self.authkey) as listener:
+            # 只允许当前用户连接
+            os.chmod(self.address, 0o600)
+            logger.info("模型服务已启动", extra=fields(address=self.address, pid=os.getpid()))
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    logger.warning("接受连接失败: %s", e)
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), name="model-server-conn", daemon=True).start()
+    
+    def _handle(self, conn):
+        """处理一个连接上的请求，直到对方关闭"""
+        with self._lock:
+            self._connections += 1
+        try:
+            while True:
+                try:
+                    op, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    return
+                
+                with self._lock:
+                    self._requests += 1
+                
+                if op == "generate_stream":
+                    self._stream(conn, kwargs)
+                    continue
+                
+                try:
+                    fn = self._ops.get(op)
+                    if fn is None:
+                        raise ValueError(f"未知的操作: {op}")
+                    response = (OK, fn(**kwargs))
+                except Exception as e:
+                    response = (ERROR, f"{type(e).__name__}: {str(e)}")
+                conn.send(response)
+        except (EOFError, OSError, BrokenPipeError):
+            pass
+        finally:
+            with self._lock:
+                self._connections -= 1
+            conn.close()
+    
+    def _stream(self, conn, kwargs: Dict[str, Any]):
+        """流式生成：客户端断开时关闭生成器，底层生成随之停止"""
+        if self.llm is None:
+            conn.send((ERROR, "RuntimeError: 模型服务未加载llm"))
+            return
+        
+        chunks = self.llm.generate_stream(**kwargs)
+        try:
+            for text in chunks:
+                conn.send((CHUNK, text))
+            conn.send((OK, None))
+        except Exception as e:
+            if isinstance(e, (OSError, BrokenPipeError)):
+                raise
+            conn.send((ERROR, f"{type(e).__name__}: {str(e)}"))
+        finally:
+            chunks.close()
+
+def build_server(llm_backend: str, embedding_backend: str, with_problem_index: bool,
+                 address: str, authkey: Optional[bytes]) -> ModelServer:
+    """加载模型并创建服务（加载完成前不监听套接字，客户端会等待）"""
+    llm = None
+    if llm_backend != "none":
+        from src.llm.registry import create_llm
+        from src.llm.batching import BatchedLLM
+        start = time.perf_counter()
+        llm = create_llm(llm_backend)
+        if hasattr(llm, "generate_batch"):
+            llm = BatchedLLM(llm, max_batch_size=LLM_MAX_BATCH_SIZE, max_wait_ms=LLM_MAX_WAIT_MS)
+        logger.info("LLM加载完成", extra=fields(seconds=round(time.perf_counter() - start, 3)))
+    
+    encoder = None
+    problem_index = None
+    if embedding_backend != "none":
+        from src.knowledge.embeddings import create_encoder
+        start = time.perf_counter()
+        encoder = create_encoder(DEFAULT_EMBEDDING_MODEL, backend=embedding_backend)
+        logger.info("嵌入模型加载完成", extra=fields(seconds=round(time.perf_counter() - start, 3)))
+        
+        # 在开始监听前补齐存储中尚未建立索引的历史问题，工作进程挂载索引时不再补齐
+        if with_problem_index:
+            from src.feedback.factory import create_feedback_storage
+            from src.feedback.problem_index import ProblemEmbeddingIndex
+            problem_index = ProblemEmbeddingIndex(encoder.encode)
+            problem_index.sync(create_feedback_storage())
+    
+    return ModelServer(llm, encoder, problem_index, address=address, authkey=authkey)
+
+def main():
+    configure_logging()
+    
+    # 本进程自己加载模型，ipc后端只用于API工作进程
+    default_llm = LLM_BACKEND if LLM_BACKEND != "ipc" else "transformers"
+    default_embedding = EMBEDDING_BACKEND if EMBEDDING_BACKEND != "ipc" else "torch"
+    
+    parser = argparse.ArgumentParser(description="模型服务进程")
+    parser.add_argument("--socket", default=MODEL_SERVER_SOCKET, help="Unix套接字路径")
+    parser.add_argument("--llm-backend", default=default_llm, help="LLM后端，none表示不加载")
+    parser.add_argument("--embedding-backend", default=default_embedding, help="嵌入后端（torch/onnx），none表示不加载")
+    parser.add_argument("--no-problem-index", action="store_true", help="不托管问题语义索引")
+    args = parser.parse_args()
+    
+    server = build_server(
+        args.llm_backend,
+        args.embedding_backend,
+        PROBLEM_INDEX_ENABLED and not args.no_problem_index,
+        args.socket,
+        MODEL_SERVER_AUTHKEY
+    )
+    # SIGTERM与Ctrl+C一样正常退出，保存问题索引并删除套接字文件
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server.problem_index is not None:
+            server.problem_index.save()
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+# 模型服务的消息格式：请求为 (op, kwargs)，响应为 (状态, 内容)
+OK = "ok"
+ERROR = "error"
+CHUNK = "chunk"
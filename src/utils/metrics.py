@@ -0,0 +1,257 @@
+import math
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Tuple, Sequence, Callable, Optional
+
+# Prometheus文本格式（0.0.4）的Content-Type
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 默认的耗时分桶（秒），覆盖毫秒级的检索到数十秒的生成
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(pairs: Sequence[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+class _Metric:
+    """指标基类：按标签取值分别记录"""
+    
+    type_name = ""
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+    
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指标 {self.name} 的标签应为 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    def _pairs(self, key: Tuple[str, ...]) -> List[Tuple[str, str]]:
+        return list(zip(self.labelnames, key))
+    
+    def samples(self) -> List[Tuple[str, List[Tuple[str, str]], float]]:
+        """返回 (名称后缀, 标签, 取值) 列表"""
+        raise NotImplementedError
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.type_name}"]
+        for suffix, pairs, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(pairs)} {_format_value(value)}")
+        return lines
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    
+    type_name = "counter"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, amount: float = 1.0, **labels):
+        if amount < 0:
+            raise ValueError("计数器不能减少")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+    
+    def samples(self):
+        with self._lock:
+            return [("", self._pairs(key), value) for key, value in sorted(self._values.items())]
+
+class Gauge(_Metric):
+    """可增可减的当前值；也可以设置回调函数，在导出时读取"""
+    
+    type_name = "gauge"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], float]] = None
+    
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+    
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+    
+    def set_function(self, function: Callable[[], float]):
+        """导出时调用function取值（只用于没有标签的指标）"""
+        if self.labelnames:
+            raise ValueError(f"带标签的指标 {self.name} 不能使用回调")
+        self._function = function
+    
+    def value(self, **labels) -> float:
+        if self._function is not None:
+            return float(self._function())
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+    
+    def samples(self):
+        if self._function is not None:
+            try:
+                return [("", [], float(self._function()))]
+            except Exception:
+                return []
+        with self._lock:
+            return [("", self._pairs(key), value) for key, value in sorted(self._values.items())]
+
+class Histogram(_Metric):
+    """分桶直方图：导出 _bucket（累计计数）、_sum 和 _count"""
+    
+    type_name = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签取值 -> [各桶计数（不累计）..., +Inf桶计数, 总和]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+    
+    @contextmanager
+    def time(self, **labels):
+        """记录代码块的耗时（秒）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+    
+    def count(self, **labels) -> int:
+        with self._lock:
+            counts = self._values.get(self._key(labels))
+            return int(sum(counts[:-1])) if counts else 0
+    
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts)) for key, counts in sorted(self._values.items())]
+        
+        samples = []
+        for key, counts in items:
+            pairs = self._pairs(key)
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (math.inf,), counts[:-1]):
+                cumulative += count
+                samples.append(("_bucket", pairs + [("le", _format_value(bound))], cumulative))
+            samples.append(("_sum", pairs, counts[-1]))
+            samples.append(("_count", pairs, cumulative))
+        return samples
+
+class MetricsRegistry:
+    """指标注册表，按名称去重，导出为Prometheus文本格式"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+    
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"指标 {name} 已注册为 {metric.type_name}")
+            return metric
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+    
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+    
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+    
+    def render(self) -> str:
+        """导出所有指标"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# 进程内的默认注册表
+REGISTRY = MetricsRegistry()
+
+# 应用指标（名称以leetcode_rag_开头）
+HTTP_REQUESTS = REGISTRY.counter(
+    "leetcode_rag_http_requests_total", "HTTP请求数", ("method", "path", "status")
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "leetcode_rag_http_request_duration_seconds", "HTTP请求处理耗时（流式响应只统计到响应头）", ("method", "path")
+)
+STAGE_LATENCY = REGISTRY.histogram(
+    "leetcode_rag_stage_duration_seconds", "解题流水线各阶段耗时", ("stage",)
+)
+PIPELINE_LATENCY = REGISTRY.histogram(
+    "leetcode_rag_pipeline_duration_seconds", "解题流水线总耗时", ("cache",)
+)
+PROMPT_TOKENS = REGISTRY.counter(
+    "leetcode_rag_prompt_tokens_total", "生成解决方案的提示token数"
+)
+COMPLETION_TOKENS = REGISTRY.counter(
+    "leetcode_rag_completion_tokens_total", "生成解决方案的输出token数"
+)
+GENERATIONS = REGISTRY.counter(
+    "leetcode_rag_generations_total", "解决方案生成次数（按停止原因）", ("stop_reason",)
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "leetcode_rag_cache_lookups_total", "解决方案缓存查询次数（exact/semantic为命中，miss为未命中）", ("result",)
+)
+INFERENCE_QUEUE_DEPTH = REGISTRY.gauge(
+    "leetcode_rag_inference_queue_depth", "推理线程池中排队等待的请求数"
+)
+INFERENCE_RUNNING = REGISTRY.gauge(
+    "leetcode_rag_inference_running", "推理线程池中正在执行的请求数"
+)
+BATCH_QUEUE_DEPTH = REGISTRY.gauge(
+    "leetcode_rag_batch_queue_depth", "动态批处理中等待调度的生成请求数"
+)
+COMPONENT_LOAD_SECONDS = REGISTRY.gauge(
+    "leetcode_rag_component_load_seconds", "组件（模型、索引、存储）的加载耗时", ("component",)
+)
+COMPONENT_READY = REGISTRY.gauge(
+    "leetcode_rag_component_ready", "组件是否已就绪（1为就绪）", ("component",)
+)
@@ -0,0 +1,150 @@
+import json
+import time
+import uuid
+import logging
+import inspect
+import functools
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Callable
+
+# 当前请求的ID和当前span（线程池中的任务需要用contextvars.copy_context()传递）
+_request_id = contextvars.ContextVar("request_id", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+_logger = logging.getLogger("src.tracing")
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+def get_request_id() -> Optional[str]:
+    """当前请求的ID，不在请求中时为None"""
+    return _request_id.get()
+
+@contextmanager
+def request_context(request_id: Optional[str] = None):
+    """在代码块内设置当前请求的ID（未指定时生成新的ID）"""
+    request_id = request_id or new_request_id()
+    token = _request_id.set(request_id)
+    try:
+        yield request_id
+    finally:
+        _request_id.reset(token)
+
+def fields(**values) -> Dict[str, Any]:
+    """结构化日志字段: logger.info("消息", extra=fields(key=value))"""
+    return {"fields": values}
+
+class Span:
+    """一次被追踪的调用"""
+    
+    __slots__ = ("name", "parent", "attributes")
+    
+    def __init__(self, name: str, parent: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.parent = parent
+        self.attributes = attributes
+    
+    def set(self, **attributes):
+        """补充span的属性（例如结果数量）"""
+        self.attributes.update(attributes)
+
+@contextmanager
+def span(name: str, **attributes):
+    """追踪一段代码：结束时以DEBUG级别输出名称、父span、耗时和属性，日志中带有当前请求ID"""
+    parent = _current_span.get()
+    current = Span(name, parent.name if parent else None, attributes)
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    error = None
+    try:
+        yield current
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        if _logger.isEnabledFor(logging.DEBUG):
+            _logger.debug("span", extra=fields(
+                span=name,
+                parent=current.parent,
+                duration_ms=round((time.perf_counter() - start) * 1000, 3),
+                error=error,
+                **current.attributes
+            ))
+
+def traced(name: str) -> Callable:
+    """用span追踪函数调用的装饰器；生成器函数追踪整个迭代过程"""
+    def decorator(fn: Callable) -> Callable:
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                # 生成器可能在不同的上下文中被恢复，这里不设置当前span，只记录耗时
+                start = time.perf_counter()
+                try:
+                    yield from fn(*args, **kwargs)
+                finally:
+                    if _logger.isEnabledFor(logging.DEBUG):
+                        _logger.debug("span", extra=fields(
+                            span=name, duration_ms=round((time.perf_counter() - start) * 1000, 3)
+                        ))
+            return generator_wrapper
+        
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class _RequestIdFilter(logging.Filter):
+    """给每条日志加上当前请求ID"""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get() or "-"
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行JSON"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", None),
+            "message": record.getMessage()
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class TextFormatter(logging.Formatter):
+    """可读的文本格式，结构化字段以 key=value 附在消息之后"""
+    
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+    
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        extra = getattr(record, "fields", None)
+        if extra:
+            message += " " + " ".join(f"{key}={value}" for key, value in extra.items())
+        return message
+
+def configure_logging(level: str = None, fmt: str = None):
+    """配置src包的日志输出（重复调用时替换之前的配置）"""
+    from src.config import LOG_LEVEL, LOG_FORMAT
+    
+    handler = logging.StreamHandler()
+    handler.addFilter(_RequestIdFilter())
+    handler.setFormatter(JsonFormatter() if (fmt or LOG_FORMAT) == "json" else TextFormatter())
+    
+    logger = logging.getLogger("src")
+    for existing in list(logger.handlers):
+        logger.removeHandler(existing)
+    logger.addHandler(handler)
+    logger.setLevel((level or LOG_LEVEL).upper())
+    logger.propagate = False